@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class AnalyzerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analyzer'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+
+        from .models import CodeSubmission
+        from .similarity import index_saved_submission
+
+        post_save.connect(index_saved_submission, sender=CodeSubmission, dispatch_uid="analyzer.similarity")
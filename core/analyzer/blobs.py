@@ -0,0 +1,65 @@
+import hashlib
+import zlib
+
+from .conf import get_setting
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content-addressed payload storage. Blobs are keyed by the SHA-256 of the
+# uncompressed bytes, so identical code and identical LLM answers are stored
+# once no matter how many submissions reference them.
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def compress(data: bytes) -> tuple:
+    # Returns (payload, compression). Falls back to "none" when compressing
+    # does not pay off, which is common for very short snippets.
+    method = get_setting("BLOB_COMPRESSION", "zlib")
+
+    if method == "zstd" and zstandard is not None:
+        payload = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    else:
+        method = "zlib"
+        payload = zlib.compress(data, ZLIB_LEVEL)
+
+    if len(payload) >= len(data):
+        return data, "none"
+    return payload, method
+
+
+def decompress(payload: bytes, compression: str) -> bytes:
+    payload = bytes(payload)
+    if compression == "none":
+        return payload
+    if compression == "zlib":
+        return zlib.decompress(payload)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This blob is zstd-compressed; install the zstandard package to read it.")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unknown blob compression: {compression}")
+
+
+def encode_text(text: str) -> dict:
+    # Field values for a Blob row holding text.
+    data = text.encode("utf-8")
+    payload, compression = compress(data)
+    return {
+        "hash": blob_hash(data),
+        "data": payload,
+        "compression": compression,
+        "size": len(data),
+    }
+
+
+def decode_text(payload: bytes, compression: str) -> str:
+    return decompress(payload, compression).decode("utf-8")
@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+
+from .conf import get_setting
+from .singleflight import make_singleflight
+
+
+# ================= KEY NORMALIZATION =================
+
+def normalize_code(code: str) -> str:
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def make_cache_key(code: str, error: str, error_type: str, mode: str, model: str, context: str = "") -> str:
+    # `context` marks prompts that carry more than the code and error (a
+    # user's previous attempt), so their answers are not served to others.
+    digest = hashlib.sha256()
+    parts = (normalize_code(code), normalize_code(error), error_type, mode, model)
+    for part in parts + ((context,) if context else ()):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return "llm:" + digest.hexdigest()
+
+
+# ================= BACKENDS =================
+
+class LocMemBackend:
+    # In-process LRU with a TTL and a size bound.
+    shared = False
+    options = ("max_entries", "ttl")
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    # Any Django cache alias; use a database or file cache to share
+    # entries between worker processes. A per-process cache (locmem, dummy)
+    # works but is not treated as shared.
+    options = ("alias", "ttl")
+
+    def __init__(self, alias: str = "shared", ttl: float = 3600):
+        from django.core.cache import caches
+        from django.core.cache.backends.dummy import DummyCache
+        from django.core.cache.backends.locmem import LocMemCache
+
+        self._cache = caches[alias]
+        self.shared = not isinstance(self._cache, (LocMemCache, DummyCache))
+        self.ttl = ttl
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def set(self, key: str, value) -> None:
+        self._cache.set(key, value, timeout=self.ttl)
+
+    def add(self, key: str, value, ttl: float) -> bool:
+        return self._cache.add(key, value, timeout=ttl)
+
+    def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+BACKENDS = {
+    "locmem": LocMemBackend,
+    "django": DjangoCacheBackend,
+}
+
+
+# ================= RESPONSE CACHE =================
+
+class ResponseCache:
+
+    def __init__(self, backend, flight=None):
+        self.backend = backend
+        self.flight = flight
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_call(self, key: str, call, bypass: bool = False):
+        # Returns (value, hit). A bypassed request still refreshes the entry.
+        # On a miss, identical concurrent requests share one call (hit is
+        # then True for all but the first); see analyzer/singleflight.py.
+        value = None if bypass else self.lookup(key)
+        if value is not None:
+            return value, True
+
+        def fill():
+            value = call()
+            self.store(key, value)
+            return value
+
+        if self.flight is None:
+            return fill(), False
+        return self.flight.do(key, fill, recheck=None if bypass else lambda: self.backend.get(key))
+
+    async def aget_or_call(self, key: str, acall, bypass: bool = False):
+        # get_or_call for a coroutine function; cache I/O runs in a thread.
+        value = None if bypass else await sync_to_async(self.lookup, thread_sensitive=False)(key)
+        if value is not None:
+            return value, True
+
+        async def fill():
+            value = await acall()
+            await sync_to_async(self.store, thread_sensitive=False)(key, value)
+            return value
+
+        if self.flight is None:
+            return await fill(), False
+        return await self.flight.ado(key, fill, recheck=None if bypass else lambda: self.backend.get(key))
+
+    def lookup(self, key: str):
+        value = self.backend.get(key)
+        self._count(hit=value is not None)
+        return value
+
+    def store(self, key: str, value) -> None:
+        self.backend.set(key, value)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                config = dict(get_setting("RESPONSE_CACHE", {}))
+                backend_cls = BACKENDS[config.pop("BACKEND", "locmem")]
+                # Settings for the other backend (MAX_ENTRIES, ALIAS) are ignored.
+                options = {
+                    key.lower(): value for key, value in config.items() if key.lower() in backend_cls.options
+                }
+                backend = backend_cls(**options)
+                _response_cache = ResponseCache(backend, make_singleflight(backend))
+
+    return _response_cache
@@ -0,0 +1,9 @@
+from django.conf import settings
+
+
+def get_setting(name: str, default=None):
+    # The CLI imports analyzer modules without configuring Django,
+    # so fall back to the default instead of raising.
+    if not settings.configured:
+        return default
+    return getattr(settings, name, default)
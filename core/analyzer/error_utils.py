@@ -1,14 +1,177 @@
+import builtins
+import re
+import traceback
+from dataclasses import dataclass, field
+
+USER_CODE = "<user_code>"
+
+# Built-in exception classes by name, e.g. "IndexError" -> IndexError.
+BUILTIN_EXCEPTIONS = {
+    name: value
+    for name, value in vars(builtins).items()
+    if isinstance(value, type) and issubclass(value, BaseException)
+}
+
+CHAIN_MESSAGES = {
+    "During handling of the above exception, another exception occurred:": "context",
+    "The above exception was the direct cause of the following exception:": "cause",
+}
+
+# One pass over the text picks out frame lines, chain separators and
+# exception lines ("Name: message" at column 0). Exception names are matched
+# by shape and looked up in BUILTIN_EXCEPTIONS afterwards, which keeps the
+# pattern small and also accepts user-defined and dotted exception names.
+# Lines of a top-level exception group carry a "  | " margin; the
+# sub-exceptions nested inside it are indented further and are skipped.
+GROUP_MARGIN = r"(?:  \| )?"
+
+TRACEBACK_RE = re.compile(
+    r"^" + GROUP_MARGIN + r'[ \t]+File "(?P<file>[^"]*)", line (?P<line>\d+)'
+    r"|^" + GROUP_MARGIN + r"(?P<chain>" + "|".join(re.escape(message) for message in CHAIN_MESSAGES) + r")"
+    r"|^" + GROUP_MARGIN + r"(?P<type>(?:[A-Za-z_]\w*\.)*(?!Error\b)\w*"
+    r"(?:Error|Exception|Warning|Exit|Interrupt|Iteration|Group))"
+    r"(?::[ ]?(?P<message>.*))?$",
+    re.MULTILINE
+)
+
+# For error text without a traceback, e.g. "I get a NameError on line 3".
+MENTION_RE = re.compile(r"\b([A-Za-z_]\w*(?:Error|Exception|Warning|Exit|Interrupt|Iteration))\b")
+
+LINE_MENTION_RE = re.compile(r"\bline (\d+)\b")
+
+# Frames of installed packages and the standard library, on any platform
+# ("/usr/lib/python3.11/", "site-packages", "C:\\Python311\\Lib\\"), and
+# pseudo-files such as "<frozen runpy>".
+LIBRARY_RE = re.compile(r"^<|[\\/](?:site-packages|dist-packages|lib[\\/]python\d[\d.]*|Lib)[\\/]")
+
+
+@dataclass
+class ErrorInfo:
+    type: str
+    message: str = ""
+    # Line in the submitted code where the exception surfaced, if known.
+    line: int = None
+    # Built-in classes the exception derives from, most specific first;
+    # empty for exceptions that are not built in.
+    bases: list = field(default_factory=list)
+    # Earlier exceptions in the chain, oldest first, as (type, message, line, link)
+    # where link is "context" or "cause".
+    chain: list = field(default_factory=list)
+
+
+def exception_bases(name: str) -> list:
+    # Only undotted or builtins.* names are built in: a third-party
+    # requests.exceptions.ConnectionError is not the built-in one.
+    if name.startswith("builtins."):
+        name = name[len("builtins."):]
+    if "." in name:
+        return []
+    exception = BUILTIN_EXCEPTIONS.get(name)
+    if exception is None:
+        return []
+    return [cls.__name__ for cls in exception.__mro__ if cls is not object]
+
+
+def focus_frames(frames: list) -> list:
+    # Lines of the submitted code among (file, line) frames, outermost
+    # first: the <user_code> frames, or for a traceback pasted from the
+    # user's own run, the frames in the file of the innermost frame that is
+    # not library code.
+    if any(file == USER_CODE for file, _ in frames):
+        return [line for file, line in frames if file == USER_CODE]
+    own = [file for file, _ in frames if not LIBRARY_RE.search(file)]
+    if not own:
+        return []
+    return [line for file, line in frames if file == own[-1]]
+
+
+def parse_error(error_message: str):
+    # Returns an ErrorInfo for the last exception in the text, or None when
+    # no exception can be found.
+    if not error_message:
+        return None
+
+    raised = []
+    frames = []
+    link = None
+
+    for match in TRACEBACK_RE.finditer(error_message):
+        if match.group("file") is not None:
+            frames.append((match.group("file"), int(match.group("line"))))
+        elif match.group("chain") is not None:
+            link = CHAIN_MESSAGES[match.group("chain")]
+            frames = []
+        else:
+            raised.append((match.group("type"), (match.group("message") or "").strip(), frames, link))
+            frames = []
+            link = None
+
+    if not raised:
+        mention = MENTION_RE.search(error_message)
+        if mention is None:
+            return None
+        line = LINE_MENTION_RE.search(error_message)
+        return ErrorInfo(
+            type=mention.group(1),
+            line=int(line.group(1)) if line else None,
+            bases=exception_bases(mention.group(1)),
+        )
+
+    # Once any frame is in <user_code>, only those count, in every link of
+    # the chain.
+    user_code = any(file == USER_CODE for _, _, frames, _ in raised for file, _ in frames)
+
+    def frame_line(frames):
+        if user_code:
+            frames = [frame for frame in frames if frame[0] == USER_CODE]
+        lines = focus_frames(frames)
+        return lines[-1] if lines else None
+
+    # Types are reported by their short name; the built-in hierarchy is
+    # looked up by the qualified one.
+    name, message, frames, _ = raised[-1]
+    return ErrorInfo(
+        type=short_name(name),
+        message=message,
+        line=frame_line(frames),
+        bases=exception_bases(name),
+        chain=[(short_name(name), message, frame_line(frames), link) for name, message, frames, link in raised[:-1]],
+    )
+
+
+def short_name(name: str) -> str:
+    return name.rsplit(".", 1)[-1]
+
+
+def user_lines(error_message: str) -> list:
+    # Lines of the submitted code named anywhere in the error text, in
+    # traceback order (outermost frame first; see focus_frames); the line
+    # of a plain mention ("... on line 3") when there is no traceback.
+    if not error_message:
+        return []
+
+    frames = [
+        (match.group("file"), int(match.group("line")))
+        for match in TRACEBACK_RE.finditer(error_message)
+        if match.group("file") is not None
+    ]
+    if not frames:
+        mention = LINE_MENTION_RE.search(error_message)
+        return [int(mention.group(1))] if mention else []
+    return focus_frames(frames)
+
+
 def classify_error(error_message: str) -> str:
     if not error_message:
         return "NoError"
 
-    if "IndexError" in error_message:
-        return "IndexError"
-    elif "TypeError" in error_message:
-        return "TypeError"
-    elif "KeyError" in error_message:
-        return "KeyError"
-    elif "ValueError" in error_message:
-        return "ValueError"
-    else:
-        return "UnknownError"
+    info = parse_error(error_message)
+    return info.type if info else "UnknownError"
+
+
+def detect_python_error(code: str):
+    try:
+        compile(code, USER_CODE, "exec")
+        return None
+    except Exception:
+        return traceback.format_exc()
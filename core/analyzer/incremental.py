@@ -0,0 +1,266 @@
+import difflib
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .conf import get_setting
+from .error_utils import parse_error, user_lines
+from .metrics import timer
+from .parsing import render_answer
+from .pipeline import item_cache_key
+from .similarity import reusable_answer
+from .slicing import slice_code, worth_slicing
+from .tiering import choose_tier
+
+# Incremental re-debugging. Students fix a line and resubmit; the previous
+# answer usually still says most of what there is to say. Before the model
+# is asked, the user's most recent related submission (same user, within
+# WINDOW_SECONDS, at least MIN_SIMILARITY of its lines in common) is diffed
+# against the new code:
+#
+#   fix_applied  no error any more and the code is the FIXED_CODE of the
+#                previous answer: answered without the model
+#   unchanged    the same error on the same statement, and the edit did not
+#                touch it, the problem line or the previous fix: the previous
+#                answer is reused with its lines and fixed code carried over
+#
+# Otherwise the prompt carries a short summary of the previous analysis and
+# the changed lines, and code long enough to slice (SLICING MIN_LINES) is cut
+# to an excerpt around the changed and failing lines with the smaller
+# TOKEN_BUDGET. Such answers are about the user's own history: they are
+# cached under a key of their own and kept out of the similarity index.
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "WINDOW_SECONDS": 30 * 60,
+    "LOOKBACK": 5,
+    "MIN_SIMILARITY": 0.6,
+    "TOKEN_BUDGET": 800,
+}
+
+# Changed lines this close to the failing line count as touching it.
+CONTEXT_LINES = 2
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CONFIG, **get_setting("INCREMENTAL", {})}
+
+
+# ================= DIFF =================
+
+@dataclass
+class Diff:
+    # difflib opcodes from the previous code's lines to the new code's.
+    opcodes: list
+    ratio: float
+
+
+def code_lines(code: str) -> list:
+    lines = [line.rstrip() for line in code.splitlines()]
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def diff_code(old: list, new: list, min_ratio: float = 0.0):
+    # Returns a Diff, or None when the two share less than min_ratio.
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    if matcher.real_quick_ratio() < min_ratio or matcher.quick_ratio() < min_ratio:
+        return None
+    ratio = matcher.ratio()
+    if ratio < min_ratio:
+        return None
+    return Diff(matcher.get_opcodes(), ratio)
+
+
+def changed_lines(diff: Diff, total: int) -> list:
+    # 1-based lines of the new code that were edited or inserted; a deletion
+    # marks the line after it.
+    lines = []
+    for tag, i1, i2, j1, j2 in diff.opcodes:
+        if tag == "equal":
+            continue
+        if j2 > j1:
+            lines.extend(range(j1 + 1, j2 + 1))
+        elif total:
+            lines.append(min(j1 + 1, total))
+    return lines
+
+
+def map_line(diff: Diff, line: int):
+    # Where an unchanged line of the previous code is now, or None.
+    for tag, i1, i2, j1, j2 in diff.opcodes:
+        if i1 < line <= i2:
+            return j1 + line - i1 if tag == "equal" else None
+    return None
+
+
+def merge(old: list, ours: tuple, theirs: tuple):
+    # Three-way merge of two edits of `old`, each given as (Diff, new lines):
+    # the user's edit and the previous fix. None when they overlap.
+    edits = []
+    for diff, lines in (ours, theirs):
+        edits.extend((i1, i2, lines[j1:j2]) for tag, i1, i2, j1, j2 in diff.opcodes if tag != "equal")
+
+    edits.sort(key=lambda edit: (edit[0], edit[1]))
+    for (a1, a2, _), (b1, b2, _) in zip(edits, edits[1:]):
+        if b1 <= a2:
+            return None
+
+    merged = list(old)
+    for i1, i2, lines in reversed(edits):
+        merged[i1:i2] = lines
+    return merged
+
+
+def line_ranges(lines: list) -> str:
+    # [3, 4, 5, 9] -> "3-5, 9"
+    parts = []
+    for line in sorted(set(lines)):
+        if parts and parts[-1][1] == line - 1:
+            parts[-1][1] = line
+        else:
+            parts.append([line, line])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in parts)
+
+
+# ================= PREVIOUS SUBMISSION =================
+
+def find_previous(user_id, code: str, config: dict):
+    # The most similar of the user's recent answered submissions, as
+    # (submission, Diff), or (None, None).
+    from .models import CodeSubmission
+
+    since = timezone.now() - timedelta(seconds=config["WINDOW_SECONDS"])
+    recent = CodeSubmission.objects.filter(user_id=user_id, submitted_at__gte=since, response_meta__isnull=False) \
+        .select_related("code_blob", "response_blob", "fixed_code_blob") \
+        .order_by("-submitted_at", "-id")[:config["LOOKBACK"]]
+
+    new = code_lines(code)
+    best, best_diff = None, None
+    for submission in recent:
+        old = code_lines(submission.code)
+        if old == new:
+            continue
+        diff = diff_code(old, new, config["MIN_SIMILARITY"])
+        if diff is not None and (best_diff is None or diff.ratio > best_diff.ratio):
+            best, best_diff = submission, diff
+    return best, best_diff
+
+
+def previous_summary(submission) -> str:
+    response = submission.ai_response or {}
+    sections = response.get("sections") or {}
+    if response.get("mode") == "hint":
+        return sections.get("hints", "")
+
+    parts = [submission.reason] if submission.reason else []
+    if submission.problem_line is not None:
+        parts.append(f"Problem line: {submission.problem_line}")
+    return "\n".join(parts)
+
+
+# ================= REUSE =================
+
+def fix_applied_answer(submission, item: dict):
+    if item["error_source"] != "none" or not submission.fixed_code:
+        return None
+    if code_lines(submission.fixed_code) != code_lines(item["code"]):
+        return None
+
+    reason = "No error found. This version applies the fix suggested for your previous submission."
+    if item["mode"] == "hint":
+        hints = reason + "\nRun it with a few of your own inputs to check it behaves as you expect."
+        return render_answer({"hints": hints}, "hint")
+
+    sections = submission.ai_response.get("sections") or {}
+    return render_answer({
+        "reason": reason,
+        "problem_line": None,
+        "problem_snippet": "",
+        "explanation": f"The previous version failed because: {submission.reason}\nThat issue is now fixed.",
+        "fixed_code": item["code"],
+        "example": sections.get("example", ""),
+    }, "full")
+
+
+def unchanged_answer(submission, item: dict, diff: Diff, changed: list):
+    response = submission.ai_response
+    if not reusable_answer(response) or response.get("mode") != item["mode"]:
+        return None
+
+    before, now = parse_error(submission.error_message), parse_error(item["error"])
+    if before is None or now is None or (before.type, before.message) != (now.type, now.message):
+        return None
+    if now.line is None or before.line is None or map_line(diff, before.line) != now.line:
+        return None
+    if any(abs(line - now.line) <= CONTEXT_LINES for line in changed):
+        return None
+
+    sections = dict(response["sections"])
+    if item["mode"] == "hint":
+        return render_answer(sections, "hint")
+
+    if sections.get("problem_line") is not None:
+        sections["problem_line"] = map_line(diff, sections["problem_line"])
+        if sections["problem_line"] is None:
+            return None
+
+    if sections.get("fixed_code"):
+        old, new = code_lines(submission.code), code_lines(item["code"])
+        fixed = code_lines(sections["fixed_code"])
+        # A fix that rewrote most of the code (or only covers an excerpt)
+        # cannot be carried over line by line.
+        theirs = diff_code(old, fixed, get_config()["MIN_SIMILARITY"])
+        if theirs is None:
+            return None
+        merged = merge(old, (diff, new), (theirs, fixed))
+        if merged is None:
+            return None
+        sections["fixed_code"] = "\n".join(merged)
+
+    return render_answer(sections, "full")
+
+
+# ================= PLANNING =================
+
+def plan_incremental(item: dict, user_id) -> None:
+    # Fills in item["incremental"] and either a reused answer (as
+    # item["local_answer"]) or the previous analysis for the prompt.
+    config = get_config()
+    if not config["ENABLED"] or user_id is None or item["local_answer"] or item["bypass_cache"]:
+        return
+
+    with timer("incremental"):
+        previous, diff = find_previous(user_id, item["code"], config)
+        if previous is None:
+            return
+
+        changed = changed_lines(diff, len(item["code"].splitlines()))
+        item["incremental"] = {
+            "previous": previous.pk,
+            "similarity": round(diff.ratio, 3),
+            "changed_lines": line_ranges(changed),
+            "reused": None,
+        }
+
+        for kind, answer in (
+            ("fix_applied", lambda: fix_applied_answer(previous, item)),
+            ("unchanged", lambda: unchanged_answer(previous, item, diff, changed)),
+        ):
+            result = answer()
+            if result is not None:
+                item["local_answer"] = result
+                item["incremental"]["reused"] = kind
+                item["tier"] = choose_tier(item)
+                item["cache_key"] = item_cache_key(item)
+                return
+
+        item["previous_analysis"] = previous_summary(previous)
+        if worth_slicing(item["code"]):
+            excerpt = slice_code(item["code"], changed + user_lines(item["error"]), config["TOKEN_BUDGET"])
+            if excerpt is not None:
+                item["excerpt"] = excerpt
+        item["tier"] = choose_tier(item)
+        item["cache_key"] = item_cache_key(item)
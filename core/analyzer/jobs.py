@@ -0,0 +1,316 @@
+import hashlib
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import normalize_code
+from .conf import get_setting
+from .incremental import plan_incremental
+from .metrics import Counter, register, timer
+from .models import CodeSubmission, DebugJob
+from .pipeline import build_response_data, prepare_item, resolve_item
+
+# Background debug jobs, queued in the DebugJob table (no broker needed):
+#
+#   enqueue   inserts a queued row; an identical active job is returned
+#             instead (partial unique index on dedup_key)
+#   claim     moves the oldest highest-priority queued row to running with a
+#             conditional UPDATE, so concurrent workers never take the same
+#             job, and gives it a lease
+#   requeue   puts running rows whose lease has expired (their worker died)
+#             back in the queue, or fails them after MAX_ATTEMPTS
+#
+# Jobs run at least once: a worker that outlives its lease may finish a job
+# another worker has already picked up; only the first result is kept.
+
+DEFAULT_CONFIG = {
+    "LEASE_SECONDS": 300,
+    "MAX_ATTEMPTS": 3,
+    "RETRY_DELAY": 10,
+    "POLL_INTERVAL": 1.0,
+    "CALLBACK_HOSTS": [],
+    "CALLBACK_TIMEOUT": 10,
+    "CALLBACK_RETRIES": 3,
+}
+
+PRIORITIES = {
+    "interactive": DebugJob.INTERACTIVE,
+    "batch": DebugJob.BATCH,
+}
+
+JOBS = register(Counter(
+    "analyzer_jobs_total", "Background debug jobs by outcome.", ("outcome",)
+))
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CONFIG, **get_setting("JOBS", {})}
+
+
+# ================= ENQUEUE =================
+
+def dedup_key(user_id, payload: dict, callback_url: str = "") -> str:
+    # A job has one callback, so requests with different callback URLs are
+    # not merged (the response cache still saves the second LLM call).
+    digest = hashlib.sha256()
+    for part in (
+        str(user_id or ""),
+        callback_url,
+        normalize_code(payload["code"]),
+        normalize_code(payload["error"]),
+        payload["mode"],
+        str(payload["execute"]),
+        str(payload["bypass_cache"]),
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def callback_allowed(url: str) -> bool:
+    # Callbacks go only to hosts listed in JOBS["CALLBACK_HOSTS"] ("*" for any).
+    if len(url) > 500:
+        return False
+    parts = urlsplit(url)
+    hosts = get_config()["CALLBACK_HOSTS"]
+    return parts.scheme in ("http", "https") and bool(parts.hostname) and (
+        "*" in hosts or parts.hostname in hosts
+    )
+
+
+def enqueue(payload: dict, user=None, priority: int = DebugJob.INTERACTIVE, callback_url: str = ""):
+    # Returns (job, created).
+    user_id = user.pk if user is not None else None
+    key = dedup_key(user_id, payload, callback_url)
+
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                job = DebugJob.objects.create(
+                    user_id=user_id,
+                    priority=priority,
+                    dedup_key=key,
+                    payload=payload,
+                    callback_url=callback_url,
+                )
+            JOBS.inc("queued")
+            return job, True
+        except IntegrityError:
+            existing = DebugJob.objects.filter(dedup_key=key, status__in=DebugJob.ACTIVE_STATUSES).first()
+            if existing is not None:
+                # An interactive request moves a queued batch job forward.
+                if DebugJob.objects.filter(
+                    pk=existing.pk, status=DebugJob.QUEUED, priority__gt=priority
+                ).update(priority=priority):
+                    existing.priority = priority
+                JOBS.inc("deduplicated")
+                return existing, False
+            # The active job finished in between; try again.
+
+    raise RuntimeError("Could not enqueue debug job")
+
+
+def job_status(job: DebugJob) -> dict:
+    data = {
+        "job_id": str(job.pk),
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "status_url": reverse("debug_job", args=[job.pk]),
+    }
+    if job.status == DebugJob.DONE:
+        data["result"] = job.result
+    elif job.status == DebugJob.FAILED or job.error:
+        data["error"] = job.error
+    return data
+
+
+# ================= QUEUE =================
+
+def claim(worker: str, lease_seconds: float):
+    # Returns the claimed job, or None when nothing is runnable.
+    now = timezone.now()
+    candidates = DebugJob.objects.filter(
+        status=DebugJob.QUEUED, run_after__lte=now
+    ).order_by("priority", "created_at").values_list("pk", flat=True)[:5]
+
+    for pk in candidates:
+        claimed = DebugJob.objects.filter(pk=pk, status=DebugJob.QUEUED).update(
+            status=DebugJob.RUNNING,
+            worker=worker,
+            attempts=F("attempts") + 1,
+            started_at=now,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+        )
+        if claimed:
+            return DebugJob.objects.get(pk=pk)
+
+    return None
+
+
+def requeue_expired(max_attempts: int) -> int:
+    # Returns the number of jobs taken back from dead workers.
+    now = timezone.now()
+    expired = DebugJob.objects.filter(status=DebugJob.RUNNING, lease_expires_at__lt=now)
+
+    failed = expired.filter(attempts__gte=max_attempts).update(
+        status=DebugJob.FAILED,
+        error="Worker lost while running the job",
+        finished_at=now,
+        lease_expires_at=None,
+    )
+    requeued = expired.filter(attempts__lt=max_attempts).update(
+        status=DebugJob.QUEUED,
+        worker="",
+        lease_expires_at=None,
+        run_after=now,
+    )
+    JOBS.inc("requeued", amount=requeued)
+    JOBS.inc("lost", amount=failed)
+    return requeued + failed
+
+
+def finish(job: DebugJob, **fields) -> bool:
+    # Only the worker holding the job may complete it.
+    fields.setdefault("lease_expires_at", None)
+    return bool(DebugJob.objects.filter(pk=job.pk, status=DebugJob.RUNNING, worker=job.worker).update(**fields))
+
+
+# ================= EXECUTION =================
+
+def run_job(job: DebugJob, config: dict) -> None:
+    payload = job.payload
+
+    try:
+        with timer("job"):
+            item = prepare_item(payload["code"], payload["error"], payload["mode"], execute=payload["execute"])
+            item["bypass_cache"] = payload["bypass_cache"]
+            plan_incremental(item, job.user_id)
+            result, cache_hit = resolve_item(item)
+            response_data = build_response_data(result, item, cache_hit)
+
+            submission = None
+            if job.user_id is not None:
+                with timer("db_write"):
+                    submission = CodeSubmission(
+                        user_id=job.user_id,
+                        code=item["code"],
+                        language="python",
+                        error_message=item["error"],
+                        ai_response=response_data
+                    )
+                    submission.save()
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        if job.attempts < config["MAX_ATTEMPTS"]:
+            finish(
+                job,
+                status=DebugJob.QUEUED,
+                worker="",
+                error=error,
+                run_after=timezone.now() + timedelta(seconds=config["RETRY_DELAY"] * job.attempts),
+            )
+            JOBS.inc("retried")
+            return
+        finished = finish(job, status=DebugJob.FAILED, error=error, finished_at=timezone.now())
+        JOBS.inc("failed")
+    else:
+        finished = finish(
+            job,
+            status=DebugJob.DONE,
+            result=response_data,
+            submission=submission,
+            error="",
+            finished_at=timezone.now(),
+        )
+        JOBS.inc("done")
+
+    if finished and job.callback_url:
+        deliver_callback(DebugJob.objects.get(pk=job.pk), config)
+
+
+def deliver_callback(job: DebugJob, config: dict) -> None:
+    # POSTs the job status to callback_url; retried on connection errors and
+    # 5xx answers. The last HTTP status is kept on the job.
+    import httpx
+
+    status = None
+    for attempt in range(config["CALLBACK_RETRIES"]):
+        try:
+            response = httpx.post(job.callback_url, json=job_status(job), timeout=config["CALLBACK_TIMEOUT"])
+            status = response.status_code
+            if status < 500:
+                break
+        except httpx.HTTPError:
+            pass
+        time.sleep(2 ** attempt)
+
+    DebugJob.objects.filter(pk=job.pk).update(callback_status=status)
+    JOBS.inc("callback_delivered" if status is not None and status < 400 else "callback_failed")
+
+
+# ================= WORKERS =================
+
+class JobWorker:
+    # One worker thread: claims and runs jobs until `stop` is set (or, with
+    # burst=True, until the queue is empty).
+
+    def __init__(self, name: str, stop: threading.Event, burst: bool = False):
+        self.name = name
+        self.stop = stop
+        self.burst = burst
+        self.config = get_config()
+        self._last_requeue = 0.0
+
+    def run_once(self) -> bool:
+        # Returns True when a job was run.
+        close_old_connections()
+
+        # Checking for lost jobs a few times per lease is enough.
+        now = time.monotonic()
+        if now - self._last_requeue > self.config["LEASE_SECONDS"] / 4:
+            self._last_requeue = now
+            requeue_expired(self.config["MAX_ATTEMPTS"])
+
+        job = claim(self.name, self.config["LEASE_SECONDS"])
+        if job is None:
+            return False
+
+        run_job(job, self.config)
+        return True
+
+    def run(self) -> None:
+        try:
+            while not self.stop.is_set():
+                if not self.run_once():
+                    if self.burst:
+                        break
+                    self.stop.wait(self.config["POLL_INTERVAL"])
+        finally:
+            connection.close()
+
+
+def worker_name(index: int) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def run_workers(count: int, stop: threading.Event, burst: bool = False) -> None:
+    threads = [
+        threading.Thread(target=JobWorker(worker_name(index), stop, burst).run, name=f"debug-worker-{index}")
+        for index in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
@@ -1,19 +1,136 @@
 import os
+import threading
+
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from .conf import get_setting
+from .router import Backend, CircuitBreaker, LatencyWindow, LLMResult, Router
 
 load_dotenv()
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# Connection pool and timeouts shared by every backend's sync and async clients.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "50"))
+
+# Used when the LLM_BACKENDS setting is absent (e.g. the CLI): one backend
+# configured from the environment, as before the router existed.
+DEFAULT_BACKENDS = [
+    {
+        "NAME": "openai",
+        "MODEL": MODEL,
+        "BASE_URL": os.getenv("OPENAI_BASE_URL"),
+        "API_KEY_ENV": "OPENAI_API_KEY",
+    },
+]
+
+
+def build_backend(config: dict, router_config: dict) -> Backend:
+    return Backend(
+        name=config["NAME"],
+        model=config["MODEL"],
+        base_url=config.get("BASE_URL"),
+        api_key=os.getenv(config.get("API_KEY_ENV", "OPENAI_API_KEY")) or "none",
+        timeout=config.get("TIMEOUT", LLM_TIMEOUT),
+        connect_timeout=config.get("CONNECT_TIMEOUT", LLM_CONNECT_TIMEOUT),
+        max_retries=config.get("MAX_RETRIES", 2),
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive=LLM_MAX_KEEPALIVE,
+        window=LatencyWindow(router_config.get("WINDOW", 100)),
+        breaker=CircuitBreaker(
+            router_config.get("BREAKER_FAILURES", 5),
+            router_config.get("BREAKER_COOLDOWN", 30)
+        ),
+    )
+
 
-def call_llm(prompt: str) -> str:
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "user", "content": prompt}
+# Model tiers (see analyzer/tiering.py). Each tier routes over the
+# LLM_BACKENDS listed in its BACKENDS (default: all) with its MODEL.
+DEFAULT_TIERS = {
+    "fast": {"MODEL": MODEL},
+    "strong": {"MODEL": MODEL},
+}
+
+_routers = {}
+_router_lock = threading.Lock()
+
+
+def get_tiers() -> dict:
+    return get_setting("LLM_TIERS", DEFAULT_TIERS)
+
+
+def build_router(tier: str = None) -> Router:
+    router_config = get_setting("LLM_ROUTER", {})
+    backend_configs = get_setting("LLM_BACKENDS", DEFAULT_BACKENDS)
+
+    if tier is not None:
+        tier_config = get_tiers()[tier]
+        names = tier_config.get("BACKENDS")
+        backend_configs = [
+            {**config, "MODEL": tier_config.get("MODEL", config["MODEL"])}
+            for config in backend_configs
+            if names is None or config["NAME"] in names
         ]
+
+    return Router(
+        [build_backend(config, router_config) for config in backend_configs],
+        hedge_quantile=router_config.get("HEDGE_QUANTILE", 0.95),
+        hedge_min_samples=router_config.get("HEDGE_MIN_SAMPLES", 20),
+        backoff_base=router_config.get("BACKOFF_BASE", 0.25),
+        backoff_max=router_config.get("BACKOFF_MAX", 4),
     )
-    return response.choices[0].message.content
 
+
+def tier_model(tier: str) -> str:
+    # The model(s) a tier's router calls, as build_router picks them; part
+    # of the response cache key, so tiers on different models do not share
+    # answers.
+    tier_config = get_tiers().get(tier, {})
+    names = tier_config.get("BACKENDS")
+    models = {
+        tier_config.get("MODEL", config["MODEL"])
+        for config in get_setting("LLM_BACKENDS", DEFAULT_BACKENDS)
+        if names is None or config["NAME"] in names
+    }
+    return ",".join(sorted(models)) or MODEL
+
+
+def get_router(tier: str = None) -> Router:
+    # One router per tier; tier=None uses LLM_BACKENDS as configured.
+    router = _routers.get(tier)
+
+    if router is None:
+        with _router_lock:
+            router = _routers.get(tier)
+            if router is None:
+                router = _routers[tier] = build_router(tier)
+
+    return router
+
+
+def completion_options(response_format) -> dict:
+    # Only send response_format when structured output is wanted.
+    return {"response_format": response_format} if response_format else {}
+
+
+def complete(messages: list, response_format: dict = None, tier: str = None) -> LLMResult:
+    return get_router(tier).complete(messages, **completion_options(response_format))
+
+
+def call_llm(messages: list, response_format: dict = None, tier: str = None) -> str:
+    return complete(messages, response_format, tier).text
+
+
+def stream_llm(messages: list, tier: str = None):
+    yield from get_router(tier).stream(messages)
+
+
+async def acomplete(messages: list, response_format: dict = None, tier: str = None) -> LLMResult:
+    return await get_router(tier).acomplete(messages, **completion_options(response_format))
+
+
+async def acall_llm(messages: list, response_format: dict = None, tier: str = None) -> str:
+    return (await acomplete(messages, response_format, tier)).text
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.models import CodeSubmission
+from analyzer.similarity import index_submissions
+
+
+class Command(BaseCommand):
+    help = "Fingerprints answered submissions saved before the similarity index existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        pending = CodeSubmission.objects.filter(fingerprint__isnull=True, response_meta__isnull=False) \
+            .select_related("code_blob", "response_blob", "fixed_code_blob").order_by("pk")
+
+        last_pk = 0
+        seen = 0
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk)[:options["batch_size"]])
+            if not batch:
+                break
+            index_submissions(batch)
+            last_pk = batch[-1].pk
+            seen += len(batch)
+
+        self.stdout.write(f"Checked {seen} submissions")
@@ -0,0 +1,31 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from analyzer.jobs import run_workers
+
+
+class Command(BaseCommand):
+    help = "Runs background debug jobs (POST /debug/ with \"async\": true) from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4,
+                            help="worker threads in this process; start more processes to scale out")
+        parser.add_argument("--burst", action="store_true",
+                            help="exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        # Finish the jobs in progress, then exit. A worker killed outright is
+        # covered by the lease: its job is queued again once the lease expires.
+        def shutdown(signum, frame):
+            self.stdout.write("Stopping after the current jobs...")
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        self.stdout.write(f"Running {options['threads']} debug workers")
+        run_workers(options["threads"], stop, burst=options["burst"])
@@ -0,0 +1,277 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .conf import get_setting
+
+# In-process request metrics, exposed in Prometheus text format at /metrics/.
+# Recording a sample is a dict lookup, a bisect and a locked increment, so
+# timers stay on in production. Like /debug/stats/, the numbers are per
+# worker process; scrape every worker (or run one) to see them all.
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "TIMING_HEADER": True,
+    "TOKEN": None,
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CONFIG, **get_setting("METRICS", {})}
+
+
+# ================= METRIC TYPES =================
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield self.name, format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: [count per bucket (last one is +Inf), sum].
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(label_values, list(counts), total) for label_values, (counts, total) in self._values.items()]
+
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield self.name + "_bucket", format_labels(self.labels, label_values, f'le="{bound}"'), cumulative
+            yield self.name + "_sum", format_labels(self.labels, label_values), total
+            yield self.name + "_count", format_labels(self.labels, label_values), cumulative
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+REQUESTS = register(Counter(
+    "analyzer_requests_total", "HTTP requests by view and status.", ("view", "status")
+))
+REQUEST_SECONDS = register(Histogram(
+    "analyzer_request_duration_seconds", "Time to build the response, by view.", ("view",)
+))
+STAGE_SECONDS = register(Histogram(
+    "analyzer_stage_duration_seconds", "Time spent in each processing stage.", ("stage",)
+))
+LLM_TOKENS = register(Histogram(
+    "analyzer_llm_tokens", "Tokens per LLM call, by tier and direction.", ("tier", "direction"), TOKEN_BUCKETS
+))
+RATE_LIMIT = register(Counter(
+    "analyzer_rate_limit_total", "Rate-limit checks by outcome.", ("result",)
+))
+REJECTIONS = register(Counter(
+    "analyzer_screening_rejections_total", "Rejected requests by screening stage.", ("reason",)
+))
+ANSWERS = register(Counter(
+    "analyzer_answers_total", "Answers returned, by source and confidence.", ("source", "confidence")
+))
+
+
+# ================= TIMERS =================
+
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def record_stage(stage: str, elapsed: float) -> None:
+    # Records the stage in STAGE_SECONDS and, inside a request, in its
+    # Server-Timing header.
+    STAGE_SECONDS.observe(elapsed, stage)
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, elapsed))
+
+
+class timer:
+    # with timer("llm"): ...
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_stage(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+# ================= MIDDLEWARE =================
+
+def view_label(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "unmatched"
+
+
+def server_timing(timings: list, total: float) -> str:
+    entries = [f"{stage.replace('_', '-')};dur={seconds * 1000:.3f}" for stage, seconds in timings]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+def finish_request(request, response, started: float, timings: list, timing_header: bool) -> None:
+    elapsed = time.perf_counter() - started
+    view = view_label(request)
+    REQUESTS.inc(view, response.status_code)
+    REQUEST_SECONDS.observe(elapsed, view)
+
+    # Streaming responses are timed until their headers are ready.
+    if timing_header:
+        response["Server-Timing"] = server_timing(timings, elapsed)
+
+
+class MetricsMiddleware:
+    # Counts and times every request, and adds the stages timed during the
+    # request to its Server-Timing header (METRICS["TIMING_HEADER"]).
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timing_header = get_config()["TIMING_HEADER"]
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+
+        finish_request(request, response, started, timings, self.timing_header)
+        return response
+
+    async def __acall__(self, request):
+        timings = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+
+        finish_request(request, response, started, timings, self.timing_header)
+        return response
+
+
+# ================= EXPOSITION =================
+
+def folded_metrics():
+    # Counters kept elsewhere, read at scrape time: the response cache, its
+    # request coalescing and the per-tier call statistics from
+    # analyzer/tiering.py.
+    from .cache import get_response_cache
+    from .tiering import tier_stats
+
+    response_cache = get_response_cache()
+    cache = response_cache.stats()
+    yield ("analyzer_response_cache_lookups_total", "counter", "Response cache lookups by result.", [
+        ('{result="hit"}', cache["hits"]),
+        ('{result="miss"}', cache["misses"]),
+    ])
+
+    if response_cache.flight is not None:
+        flight = response_cache.flight.stats()
+        yield ("analyzer_upstream_calls_saved_total", "counter",
+               "LLM calls avoided by joining an identical in-flight request.", [
+                   (format_labels(("scope",), (scope,)), count) for scope, count in flight["saved"].items()
+               ])
+
+    tiers = tier_stats.snapshot()
+    for name, key, help in (
+        ("analyzer_tier_calls_total", "calls", "LLM calls per model tier."),
+        ("analyzer_tier_errors_total", "errors", "Failed LLM calls per model tier."),
+        ("analyzer_tier_escalations_total", "escalated", "Answers retried on the next tier."),
+        ("analyzer_tier_prompt_tokens_total", "prompt_tokens", "Prompt tokens per model tier."),
+        ("analyzer_tier_completion_tokens_total", "completion_tokens", "Completion tokens per model tier."),
+        ("analyzer_tier_cost_usd_total", "cost", "Estimated LLM cost in USD per model tier."),
+    ):
+        yield (name, "counter", help, [
+            (format_labels(("tier",), (tier,)), stats[key]) for tier, stats in tiers.items()
+        ])
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+
+    for name, kind, help, samples in folded_metrics():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value}")
+
+    return "\n".join(lines) + "\n"
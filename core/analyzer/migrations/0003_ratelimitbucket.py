@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0002_codesubmission_ai_response_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=200)),
+                ('window', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window'], name='ratelimit_window_idx')],
+                'constraints': [models.UniqueConstraint(fields=('key', 'window'), name='unique_ratelimit_bucket')],
+            },
+        ),
+    ]
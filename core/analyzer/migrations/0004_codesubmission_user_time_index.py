@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_ratelimitbucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='codesubmission',
+            index=models.Index(fields=['user', '-submitted_at', '-id'], name='submission_user_time_idx'),
+        ),
+    ]
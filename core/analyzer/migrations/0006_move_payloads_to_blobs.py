@@ -0,0 +1,138 @@
+import hashlib
+import zlib
+
+from django.db import migrations
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BATCH_SIZE = 500
+
+
+# Frozen copy of analyzer/blobs.py as of this migration, so later changes to
+# the live encoding do not change what it does. Always writes zlib (or
+# "none"); reads whatever the Blob rows hold.
+
+ZLIB_LEVEL = 6
+
+
+def encode_text(text):
+    data = text.encode("utf-8")
+    payload, compression = zlib.compress(data, ZLIB_LEVEL), "zlib"
+    if len(payload) >= len(data):
+        payload, compression = data, "none"
+    return {
+        "hash": hashlib.sha256(data).hexdigest(),
+        "data": payload,
+        "compression": compression,
+        "size": len(data),
+    }
+
+
+def decode_text(payload, compression):
+    payload = bytes(payload)
+    if compression == "zlib":
+        payload = zlib.decompress(payload)
+    elif compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This blob is zstd-compressed; install the zstandard package to read it.")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif compression != "none":
+        raise ValueError(f"Unknown blob compression: {compression}")
+    return payload.decode("utf-8")
+
+
+def split_response(ai_response):
+    # The answer text is what repeats across submissions; the rest
+    # (timestamp, confidence, ...) is small and stays inline.
+    if ai_response is None:
+        return None, None
+    meta = dict(ai_response)
+    result = meta.pop("result", None)
+    return result, meta
+
+
+def move_to_blobs(apps, schema_editor):
+    Blob = apps.get_model("analyzer", "Blob")
+    CodeSubmission = apps.get_model("analyzer", "CodeSubmission")
+
+    submissions = CodeSubmission.objects.filter(code_blob__isnull=True).order_by("pk")
+    batch = []
+
+    for submission in submissions.iterator(chunk_size=BATCH_SIZE):
+        batch.append(submission)
+        if len(batch) == BATCH_SIZE:
+            convert_batch(Blob, CodeSubmission, batch)
+            batch = []
+
+    if batch:
+        convert_batch(Blob, CodeSubmission, batch)
+
+
+def convert_batch(Blob, CodeSubmission, submissions):
+    blobs = {}
+
+    for submission in submissions:
+        fields = encode_text(submission.code)
+        blobs[fields["hash"]] = Blob(**fields)
+        submission.code_blob_id = fields["hash"]
+
+        result, meta = split_response(submission.ai_response)
+        submission.response_meta = meta
+        if result is not None:
+            fields = encode_text(result)
+            blobs[fields["hash"]] = Blob(**fields)
+            submission.response_blob_id = fields["hash"]
+
+    Blob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+    CodeSubmission.objects.bulk_update(
+        submissions, ["code_blob", "response_blob", "response_meta"]
+    )
+
+
+def restore_from_blobs(apps, schema_editor):
+    Blob = apps.get_model("analyzer", "Blob")
+    CodeSubmission = apps.get_model("analyzer", "CodeSubmission")
+
+    submissions = CodeSubmission.objects.filter(code_blob__isnull=False).order_by("pk")
+    batch = []
+
+    for submission in submissions.iterator(chunk_size=BATCH_SIZE):
+        batch.append(submission)
+        if len(batch) == BATCH_SIZE:
+            restore_batch(Blob, CodeSubmission, batch)
+            batch = []
+
+    if batch:
+        restore_batch(Blob, CodeSubmission, batch)
+
+
+def restore_batch(Blob, CodeSubmission, submissions):
+    hashes = {s.code_blob_id for s in submissions} | {s.response_blob_id for s in submissions}
+    blobs = Blob.objects.in_bulk([h for h in hashes if h])
+
+    for submission in submissions:
+        code_blob = blobs[submission.code_blob_id]
+        submission.code = decode_text(code_blob.data, code_blob.compression)
+
+        if submission.response_meta is not None:
+            response = dict(submission.response_meta)
+            if submission.response_blob_id:
+                response_blob = blobs[submission.response_blob_id]
+                response["result"] = decode_text(response_blob.data, response_blob.compression)
+            submission.ai_response = response
+
+    CodeSubmission.objects.bulk_update(submissions, ["code", "ai_response"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_blob_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_to_blobs, restore_from_blobs),
+    ]
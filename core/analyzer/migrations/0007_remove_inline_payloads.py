@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0006_move_payloads_to_blobs'),
+    ]
+
+    operations = [
+        # Give `code` a default first so this migration can be reversed on
+        # tables that already have rows.
+        migrations.AlterField(
+            model_name='codesubmission',
+            name='code',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='codesubmission',
+            name='ai_response',
+        ),
+        migrations.RemoveField(
+            model_name='codesubmission',
+            name='code',
+        ),
+    ]
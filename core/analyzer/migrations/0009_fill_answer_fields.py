@@ -0,0 +1,235 @@
+import hashlib
+import json
+import re
+import zlib
+
+from django.db import migrations
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BATCH_SIZE = 500
+
+ANSWER_FIELDS = ["response_meta", "error_type", "confidence", "reason", "problem_line", "fixed_code_blob"]
+
+
+# ================= FROZEN HELPERS =================
+# Copies of analyzer/blobs.py and analyzer/parsing.py (with
+# analyzer/sections.py) as of this migration, so later changes to the live
+# encoding or parser do not change what it does.
+
+ZLIB_LEVEL = 6
+
+
+def encode_text(text):
+    data = text.encode("utf-8")
+    payload, compression = zlib.compress(data, ZLIB_LEVEL), "zlib"
+    if len(payload) >= len(data):
+        payload, compression = data, "none"
+    return {
+        "hash": hashlib.sha256(data).hexdigest(),
+        "data": payload,
+        "compression": compression,
+        "size": len(data),
+    }
+
+
+def decode_text(payload, compression):
+    payload = bytes(payload)
+    if compression == "zlib":
+        payload = zlib.decompress(payload)
+    elif compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This blob is zstd-compressed; install the zstandard package to read it.")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif compression != "none":
+        raise ValueError(f"Unknown blob compression: {compression}")
+    return payload.decode("utf-8")
+
+
+FIELDS = {
+    "full": {
+        "reason": str,
+        "problem_line": (int, type(None)),
+        "problem_snippet": str,
+        "explanation": str,
+        "fixed_code": str,
+        "example": str,
+    },
+    "hint": {
+        "hints": str,
+    },
+}
+
+HEADER_FIELDS = {
+    "ERROR_REASON": "reason",
+    "PROBLEM_LINE": "problem_snippet",
+    "EXPLANATION": "explanation",
+    "FIXED_CODE": "fixed_code",
+    "EXAMPLE": "example",
+    "HINTS": "hints",
+}
+
+HEADER_RE = re.compile(r"^\s*(" + "|".join(HEADER_FIELDS) + r"):(.*)$")
+
+LINE_NUMBER_RE = re.compile(r"^\W*line\s+(\d+)\b\s*[:\-–]?\s*", re.IGNORECASE)
+
+
+def empty_sections(mode):
+    return {name: None if name == "problem_line" else "" for name in FIELDS[mode]}
+
+
+def valid_line(line):
+    # problem_line is a PositiveIntegerField.
+    return line if line is not None and line >= 1 else None
+
+
+def parse_json_answer(text, mode):
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Answer is not a JSON object")
+
+    sections = empty_sections(mode)
+    for name in sections:
+        value = data.get(name, sections[name])
+        if not isinstance(value, FIELDS[mode][name]) or isinstance(value, bool):
+            raise ValueError(f"Invalid value for {name}")
+        sections[name] = value
+    if "problem_line" in sections:
+        sections["problem_line"] = valid_line(sections["problem_line"])
+    return sections
+
+
+def text_sections(text):
+    # [(header, content)] in order; a section runs until the next header.
+    found = []
+    current, lines = None, []
+    for line in text.split("\n"):
+        match = HEADER_RE.match(line)
+        if not match:
+            if current:
+                lines.append(line)
+            continue
+        if current:
+            found.append((current, "\n".join(lines).strip()))
+        current = match.group(1)
+        rest = match.group(2).strip()
+        # Drop decorations such as "FIXED_CODE: 🛠️" but keep inline text.
+        lines = [rest] if any(ch.isalnum() for ch in rest) else []
+    if current:
+        found.append((current, "\n".join(lines).strip()))
+    return found
+
+
+def parse_text_answer(text, mode):
+    sections = empty_sections(mode)
+    found = text_sections(text)
+    for header, content in found:
+        name = HEADER_FIELDS[header]
+        if name in sections:
+            sections[name] = content
+
+    if mode == "hint" and not found:
+        sections["hints"] = text.strip()
+
+    if "problem_snippet" in sections:
+        match = LINE_NUMBER_RE.match(sections["problem_snippet"])
+        if match:
+            sections["problem_line"] = valid_line(int(match.group(1)))
+            sections["problem_snippet"] = sections["problem_snippet"][match.end():]
+    return sections
+
+
+def parse_answer(text, mode):
+    mode = "hint" if mode == "hint" else "full"
+    if text.lstrip().startswith("{"):
+        try:
+            return parse_json_answer(text, mode)
+        except ValueError:
+            pass
+    return parse_text_answer(text, mode)
+
+
+# ================= MIGRATION =================
+
+def in_batches(queryset):
+    batch = []
+    for submission in queryset.iterator(chunk_size=BATCH_SIZE):
+        batch.append(submission)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fill_answer_fields(apps, schema_editor):
+    Blob = apps.get_model("analyzer", "Blob")
+    CodeSubmission = apps.get_model("analyzer", "CodeSubmission")
+
+    submissions = CodeSubmission.objects.filter(response_meta__isnull=False).order_by("pk")
+    for batch in in_batches(submissions.select_related("response_blob")):
+        fill_batch(Blob, CodeSubmission, batch)
+
+
+def fill_batch(Blob, CodeSubmission, submissions):
+    # Older answers are header-format text; parse them once here instead
+    # of on every read.
+    blobs = {}
+
+    for submission in submissions:
+        meta = dict(submission.response_meta)
+        submission.error_type = meta.pop("error_type", "") or ""
+        submission.confidence = meta.pop("confidence", "") or ""
+        meta["sections"] = None
+
+        blob = submission.response_blob
+        if blob is not None and submission.confidence != "low":
+            result = decode_text(blob.data, blob.compression)
+            sections = parse_answer(result, meta.get("mode", "full"))
+            submission.reason = sections.pop("reason", "")
+            submission.problem_line = sections.pop("problem_line", None)
+            fixed_code = sections.pop("fixed_code", "")
+            meta["sections"] = sections
+
+            if fixed_code:
+                fields = encode_text(fixed_code)
+                blobs[fields["hash"]] = Blob(**fields)
+                submission.fixed_code_blob_id = fields["hash"]
+
+        submission.response_meta = meta
+
+    Blob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+    CodeSubmission.objects.bulk_update(submissions, ANSWER_FIELDS)
+
+
+def clear_answer_fields(apps, schema_editor):
+    CodeSubmission = apps.get_model("analyzer", "CodeSubmission")
+
+    submissions = CodeSubmission.objects.filter(response_meta__isnull=False).order_by("pk")
+    for batch in in_batches(submissions):
+        for submission in batch:
+            meta = dict(submission.response_meta)
+            meta.pop("sections", None)
+            meta["error_type"] = submission.error_type
+            meta["confidence"] = submission.confidence
+            submission.response_meta = meta
+            submission.error_type = ""
+            submission.confidence = ""
+            submission.reason = ""
+            submission.problem_line = None
+            submission.fixed_code_blob_id = None
+        CodeSubmission.objects.bulk_update(batch, ANSWER_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0008_answer_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_answer_fields, clear_answer_fields),
+    ]
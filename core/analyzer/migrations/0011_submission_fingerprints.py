@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0010_debug_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionFingerprint',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='analyzer.codesubmission')),
+                ('canonical_hash', models.CharField(max_length=68)),
+                ('signature', models.BinaryField()),
+                ('error_type', models.CharField(blank=True, default='', max_length=50)),
+                ('mode', models.CharField(default='full', max_length=10)),
+                ('error_statement', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['canonical_hash', 'error_type', 'mode'], name='fingerprint_exact_idx')],
+            },
+        ),
+    ]
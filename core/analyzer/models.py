@@ -1,18 +1,300 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .blobs import decode_text, encode_text
+from .parsing import render_answer
+
+
+class Blob(models.Model):
+    # Compressed, deduplicated payload (submitted code or an LLM answer),
+    # keyed by the SHA-256 of its uncompressed bytes. See analyzer/blobs.py.
+    hash = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()
+    compression = models.CharField(max_length=10, default="zlib")
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.hash[:12]} ({self.size} bytes, {self.compression})"
+
+
+def rendered_sections(response: dict):
+    # The answer text the response's sections render to, or None.
+    try:
+        return render_answer(response["sections"], response.get("mode"))
+    except (KeyError, TypeError):
+        return None
+
+
+class CodeSubmissionManager(models.Manager):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        CodeSubmission.store_pending_blobs(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
 
 class CodeSubmission(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    code = models.TextField()
     language = models.CharField(max_length=50, default='python')
     error_message = models.TextField(blank=True, null=True)
-    ai_response = models.JSONField(blank=True, null=True)
+    # The code and the LLM answer text live in deduplicated blobs; the rest
+    # of the response (timestamp, confidence, ...) stays inline. An answer
+    # text that is just its sections rendered is not stored (the fixed code
+    # would be kept twice) and is rendered again on read. Use the `code` and
+    # `ai_response` properties rather than these fields.
+    code_blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, related_name="+")
+    response_blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name="+")
+    response_meta = models.JSONField(blank=True, null=True)
+    # Typed answer fields, split out of the response when it is saved so
+    # history and analytics queries can filter without reading any blobs.
+    error_type = models.CharField(max_length=50, blank=True, default="")
+    confidence = models.CharField(max_length=10, blank=True, default="")
+    reason = models.TextField(blank=True, default="")
+    problem_line = models.PositiveIntegerField(blank=True, null=True)
+    fixed_code_blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name="+")
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CodeSubmissionManager()
+
+    class Meta:
+        indexes = [
+            # Serves the per-user history list and its keyset pagination.
+            models.Index(fields=["user", "-submitted_at", "-id"], name="submission_user_time_idx"),
+            models.Index(fields=["user", "error_type"], name="submission_user_type_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.language}"
-    
 
+    # ================= BLOB-BACKED FIELDS =================
+
+    @property
+    def code(self) -> str:
+        if not hasattr(self, "_code"):
+            blob = self.code_blob
+            self._code = decode_text(blob.data, blob.compression) if blob else ""
+        return self._code
+
+    @code.setter
+    def code(self, value: str):
+        self._code = value
+        self._pending_code = value
+
+    @property
+    def fixed_code(self) -> str:
+        blob = self.fixed_code_blob
+        return decode_text(blob.data, blob.compression) if blob else ""
+
+    @property
+    def ai_response(self):
+        if not hasattr(self, "_ai_response"):
+            if self.response_meta is None:
+                self._ai_response = None
+            else:
+                self._ai_response = self._assemble_response()
+        return self._ai_response
+
+    @ai_response.setter
+    def ai_response(self, value):
+        self._ai_response = value
+        self._pending_response = value
+
+    def _assemble_response(self) -> dict:
+        response = dict(self.response_meta)
+        blob = self.response_blob
+        if blob is not None:
+            response["result"] = decode_text(blob.data, blob.compression)
+
+        response["error_type"] = self.error_type
+        response["confidence"] = self.confidence
+
+        sections = response.get("sections")
+        if sections is not None and response.get("mode") != "hint":
+            response["sections"] = {
+                "reason": self.reason,
+                "problem_line": self.problem_line,
+                **sections,
+                "fixed_code": self.fixed_code,
+            }
+        if blob is None and response.get("sections") is not None:
+            response["result"] = render_answer(response["sections"], response.get("mode"))
+        return response
+
+    def save(self, *args, **kwargs):
+        self.store_pending_blobs([self])
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def store_pending_blobs(cls, submissions):
+        # Writes the blobs for unsaved code/response values with a single
+        # INSERT ... ON CONFLICT DO NOTHING and points the rows at them.
+        blobs = {}
+
+        for submission in submissions:
+            if hasattr(submission, "_pending_code"):
+                fields = encode_text(submission._pending_code)
+                blobs[fields["hash"]] = Blob(**fields)
+                submission.code_blob_id = fields["hash"]
+                del submission._pending_code
 
+            if hasattr(submission, "_pending_response"):
+                response = submission._pending_response
+                del submission._pending_response
+                if response is None:
+                    submission.response_meta = None
+                    submission.response_blob_id = None
+                    continue
 
+                meta = dict(response)
+                result = meta.pop("result", None)
+                submission.error_type = meta.pop("error_type", "") or ""
+                submission.confidence = meta.pop("confidence", "") or ""
 
+                sections = dict(meta.get("sections") or {})
+                submission.reason = sections.pop("reason", "")
+                submission.problem_line = sections.pop("problem_line", None)
+                fixed_code = sections.pop("fixed_code", "")
+                if meta.get("sections") is not None:
+                    meta["sections"] = sections
+
+                submission.response_meta = meta
+                submission.response_blob_id = None
+                submission.fixed_code_blob_id = None
+                if result is not None and result == rendered_sections(response):
+                    result = None
+                if result is not None:
+                    fields = encode_text(result)
+                    blobs[fields["hash"]] = Blob(**fields)
+                    submission.response_blob_id = fields["hash"]
+                if fixed_code:
+                    fields = encode_text(fixed_code)
+                    blobs[fields["hash"]] = Blob(**fields)
+                    submission.fixed_code_blob_id = fields["hash"]
+
+        if blobs:
+            Blob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+
+
+class SubmissionFingerprint(models.Model):
+    # Similarity fingerprint of an answered submission, for reusing its
+    # answer on near-duplicates. See analyzer/similarity.py.
+    submission = models.OneToOneField(
+        CodeSubmission, on_delete=models.CASCADE, primary_key=True, related_name="fingerprint"
+    )
+    canonical_hash = models.CharField(max_length=68)
+    signature = models.BinaryField()
+    error_type = models.CharField(max_length=50, blank=True, default="")
+    mode = models.CharField(max_length=10, default="full")
+    # Where the traceback points, as a position in the canonical form.
+    error_statement = models.PositiveIntegerField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["canonical_hash", "error_type", "mode"], name="fingerprint_exact_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.submission_id}: {self.canonical_hash[:16]}"
+
+
+class RateLimitBucket(models.Model):
+    # Request count for one rate-limit key in one fixed window.
+    key = models.CharField(max_length=200)
+    window = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "window"], name="unique_ratelimit_bucket"),
+        ]
+        indexes = [
+            models.Index(fields=["window"], name="ratelimit_window_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} @ {self.window}: {self.count}"
+
+
+class DebugJob(models.Model):
+    # A /debug/ request run in the background by `manage.py run_debug_workers`.
+    # See analyzer/jobs.py for the queue protocol.
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    # Lower runs first.
+    INTERACTIVE = 0
+    BATCH = 10
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.PositiveSmallIntegerField(default=INTERACTIVE)
+    # Identical active jobs (same user, code, error, options and callback URL)
+    # share one row.
+    dedup_key = models.CharField(max_length=64)
+    payload = models.JSONField()
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+    submission = models.ForeignKey(CodeSubmission, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    callback_url = models.URLField(max_length=500, blank=True, default="")
+    callback_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # A running job whose lease has expired is assumed lost with its worker
+    # and is queued again.
+    worker = models.CharField(max_length=100, blank=True, default="")
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="unique_active_debugjob",
+            ),
+        ]
+        indexes = [
+            # Serves the claim query: next queued job by priority, then age.
+            models.Index(fields=["status", "priority", "created_at"], name="debugjob_claim_idx"),
+            models.Index(fields=["status", "lease_expires_at"], name="debugjob_lease_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.pk} ({self.status})"
+
+
+class DebugSession(models.Model):
+    # Conversation state for follow-up requests ("next hint", "show fix") on
+    # an answered submission. See analyzer/sessions.py.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    mode = models.CharField(max_length=10, default="hint")
+    tier = models.CharField(max_length=20, blank=True, default="")
+    error_type = models.CharField(max_length=50, blank=True, default="")
+    # Chat messages after the system prompt; older turns are folded into
+    # a summary message once they exceed the token budget.
+    messages = models.JSONField(default=list)
+    summary = models.TextField(blank=True, default="")
+    turns = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"], name="debugsession_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.pk} ({self.mode}, {self.turns} turns)"
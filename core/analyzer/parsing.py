@@ -0,0 +1,198 @@
+import json
+import re
+
+from .sections import SectionStreamParser
+
+# Turns a model answer into typed fields. Non-streaming calls ask for JSON
+# matching RESPONSE_SCHEMAS and are checked in a single pass; streamed
+# answers, static answers and anything stored before structured output fall
+# back to the ERROR_REASON: / PROBLEM_LINE: / ... header format.
+
+FIELDS = {
+    "full": {
+        "reason": str,
+        "problem_line": (int, type(None)),
+        "problem_snippet": str,
+        "explanation": str,
+        "fixed_code": str,
+        "example": str,
+    },
+    "hint": {
+        "hints": str,
+    },
+}
+
+CONFIDENCE_LEVELS = ["high", "low"]
+
+JSON_TYPES = {str: "string", int: "integer", type(None): "null"}
+
+
+def _schema(fields: dict) -> dict:
+    properties = {}
+    for name, types in fields.items():
+        types = types if isinstance(types, tuple) else (types,)
+        names = [JSON_TYPES[t] for t in types]
+        properties[name] = {"type": names[0] if len(names) == 1 else names}
+        if int in types:
+            properties[name]["minimum"] = 1
+    properties["confidence"] = {"type": "string", "enum": CONFIDENCE_LEVELS}
+
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+
+
+RESPONSE_SCHEMAS = {mode: _schema(fields) for mode, fields in FIELDS.items()}
+
+
+def response_format(mode: str) -> dict:
+    # The `response_format` argument for chat.completions.create.
+    mode = "hint" if mode == "hint" else "full"
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": f"debug_{mode}_answer",
+            "strict": True,
+            "schema": RESPONSE_SCHEMAS[mode],
+        },
+    }
+
+
+# ================= CONFIDENCE CHECK =================
+
+LOW_CONFIDENCE_PHRASES = [
+    "not sure",
+    "might be",
+    "possibly",
+    "cannot determine",
+    "unclear",
+    "guess"
+]
+
+def is_low_confidence(response: str) -> bool:
+    response = response.strip()
+
+    if response.startswith(
+        "ERROR_REASON: Unable to determine confidently"
+    ):
+        return True
+
+    response_lower = response.lower()
+    return any(phrase in response_lower for phrase in LOW_CONFIDENCE_PHRASES)
+
+
+# ================= PARSING =================
+
+HEADER_FIELDS = {
+    "ERROR_REASON": "reason",
+    "PROBLEM_LINE": "problem_snippet",
+    "EXPLANATION": "explanation",
+    "FIXED_CODE": "fixed_code",
+    "EXAMPLE": "example",
+    "HINTS": "hints",
+}
+
+LINE_NUMBER_RE = re.compile(r"^\W*line\s+(\d+)\b\s*[:\-–]?\s*", re.IGNORECASE)
+
+
+def valid_line(line):
+    # Line numbers are 1-based (and stored in a PositiveIntegerField); the
+    # model may still send 0 or a negative number.
+    return line if line is not None and line >= 1 else None
+
+
+def empty_sections(mode: str) -> dict:
+    return {
+        name: None if name == "problem_line" else ""
+        for name in FIELDS["hint" if mode == "hint" else "full"]
+    }
+
+
+def parse_json_answer(text: str, mode: str) -> dict:
+    # Raises ValueError when the text is not an answer object for this mode.
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Answer is not a JSON object")
+
+    sections = empty_sections(mode)
+    for name in sections:
+        value = data.get(name, sections[name])
+        # bool is an int subclass; a line number of True is not valid.
+        if not isinstance(value, FIELDS[mode][name]) or isinstance(value, bool):
+            raise ValueError(f"Invalid value for {name}")
+        sections[name] = value
+    if "problem_line" in sections:
+        sections["problem_line"] = valid_line(sections["problem_line"])
+
+    confidence = data.get("confidence", "high")
+    if confidence not in CONFIDENCE_LEVELS:
+        raise ValueError("Invalid confidence")
+
+    return {"format": "json", "confidence": confidence, "sections": sections}
+
+
+def parse_text_answer(text: str, mode: str) -> dict:
+    sections = empty_sections(mode)
+
+    parser = SectionStreamParser()
+    found = parser.feed(text) + parser.close()
+    for header, content in found:
+        name = HEADER_FIELDS[header]
+        if name in sections:
+            sections[name] = content
+
+    if mode == "hint" and not found:
+        sections["hints"] = text.strip()
+
+    if "problem_snippet" in sections:
+        match = LINE_NUMBER_RE.match(sections["problem_snippet"])
+        if match:
+            sections["problem_line"] = valid_line(int(match.group(1)))
+            sections["problem_snippet"] = sections["problem_snippet"][match.end():]
+
+    confidence = "low" if is_low_confidence(text) else "high"
+    return {"format": "text", "confidence": confidence, "sections": sections}
+
+
+def parse_answer(text: str, mode: str) -> dict:
+    # Returns {"format", "confidence", "sections"}.
+    mode = "hint" if mode == "hint" else "full"
+    if text.lstrip().startswith("{"):
+        try:
+            return parse_json_answer(text, mode)
+        except ValueError:
+            pass
+    return parse_text_answer(text, mode)
+
+
+# ================= RENDERING =================
+
+def render_answer(sections: dict, mode: str) -> str:
+    # The header format used by the streaming endpoint, the history page
+    # and the CLI.
+    if mode == "hint":
+        return f"HINTS:\n{sections['hints']}"
+
+    problem = sections["problem_snippet"]
+    if sections["problem_line"] is not None:
+        line = f"Line {sections['problem_line']}"
+        problem = f"{line}: {problem}" if problem else line
+
+    return (
+        f"ERROR_REASON: {sections['reason']}\n\n"
+        f"PROBLEM_LINE: {problem}\n\n"
+        f"EXPLANATION: {sections['explanation']}\n\n"
+        f"FIXED_CODE: 🛠️\n{sections['fixed_code']}\n\n"
+        f"EXAMPLE: ✅\n{sections['example']}"
+    )
+
+
+def answer_text(text: str, mode: str) -> str:
+    # Header-format text for an answer that may have been stored as JSON.
+    parsed = parse_answer(text, mode)
+    if parsed["format"] == "json":
+        return render_answer(parsed["sections"], mode)
+    return text
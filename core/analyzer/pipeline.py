@@ -0,0 +1,224 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from .cache import get_response_cache, make_cache_key
+from .error_utils import detect_python_error, parse_error
+from .llm import tier_model
+from .metrics import ANSWERS, timer
+from .parsing import parse_answer, render_answer, response_format
+from .prompts import build_messages
+from .sandbox import execution_error, execution_summary, get_sandbox_pool
+from .screening import Screening
+from .similarity import similar_answer
+from .slicing import prompt_excerpt
+from .static_checks import answer_locally
+from .tiering import acomplete_tiered, choose_tier, complete_tiered
+
+# The per-submission steps shared by the web views and the CLI. Only the
+# similarity lookup touches the ORM, and it is skipped when Django is not
+# set up, so this runs without a configured Django project.
+
+NO_ERROR_MESSAGE = "No explicit error message provided. Analyze the code and infer possible issues."
+
+
+# ================= INPUT VALIDATION =================
+
+def validate_code(code: str, error: str = ""):
+    # Returns (message, status) for rejected input, otherwise None.
+    # The stages and their limits live in analyzer/screening.py.
+    return Screening().screen_input(code, error)
+
+
+# ================= PREPARATION =================
+
+def prepare_item(code: str, error: str = "", mode: str = "full", execute: bool = False) -> dict:
+    with timer("compile"):
+        detected_error = detect_python_error(code)
+
+    error = (error or "").strip()
+    execution = None
+    error_source = "compile" if detected_error else "user" if error else "none"
+
+    # EXECUTION (runtime traceback from the sandbox pool)
+    if execute and not detected_error and not error:
+        with timer("execute"):
+            run = get_sandbox_pool().run(code)
+        execution = execution_summary(run)
+        detected_error = execution_error(run)
+        if detected_error:
+            error_source = "runtime"
+
+    no_error_given = not detected_error and not error
+
+    if detected_error:
+        error = detected_error
+    elif not error:
+        error = NO_ERROR_MESSAGE
+
+    # CLASSIFY ERROR (exception type and the line it points at)
+    with timer("classify"):
+        error_info = parse_error(error)
+    error_type = error_info.type if error_info else "UnknownError"
+
+    # STATIC ANALYSIS (answers common mistakes without the LLM)
+    with timer("static_checks"):
+        local_answer = answer_locally(code, mode) if no_error_given else None
+
+    # CONTEXT (long code is cut down to the failing parts for the prompt)
+    with timer("slice"):
+        excerpt = None if local_answer else prompt_excerpt(code, error)
+
+    item = {
+        "code": code,
+        "error": error,
+        "error_type": error_type,
+        "error_line": error_info.line if error_info else None,
+        "error_source": error_source,
+        "mode": mode,
+        "bypass_cache": False,
+        "local_answer": local_answer,
+        "execution": execution,
+        "excerpt": excerpt,
+    }
+
+    # MODEL TIER (the cache key depends on the tier's model)
+    item["tier"] = choose_tier(item)
+    item["cache_key"] = item_cache_key(item)
+    return item
+
+
+def item_cache_key(item: dict) -> str:
+    context = ""
+    if item.get("previous_analysis") is not None:
+        context = f"previous:{item['incremental']['previous']}"
+    return make_cache_key(
+        item["code"], item["error"], item["error_type"], item["mode"], tier_model(item["tier"]), context
+    )
+
+
+def item_messages(item: dict, structured: bool = True) -> list:
+    excerpt = item.get("excerpt")
+    code = excerpt.code if excerpt else item["code"]
+    previous = None
+    if item.get("previous_analysis") is not None:
+        previous = {"analysis": item["previous_analysis"], "changed_lines": item["incremental"]["changed_lines"]}
+    return build_messages(
+        code, item["error"], item["error_type"], item["mode"], structured, excerpt=bool(excerpt), previous=previous
+    )
+
+
+def resolve_item(item: dict):
+    # Returns (result, cache_hit).
+    if item["local_answer"]:
+        return item["local_answer"], False
+
+    def call():
+        # Near-duplicates of answered submissions reuse the stored answer.
+        with timer("similarity"):
+            answer = similar_answer(item)
+        if answer is not None:
+            return answer
+
+        with timer("prompt"):
+            messages = item_messages(item)
+        with timer("llm"):
+            return complete_tiered(item, messages, response_format(item["mode"]))
+
+    return get_response_cache().get_or_call(item["cache_key"], call, bypass=item["bypass_cache"])
+
+
+async def aresolve_item(item: dict):
+    # resolve_item for async views: the LLM round trip does not hold a thread.
+    if item["local_answer"]:
+        return item["local_answer"], False
+
+    async def call():
+        with timer("similarity"):
+            answer = await sync_to_async(similar_answer, thread_sensitive=False)(item)
+        if answer is not None:
+            return answer
+
+        with timer("prompt"):
+            messages = item_messages(item)
+        with timer("llm"):
+            return await acomplete_tiered(item, messages, response_format(item["mode"]))
+
+    return await get_response_cache().aget_or_call(item["cache_key"], call, bypass=item["bypass_cache"])
+
+
+def resolve_many(items: list, max_concurrency: int = 8):
+    # Yields (index, result, cache_hit, error) in input order, where error is
+    # the exception of a failed item (result is then None); one failed call
+    # does not stop the others. Identical items are sent upstream once; LLM
+    # calls run concurrently up to max_concurrency.
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {}
+        for item in items:
+            if item["cache_key"] not in futures:
+                futures[item["cache_key"]] = executor.submit(resolve_item, item)
+
+        for index, item in enumerate(items):
+            try:
+                result, cache_hit = futures[item["cache_key"]].result()
+            except Exception as exc:
+                yield index, None, False, exc
+                continue
+            yield index, result, cache_hit, None
+
+
+def item_error(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+# ================= RESPONSE =================
+
+LOW_CONFIDENCE_MESSAGE = "Unable to confidently diagnose the issue with the given information."
+
+
+def answer_source(item: dict) -> str:
+    if item["local_answer"]:
+        return "previous" if item.get("incremental", {}).get("reused") else "static"
+    return "history" if item.get("similar_to") else "llm"
+
+
+def build_response_data(result: str, item: dict, cache_hit: bool) -> dict:
+    # `result` is the answer as cached: a JSON object from structured
+    # output, or header-format text (streamed and static answers).
+    answer = parse_answer(result, item["mode"])
+
+    if answer["confidence"] == "low":
+        result = LOW_CONFIDENCE_MESSAGE
+        sections = None
+    else:
+        if answer["format"] == "json":
+            result = render_answer(answer["sections"], item["mode"])
+        sections = answer["sections"]
+
+    response_data = {
+        "result": result,
+        "sections": sections,
+        "error_type": item["error_type"],
+        "mode": item["mode"],
+        "confidence": answer["confidence"],
+        "source": answer_source(item),
+        "tier": item["tier"],
+        "cached": cache_hit,
+        "timestamp": time.time()
+    }
+
+    if item.get("execution"):
+        response_data["execution"] = item["execution"]
+
+    if item.get("similar_to"):
+        response_data["similar_to"] = item["similar_to"]
+
+    if item.get("incremental"):
+        response_data["incremental"] = item["incremental"]
+
+    if item.get("excerpt") and not item["local_answer"]:
+        response_data["excerpt"] = {"lines": item["excerpt"].lines, "total": item["excerpt"].total}
+
+    ANSWERS.inc("cache" if cache_hit else response_data["source"], answer["confidence"])
+    return response_data
@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .conf import get_setting
+
+# Sliding-window counters: each key keeps the request count for the current
+# and the previous fixed window, and the limit is checked against
+#     previous * (1 - elapsed_fraction) + current
+# which is O(1) per request regardless of the limit or traffic.
+
+
+def window_estimate(previous: int, current: int, now: float, window: float) -> float:
+    elapsed_fraction = (now % window) / window
+    return previous * (1 - elapsed_fraction) + current
+
+
+# ================= BACKENDS =================
+
+class LocMemBackend:
+    # Per-process counters. Keys are kept in last-seen order so idle ones are
+    # evicted from the front in amortized O(1), without a full scan.
+
+    def __init__(self):
+        self._state = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window: float, now: float) -> bool:
+        index = int(now // window)
+
+        with self._lock:
+            self._evict(index)
+
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = [index, 0, 0]
+            else:
+                self._state.move_to_end(key)
+
+            if state[0] != index:
+                state[2] = state[1] if state[0] == index - 1 else 0
+                state[1] = 0
+                state[0] = index
+
+            if window_estimate(state[2], state[1], now, window) >= limit:
+                return True
+
+            state[1] += 1
+            return False
+
+    def undo(self, key: str, window: float, now: float) -> None:
+        # Takes back a hit that was not rejected.
+        with self._lock:
+            state = self._state.get(key)
+            if state is not None and state[0] == int(now // window) and state[1] > 0:
+                state[1] -= 1
+
+    def _evict(self, index: int) -> None:
+        # A key whose last window is two or more windows old has no effect
+        # on the estimate any more.
+        while self._state:
+            key, state = next(iter(self._state.items()))
+            if state[0] >= index - 1:
+                break
+            del self._state[key]
+
+    def __len__(self):
+        return len(self._state)
+
+
+class DatabaseBackend:
+    # Counters in the analyzer_ratelimitbucket table, shared by every worker
+    # process. Increments are atomic UPDATE ... SET count = count + 1.
+
+    def __init__(self, evict_interval: float = 60):
+        self.evict_interval = evict_interval
+        self._last_evicted = 0.0
+
+    def hit(self, key: str, limit: int, window: float, now: float) -> bool:
+        from django.db import IntegrityError, transaction
+        from django.db.models import F
+
+        from .models import RateLimitBucket
+
+        index = int(now // window)
+        self._evict(index, now)
+
+        buckets = RateLimitBucket.objects.filter(key=key)
+        with transaction.atomic():
+            updated = buckets.filter(window=index).update(count=F("count") + 1)
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        RateLimitBucket.objects.create(key=key, window=index, count=1)
+                except IntegrityError:
+                    buckets.filter(window=index).update(count=F("count") + 1)
+
+            counts = dict(
+                buckets.filter(window__in=[index - 1, index]).values_list("window", "count")
+            )
+            current = counts.get(index, 0)
+            previous = counts.get(index - 1, 0)
+
+            # Undo our own increment so rejected requests are not counted.
+            if window_estimate(previous, current - 1, now, window) >= limit:
+                buckets.filter(window=index).update(count=F("count") - 1)
+                return True
+
+        return False
+
+    def undo(self, key: str, window: float, now: float) -> None:
+        from django.db.models import F
+
+        from .models import RateLimitBucket
+
+        RateLimitBucket.objects.filter(key=key, window=int(now // window), count__gt=0) \
+            .update(count=F("count") - 1)
+
+    def _evict(self, index: int, now: float) -> None:
+        from .models import RateLimitBucket
+
+        if now - self._last_evicted < self.evict_interval:
+            return
+        self._last_evicted = now
+        RateLimitBucket.objects.filter(window__lt=index - 1).delete()
+
+
+class CacheBackend:
+    # Django cache counters, one entry per key and window, expiring after two
+    # windows. Atomic when the cache's incr() is (memcached, redis).
+
+    def __init__(self, alias: str = "default"):
+        from django.core.cache import caches
+
+        self._cache = caches[alias]
+
+    def hit(self, key: str, limit: int, window: float, now: float) -> bool:
+        index = int(now // window)
+        current_key = f"rl:{key}:{index}"
+        previous_key = f"rl:{key}:{index - 1}"
+
+        self._cache.add(current_key, 0, timeout=int(window * 2))
+        current = self._cache.incr(current_key)
+        previous = self._cache.get(previous_key, 0)
+
+        if window_estimate(previous, current - 1, now, window) >= limit:
+            self._cache.decr(current_key)
+            return True
+
+        return False
+
+    def undo(self, key: str, window: float, now: float) -> None:
+        try:
+            self._cache.decr(f"rl:{key}:{int(now // window)}")
+        except ValueError:
+            # The entry expired in between.
+            pass
+
+
+BACKENDS = {
+    "locmem": LocMemBackend,
+    "database": DatabaseBackend,
+    "cache": CacheBackend,
+}
+
+
+# ================= LIMITER =================
+
+class RateLimiter:
+
+    def __init__(self, backend, max_requests: int, window_seconds: float,
+                 user_max_requests: int = None):
+        self.backend = backend
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.user_max_requests = user_max_requests or max_requests
+
+    def is_limited(self, ip: str, user_id=None, now: float = None) -> bool:
+        now = time.time() if now is None else now
+
+        ip_key = f"ip:{ip}"
+        if self.backend.hit(ip_key, self.max_requests, self.window_seconds, now):
+            return True
+
+        # A request the user limit rejects does not use up the IP allowance.
+        if user_id is not None and self.backend.hit(
+            f"user:{user_id}", self.user_max_requests, self.window_seconds, now
+        ):
+            self.backend.undo(ip_key, self.window_seconds, now)
+            return True
+
+        return False
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                config = dict(get_setting("RATE_LIMIT", {}))
+                backend_cls = BACKENDS[config.pop("BACKEND", "locmem")]
+                max_requests = config.pop("MAX_REQUESTS", 5)
+                window_seconds = config.pop("WINDOW_SECONDS", 60)
+                user_max_requests = config.pop("USER_MAX_REQUESTS", None)
+                options = {key.lower(): value for key, value in config.items()}
+                _rate_limiter = RateLimiter(
+                    backend_cls(**options),
+                    max_requests,
+                    window_seconds,
+                    user_max_requests
+                )
+
+    return _rate_limiter
+
+
+def is_rate_limited(request) -> bool:
+    ip = request.META.get("REMOTE_ADDR", "unknown")
+    user = getattr(request, "user", None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    return get_rate_limiter().is_limited(ip, user_id)
@@ -0,0 +1,509 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+# Routes chat completions over one or more OpenAI-compatible backends.
+# Each backend has its own timeout, retries with jittered backoff and a
+# circuit breaker. Backends are ranked by a rolling latency / error-rate
+# score, and a call that is still running after the primary backend's p95
+# latency is hedged with a second request to the next backend; the first
+# answer wins.
+#
+# openai and httpx take most of a cold start to import, so they are only
+# imported once a backend opens its first client or sees its first error;
+# the CLI and workers that answer from the cache or locally never load them.
+
+_retryable_errors = None
+
+
+def retryable_errors() -> tuple:
+    global _retryable_errors
+
+    if _retryable_errors is None:
+        import openai
+
+        _retryable_errors = (
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+        )
+    return _retryable_errors
+
+
+def backend_fault(exc: Exception) -> bool:
+    # Timeouts, connection errors, 429 and 5xx count against a backend;
+    # a 4xx caused by the request itself (bad request, context length
+    # exceeded) says nothing about the backend's health.
+    return isinstance(exc, retryable_errors()) or (getattr(exc, "status_code", None) or 0) >= 500
+
+
+def record_failure(backend, exc: Exception, started: float) -> None:
+    if backend_fault(exc):
+        backend.window.record(time.perf_counter() - started, False)
+        backend.breaker.record_failure()
+    else:
+        backend.breaker.release()
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class LLMUnavailable(Exception):
+    # Every backend failed or has an open circuit.
+
+    def __init__(self, errors: list):
+        self.errors = errors
+        detail = "; ".join(f"{name}: {error}" for name, error in errors) or "no backend available"
+        super().__init__(f"All LLM backends failed ({detail})")
+
+
+@dataclass
+class LLMResult:
+    text: str
+    model: str
+    backend: str
+    usage: dict = None
+    latency: float = 0.0
+    attempts: int = 1
+    hedged: bool = False
+
+
+# ================= HEALTH =================
+
+class LatencyWindow:
+    # The last `size` calls to a backend: (latency, succeeded).
+
+    def __init__(self, size: int = 100):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.samples.append((latency, ok))
+
+    def quantile(self, q: float):
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def success_count(self) -> int:
+        with self._lock:
+            return sum(1 for _, ok in self.samples if ok)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.samples:
+                return 0.0
+            return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` consecutive failures. After `cooldown`
+    # seconds one trial call is let through (half-open); its outcome closes
+    # or re-opens the circuit.
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.trial_running)
+
+    def before_call(self) -> bool:
+        # False when the call must not be made.
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self.trial_running):
+                return False
+            if state == "half_open":
+                self.trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def release(self) -> None:
+        # The trial call was abandoned without an outcome.
+        with self._lock:
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+# ================= BACKENDS =================
+
+@dataclass
+class Backend:
+    name: str
+    model: str
+    base_url: str = None
+    api_key: str = None
+    timeout: float = 60
+    connect_timeout: float = 5
+    max_retries: int = 2
+    max_connections: int = 100
+    max_keepalive: int = 20
+    window: LatencyWindow = field(default_factory=LatencyWindow)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+
+    def __post_init__(self):
+        self._client = None
+        self._client_lock = threading.Lock()
+        # httpx async pools are tied to the event loop that opened them.
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _client_options(self) -> dict:
+        import httpx
+
+        return {
+            "api_key": self.api_key,
+            "base_url": self.base_url,
+            # Retries are done by the router, so they can fall back.
+            "max_retries": 0,
+            "timeout": httpx.Timeout(self.timeout, connect=self.connect_timeout),
+        }
+
+    def _limits(self):
+        import httpx
+
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from openai import OpenAI
+
+                    self._client = OpenAI(
+                        http_client=httpx.Client(limits=self._limits()),
+                        **self._client_options()
+                    )
+        return self._client
+
+    @property
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        async_client = self._async_clients.get(loop)
+
+        if async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            async_client = AsyncOpenAI(
+                http_client=httpx.AsyncClient(limits=self._limits()),
+                **self._client_options()
+            )
+            self._async_clients[loop] = async_client
+
+        return async_client
+
+    def score(self):
+        # Expected seconds to a good answer; None until the backend has
+        # answered at least once.
+        median = self.window.quantile(0.5)
+        if median is None:
+            return None
+        return median / max(1 - self.window.error_rate(), 0.05)
+
+
+# ================= ROUTER =================
+
+class Router:
+
+    def __init__(self, backends: list, hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 backoff_base: float = 0.25, backoff_max: float = 4, max_hedges: int = 64):
+        self.backends = backends
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._executor = ThreadPoolExecutor(max_workers=max_hedges, thread_name_prefix="llm-hedge")
+
+    @property
+    def model(self) -> str:
+        return self.backends[0].model
+
+    def ranked(self) -> list:
+        # Available backends, best score first. Backends without samples
+        # keep their configured order behind the measured ones, so a new
+        # backend is first tried through fallback and hedging.
+        available = [backend for backend in self.backends if backend.breaker.available()]
+
+        def key(item):
+            index, backend = item
+            score = backend.score()
+            return (score is None, score or 0, index)
+
+        return [backend for _, backend in sorted(enumerate(available), key=key)]
+
+    def hedge_delay(self, backend: Backend):
+        if backend.window.success_count() < self.hedge_min_samples:
+            return None
+        return backend.window.quantile(self.hedge_quantile)
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter, so retries from many workers do not line up.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _result(self, backend: Backend, response, started: float, attempts: int) -> LLMResult:
+        usage = response.usage.model_dump() if getattr(response, "usage", None) else None
+        return LLMResult(
+            text=response.choices[0].message.content,
+            model=response.model or backend.model,
+            backend=backend.name,
+            usage=usage,
+            latency=time.perf_counter() - started,
+            attempts=attempts,
+        )
+
+    # ----- sync -----
+
+    def _call_backend(self, backend: Backend, messages: list, options: dict) -> LLMResult:
+        attempt = 0
+        while True:
+            if not backend.breaker.before_call():
+                raise CircuitOpen(f"circuit open for {backend.name}")
+
+            started = time.perf_counter()
+            try:
+                response = backend.client.chat.completions.create(
+                    model=backend.model, messages=messages, **options
+                )
+            except Exception as exc:
+                record_failure(backend, exc, started)
+                if not isinstance(exc, retryable_errors()) or attempt >= backend.max_retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+
+            backend.window.record(time.perf_counter() - started, True)
+            backend.breaker.record_success()
+            return self._result(backend, response, started, attempt + 1)
+
+    def complete(self, messages: list, **options) -> LLMResult:
+        started = time.perf_counter()
+        candidates = self.ranked()
+        errors = []
+        if not candidates:
+            raise LLMUnavailable(errors)
+
+        delay = self.hedge_delay(candidates[0]) if len(candidates) > 1 else None
+        if delay is not None:
+            result = self._hedged(candidates[:2], delay, messages, options, errors)
+            if result is not None:
+                result.latency = time.perf_counter() - started
+                return result
+            candidates = candidates[2:]
+
+        for backend in candidates:
+            try:
+                return self._call_backend(backend, messages, options)
+            except Exception as exc:
+                errors.append((backend.name, exc))
+
+        raise LLMUnavailable(errors)
+
+    def _hedged(self, pair: list, delay: float, messages: list, options: dict, errors: list):
+        primary, secondary = pair
+        futures = {self._executor.submit(self._call_backend, primary, messages, options): primary}
+        done, _ = wait(futures, timeout=delay)
+
+        hedged = not done
+        if hedged or futures_failed(done):
+            futures[self._executor.submit(self._call_backend, secondary, messages, options)] = secondary
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    result = future.result()
+                    result.hedged = hedged
+                    return result
+                errors.append((futures[future].name, future.exception()))
+        return None
+
+    def stream(self, messages: list, **options):
+        # Falls back only while no text has been produced; streams are not hedged.
+        errors = []
+        for backend in self.ranked():
+            chunks = self._open_stream(backend, messages, options)
+            try:
+                first = next(chunks)
+            except StopIteration:
+                return
+            except Exception as exc:
+                errors.append((backend.name, exc))
+                continue
+
+            yield first
+            yield from chunks
+            return
+
+        raise LLMUnavailable(errors)
+
+    def _open_stream(self, backend: Backend, messages: list, options: dict):
+        attempt = 0
+        while True:
+            if not backend.breaker.before_call():
+                raise CircuitOpen(f"circuit open for {backend.name}")
+
+            started = time.perf_counter()
+            try:
+                stream = backend.client.chat.completions.create(
+                    model=backend.model, messages=messages, stream=True, **options
+                )
+                break
+            except Exception as exc:
+                record_failure(backend, exc, started)
+                if not isinstance(exc, retryable_errors()) or attempt >= backend.max_retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+
+        finished = False
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            finished = True
+        except Exception as exc:
+            record_failure(backend, exc, started)
+            raise
+        finally:
+            if not finished:
+                # Closed by the consumer (client disconnect) or failed: a
+                # half-open trial must not stay taken.
+                backend.breaker.release()
+                stream.close()
+
+        backend.window.record(time.perf_counter() - started, True)
+        backend.breaker.record_success()
+
+    # ----- async -----
+
+    async def _acall_backend(self, backend: Backend, messages: list, options: dict) -> LLMResult:
+        attempt = 0
+        while True:
+            if not backend.breaker.before_call():
+                raise CircuitOpen(f"circuit open for {backend.name}")
+
+            started = time.perf_counter()
+            try:
+                response = await backend.async_client.chat.completions.create(
+                    model=backend.model, messages=messages, **options
+                )
+            except asyncio.CancelledError:
+                # Lost a hedge race; not a backend failure.
+                backend.breaker.release()
+                raise
+            except Exception as exc:
+                record_failure(backend, exc, started)
+                if not isinstance(exc, retryable_errors()) or attempt >= backend.max_retries:
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+
+            backend.window.record(time.perf_counter() - started, True)
+            backend.breaker.record_success()
+            return self._result(backend, response, started, attempt + 1)
+
+    async def acomplete(self, messages: list, **options) -> LLMResult:
+        started = time.perf_counter()
+        candidates = self.ranked()
+        errors = []
+        if not candidates:
+            raise LLMUnavailable(errors)
+
+        delay = self.hedge_delay(candidates[0]) if len(candidates) > 1 else None
+        if delay is not None:
+            result = await self._ahedged(candidates[:2], delay, messages, options, errors)
+            if result is not None:
+                result.latency = time.perf_counter() - started
+                return result
+            candidates = candidates[2:]
+
+        for backend in candidates:
+            try:
+                return await self._acall_backend(backend, messages, options)
+            except Exception as exc:
+                errors.append((backend.name, exc))
+
+        raise LLMUnavailable(errors)
+
+    async def _ahedged(self, pair: list, delay: float, messages: list, options: dict, errors: list):
+        primary, secondary = pair
+        tasks = {asyncio.ensure_future(self._acall_backend(primary, messages, options)): primary}
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+
+        hedged = not done
+        if hedged or futures_failed(done):
+            tasks[asyncio.ensure_future(self._acall_backend(secondary, messages, options))] = secondary
+
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        result = task.result()
+                        result.hedged = hedged
+                        return result
+                    errors.append((tasks[task].name, task.exception()))
+            return None
+        finally:
+            # The slower request is cancelled instead of left running.
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> list:
+        return [
+            {
+                "backend": backend.name,
+                "model": backend.model,
+                "state": backend.breaker.state,
+                "p50": backend.window.quantile(0.5),
+                "p95": backend.window.quantile(0.95),
+                "error_rate": backend.window.error_rate(),
+                "score": backend.score(),
+            }
+            for backend in self.backends
+        ]
+
+
+def futures_failed(done) -> bool:
+    return bool(done) and all(future.exception() is not None for future in done)
@@ -0,0 +1,144 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from .conf import get_setting
+
+# Optional execution stage. Submitted code runs in a pool of long-lived
+# worker processes (sandbox_worker.py); each worker forks a resource-limited
+# child per run, so the interpreter startup is paid once per worker rather
+# than once per submission.
+
+WORKER_PATH = os.path.join(os.path.dirname(__file__), "sandbox_worker.py")
+
+# The only environment workers get: nothing of the server's (API keys from
+# .env included) is passed on to submitted code.
+WORKER_ENV = {"PATH": os.defpath, "LC_ALL": "C.UTF-8"}
+
+# Statuses for which the run produced an exception worth diagnosing.
+FAILED_STATUSES = {"error", "timeout", "cpu_limit", "memory_limit"}
+
+
+class SandboxPool:
+
+    def __init__(self, workers: int = 2, cpu_seconds: int = 2, memory_mb: int = 256,
+                 wall_seconds: float = 5, output_bytes: int = 10000):
+        self.size = workers
+        self.limits = {
+            "cpu_seconds": cpu_seconds,
+            "memory_mb": memory_mb,
+            "wall_seconds": wall_seconds,
+            "output_bytes": output_bytes,
+        }
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+
+    def _spawn(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, "-I", WORKER_PATH],
+            env=WORKER_ENV,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+
+    def _acquire(self) -> subprocess.Popen:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._started < self.size:
+                self._started += 1
+                return self._spawn()
+
+        return self._idle.get()
+
+    def _discard(self, worker: subprocess.Popen) -> None:
+        worker.kill()
+        worker.wait()
+        with self._lock:
+            self._started -= 1
+
+    def run(self, code: str) -> dict:
+        # Returns status, exception, message, line, traceback, stdout and
+        # timings (run_ms in the child, wall_ms in the worker, total_ms here).
+        started = time.perf_counter()
+        worker = self._acquire()
+
+        try:
+            worker.stdin.write(json.dumps({"code": code, **self.limits}) + "\n")
+            worker.stdin.flush()
+            line = worker.stdout.readline()
+        except (BrokenPipeError, OSError):
+            line = ""
+
+        if not line:
+            self._discard(worker)
+            result = {"status": "crashed", "exception": None, "message": "Sandbox worker exited"}
+        else:
+            self._idle.put(worker)
+            result = json.loads(line)
+
+        result["total_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+def execution_error(result: dict):
+    # The error text fed to classify_error / build_messages, or None when
+    # the snippet ran cleanly.
+    if result["status"] not in FAILED_STATUSES:
+        return None
+    if result.get("traceback"):
+        return result["traceback"].strip()
+    return f"{result['exception']}: {result['message']}"
+
+
+def execution_summary(result: dict) -> dict:
+    # The part of a run that is returned to the client.
+    return {
+        "status": result["status"],
+        "exception": result.get("exception"),
+        "line": result.get("line"),
+        "stdout": result.get("stdout", ""),
+        "run_ms": round(result.get("run_ms", 0.0), 2),
+        "wall_ms": round(result.get("wall_ms", 0.0), 2),
+        "total_ms": round(result["total_ms"], 2),
+    }
+
+
+def sandbox_enabled() -> bool:
+    return bool(get_setting("SANDBOX", {}).get("ENABLED", False))
+
+
+_sandbox_pool = None
+_sandbox_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    global _sandbox_pool
+
+    if _sandbox_pool is None:
+        with _sandbox_pool_lock:
+            if _sandbox_pool is None:
+                config = dict(get_setting("SANDBOX", {}))
+                config.pop("ENABLED", None)
+                options = {key.lower(): value for key, value in config.items()}
+                _sandbox_pool = SandboxPool(**options)
+
+    return _sandbox_pool
@@ -0,0 +1,304 @@
+# Long-lived sandbox worker started by analyzer.sandbox.SandboxPool.
+#
+# Reads one JSON job per line on stdin and answers with one JSON line on
+# stdout. Each job runs in a child forked from this already-started
+# interpreter, so a run costs a fork instead of a Python startup. The child
+# gets CPU, memory, file-size and process limits, an empty working directory,
+# no stdin and a capped output buffer; this process enforces the wall-clock
+# limit. The worker is started with an almost empty environment, so no
+# secrets of the server are visible to the snippet.
+#
+# Network: the child moves into a new (empty) network namespace when the
+# kernel allows it (unprivileged user namespaces, or root). An audit hook
+# additionally rejects every socket, process, ctypes and filesystem event
+# outside the working directory (reads are also allowed under the
+# interpreter's own import paths). The hook runs inside the same
+# interpreter as the snippet, so it is a second line of defence; deploy
+# with user namespaces available (or in a container) for a hard boundary.
+#
+# Runs as a plain script (python -I), so it must only import the stdlib.
+
+import ctypes
+import io
+import json
+import linecache
+import os
+import resource
+import select
+import signal
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+FILENAME = "<user_code>"
+
+
+class CappedOutput(io.StringIO):
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.truncated = False
+
+    def write(self, text):
+        room = self.limit - self.tell()
+        if room <= 0:
+            self.truncated = True
+            return len(text)
+        if len(text) > room:
+            self.truncated = True
+        return super().write(text[:room])
+
+
+# unshare(2) flags
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+# Events refused outright, and prefixes of whole families of them.
+BLOCKED_EVENTS = {
+    "os.system", "os.fork", "os.forkpty", "os.kill", "os.killpg", "subprocess.Popen",
+    "ctypes.dlopen", "ctypes.dlsym", "ctypes.cdata", "ctypes.call_function",
+    "sys.remote_exec",
+}
+BLOCKED_PREFIXES = ("socket.", "os.exec", "os.spawn", "os.posix_spawn", "os.startfile", "winreg.")
+
+# Events whose first argument is a path that may only be read.
+READ_EVENTS = {"os.listdir", "os.scandir", "glob.glob"}
+
+# Events whose first argument (and second, for renames and links) is a path
+# that is changed.
+WRITE_EVENTS = {
+    "os.remove", "os.rmdir", "os.mkdir", "os.rename", "os.chmod", "os.chown", "os.utime",
+    "os.truncate", "os.link", "os.symlink", "shutil.rmtree", "shutil.copyfile", "shutil.move",
+}
+
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+
+
+def libc_unshare(flags: int) -> None:
+    # os.unshare only exists from Python 3.12.
+    if LIBC.unshare(flags) != 0:
+        raise OSError(ctypes.get_errno(), "unshare failed")
+
+
+try:
+    LIBC = ctypes.CDLL(None, use_errno=True)
+except OSError:
+    LIBC = None
+
+
+def isolate_network() -> bool:
+    # A fresh network namespace has no interfaces but a down loopback.
+    unshare = getattr(os, "unshare", None) or (libc_unshare if LIBC is not None else None)
+    if unshare is None:
+        return False
+
+    for flags in (CLONE_NEWUSER | CLONE_NEWNET, CLONE_NEWNET):
+        try:
+            unshare(flags)
+            return True
+        except OSError:
+            continue
+    return False
+
+
+def within(path, roots: tuple) -> bool:
+    if isinstance(path, bytes):
+        path = os.fsdecode(path)
+    path = os.path.realpath(path)
+    return any(path == root or path.startswith(root + os.sep) for root in roots)
+
+
+def make_audit_hook(workdir: str):
+    workdir = os.path.realpath(workdir)
+    read_roots = (workdir,) + tuple(
+        os.path.realpath(entry) for entry in sys.path if entry and os.path.isdir(entry)
+    )
+    write_roots = (workdir,)
+
+    def deny(event):
+        raise PermissionError(f"{event} is not allowed in the sandbox")
+
+    def hook(event, args):
+        if event in BLOCKED_EVENTS or event.startswith(BLOCKED_PREFIXES):
+            deny(event)
+
+        if event == "open":
+            path, mode, flags = args
+            if path is None or isinstance(path, int):
+                return
+            writing = any(char in (mode or "") for char in "wax+") or bool((flags or 0) & WRITE_FLAGS)
+            if not within(path, write_roots if writing else read_roots):
+                deny("Opening files outside the working directory")
+        elif event in READ_EVENTS:
+            if args and args[0] is not None and not isinstance(args[0], int) and not within(args[0], read_roots):
+                deny("Listing directories outside the working directory")
+        elif event in WRITE_EVENTS:
+            paths = [arg for arg in args[:2] if isinstance(arg, (str, bytes, os.PathLike))]
+            if not all(within(path, write_roots) for path in paths):
+                deny("Changing files outside the working directory")
+
+    return hook
+
+
+def apply_limits(job: dict) -> None:
+    cpu = int(job["cpu_seconds"])
+    memory = int(job["memory_mb"]) * 1024 * 1024
+
+    # Before the limits: creating the namespace needs memory and a clone.
+    isolate_network()
+
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    # Last: audit hooks cannot be removed once added.
+    sys.addaudithook(make_audit_hook(job["workdir"]))
+
+
+def user_traceback(exc: BaseException) -> tuple:
+    # Only frames from the submitted code, so line numbers refer to it.
+    summary = traceback.TracebackException.from_exception(exc)
+    frames = [frame for frame in summary.stack if frame.filename == FILENAME]
+    summary.stack = traceback.StackSummary.from_list(frames)
+
+    text = "".join(summary.format())
+    line = frames[-1].lineno if frames else getattr(exc, "lineno", None)
+    return text, line
+
+
+def run_child(job: dict, result_fd: int) -> None:
+    # Own process group, so the worker can kill anything the snippet spawns.
+    os.setpgid(0, 0)
+    os.chdir(job["workdir"])
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+    output = CappedOutput(int(job["output_bytes"]))
+    sys.stdin = io.StringIO()
+    sys.stdout = sys.stderr = output
+
+    code = job["code"]
+    linecache.cache[FILENAME] = (len(code), None, code.splitlines(True), FILENAME)
+
+    result = {"status": "ok", "exception": None, "message": None, "line": None, "traceback": None}
+    child_pid = os.getpid()
+    started = time.perf_counter()
+
+    try:
+        apply_limits(job)
+        exec(compile(code, FILENAME, "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as exc:
+        if exc.code not in (None, 0):
+            result.update(status="exit", message=f"Exited with status {exc.code}")
+    except MemoryError:
+        result.update(status="memory_limit", exception="MemoryError",
+                      message="Memory limit exceeded")
+    except BaseException as exc:
+        text, line = user_traceback(exc)
+        result.update(
+            status="error",
+            exception=type(exc).__name__,
+            message=str(exc),
+            line=line,
+            traceback=text,
+        )
+
+    if os.getpid() != child_pid:
+        # A process forked by the snippet; only the child reports.
+        os._exit(0)
+
+    result["run_ms"] = (time.perf_counter() - started) * 1000
+    result["stdout"] = output.getvalue()
+    result["stdout_truncated"] = output.truncated
+
+    data = json.dumps(result).encode()
+    view = memoryview(data)
+    while view:
+        written = os.write(result_fd, view)
+        view = view[written:]
+
+
+def run_job(job: dict) -> dict:
+    workdir = tempfile.mkdtemp(prefix="sandbox-")
+    try:
+        return run_in_child(dict(job, workdir=workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_in_child(job: dict) -> dict:
+    read_fd, write_fd = os.pipe()
+    started = time.perf_counter()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            run_child(job, write_fd)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    deadline = started + float(job["wall_seconds"])
+    chunks = []
+    timed_out = False
+
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select([read_fd], [], [], remaining)
+        if not ready:
+            continue
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+    if timed_out:
+        result = {"status": "timeout", "exception": "TimeoutError",
+                  "message": f"Execution exceeded {job['wall_seconds']}s"}
+    elif chunks:
+        try:
+            result = json.loads(b"".join(chunks))
+        except ValueError:
+            result = {"status": "crashed", "exception": None,
+                      "message": "Sandbox process returned an unreadable result"}
+    elif os.WIFSIGNALED(status) and os.WTERMSIG(status) in (signal.SIGXCPU, signal.SIGKILL):
+        result = {"status": "cpu_limit", "exception": "TimeoutError",
+                  "message": f"CPU time limit of {job['cpu_seconds']}s exceeded"}
+    else:
+        result = {"status": "crashed", "exception": None,
+                  "message": f"Sandbox process exited with status {status}"}
+
+    result["wall_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main():
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = run_job(json.loads(line))
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .conf import get_setting
+from .metrics import RATE_LIMIT, REJECTIONS, record_stage
+from .ratelimit import is_rate_limited
+
+# Input screening for the debug endpoints, as ordered stages that run
+# cheapest first and stop at the first rejection:
+#
+#   request: method -> body_size -> rate_limit     (before the body is parsed)
+#   input:   types -> empty -> code_bytes -> error_bytes -> lines -> injection
+#
+# Each stage returns (message, status) to reject, otherwise None. A
+# Screening records which stage rejected the request and how long each stage
+# took; the timings also go to the request metrics and its Server-Timing
+# header (see analyzer/metrics.py).
+
+RULES_DIR = Path(__file__).resolve().parent / "rules"
+
+DEFAULT_CONFIG = {
+    "MAX_BODY_BYTES": 600_000,
+    "MAX_CODE_BYTES": 400_000,
+    "MAX_ERROR_BYTES": 20_000,
+    "MAX_LINES": 10_000,
+    "RULE_FILES": [RULES_DIR / "injection.txt"],
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CONFIG, **get_setting("SCREENING", {})}
+
+
+# ================= INJECTION RULES =================
+# Rule files hold one phrase per line; blank lines and lines starting with
+# "#" are ignored. Every phrase from every file goes into a single
+# case-insensitive regex, so the code and error are each scanned once
+# without lowercased copies. Words in a phrase match across any whitespace.
+
+def load_rules(paths) -> list:
+    phrases = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    phrases.append(line)
+    return phrases
+
+
+def compile_rules(phrases: list):
+    if not phrases:
+        return None
+
+    # Longest first, so a phrase wins over any shorter phrase it starts with.
+    patterns = [
+        r"\s+".join(re.escape(word) for word in phrase.split())
+        for phrase in sorted(set(phrases), key=len, reverse=True)
+    ]
+    return re.compile(r"\b(?:" + "|".join(patterns) + r")\b", re.IGNORECASE)
+
+
+_matchers = {}
+_matcher_lock = threading.Lock()
+
+
+def get_matcher(paths):
+    key = tuple(str(path) for path in paths)
+    matcher = _matchers.get(key)
+
+    if matcher is None and key not in _matchers:
+        with _matcher_lock:
+            if key not in _matchers:
+                _matchers[key] = compile_rules(load_rules(paths))
+            matcher = _matchers[key]
+
+    return matcher
+
+
+# ================= REQUEST STAGES =================
+
+def check_method(request, config: dict):
+    if request.method != "POST":
+        return "Invalid request method", 405
+    return None
+
+
+def check_body_size(request, config: dict):
+    if len(request.body) > config["MAX_BODY_BYTES"]:
+        return "Request body too large.", 413
+    return None
+
+
+def check_rate_limit(request, config: dict):
+    limited = is_rate_limited(request)
+    RATE_LIMIT.inc("limited" if limited else "allowed")
+    if limited:
+        return "Too many requests. Please try again after some time.", 429
+    return None
+
+
+REQUEST_STAGES = [
+    ("method", check_method),
+    ("body_size", check_body_size),
+    ("rate_limit", check_rate_limit),
+]
+
+
+# ================= INPUT STAGES =================
+
+def count_lines(text: str) -> int:
+    # len(text.splitlines()) for "\n" and "\r\n" endings, counted in one pass
+    # without building the list of lines.
+    if not text:
+        return 0
+    return text.count("\n") + (not text.endswith("\n"))
+
+
+def check_types(code, error, config: dict):
+    # JSON bodies can carry numbers, lists or objects in any field.
+    if not isinstance(code, str):
+        return "Code must be a string", 400
+    if not isinstance(error, str):
+        return "Error must be a string", 400
+    return None
+
+
+def check_empty(code: str, error: str, config: dict):
+    if not code.strip():
+        return "Code input is empty", 400
+    return None
+
+
+def check_code_bytes(code: str, error: str, config: dict):
+    # len() is a lower bound on the UTF-8 size; only encode when it could matter.
+    limit = config["MAX_CODE_BYTES"]
+    if len(code) > limit or (not code.isascii() and len(code.encode("utf-8")) > limit):
+        return f"Code too large. Please submit under {limit} bytes.", 400
+    return None
+
+
+def check_error_bytes(code: str, error: str, config: dict):
+    limit = config["MAX_ERROR_BYTES"]
+    if len(error) > limit or (not error.isascii() and len(error.encode("utf-8")) > limit):
+        return f"Error message too large. Please submit under {limit} bytes.", 400
+    return None
+
+
+def check_lines(code: str, error: str, config: dict):
+    limit = config["MAX_LINES"]
+    if count_lines(code) > limit:
+        return f"Code too long. Please submit under {limit} lines.", 400
+    return None
+
+
+def check_injection(code: str, error: str, config: dict):
+    matcher = get_matcher(config["RULE_FILES"])
+    if matcher is not None and (matcher.search(code) or (error and matcher.search(error))):
+        return "Invalid or unsafe input detected", 400
+    return None
+
+
+INPUT_STAGES = [
+    ("types", check_types),
+    ("empty", check_empty),
+    ("code_bytes", check_code_bytes),
+    ("error_bytes", check_error_bytes),
+    ("lines", check_lines),
+    ("injection", check_injection),
+]
+
+
+# ================= SCREENING =================
+
+class Screening:
+
+    def __init__(self, config: dict = None):
+        self.config = config or get_config()
+        self.timings = {}
+        self.reason = None
+
+    @contextmanager
+    def timed(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[stage] = elapsed * 1000
+            record_stage("screen_" + stage, elapsed)
+
+    def reject(self, stage: str, message: str, status: int):
+        self.reason = stage
+        REJECTIONS.inc(stage)
+        return message, status
+
+    def _run(self, stages: list, *args):
+        for stage, check in stages:
+            with self.timed(stage):
+                rejection = check(*args, self.config)
+            if rejection:
+                return self.reject(stage, *rejection)
+        return None
+
+    def screen_request(self, request, stages: list = None):
+        return self._run(REQUEST_STAGES if stages is None else stages, request)
+
+    def screen_input(self, code: str, error: str = ""):
+        return self._run(INPUT_STAGES, code, "" if error is None else error)
@@ -0,0 +1,76 @@
+import re
+
+SECTION_NAMES = [
+    "ERROR_REASON",
+    "PROBLEM_LINE",
+    "EXPLANATION",
+    "FIXED_CODE",
+    "EXAMPLE",
+    "HINTS",
+]
+
+HEADER_RE = re.compile(r"^\s*(" + "|".join(SECTION_NAMES) + r"):(.*)$")
+
+
+def _header_remainder(rest: str) -> str:
+    # Drop decorations such as "FIXED_CODE: 🛠️" but keep inline text.
+    rest = rest.strip()
+    if not any(ch.isalnum() for ch in rest):
+        return ""
+    return rest
+
+
+class SectionStreamParser:
+    # Splits streamed model output into the sections requested by
+    # build_prompt. A section is complete as soon as the next header starts.
+
+    def __init__(self):
+        self._buffer = ""
+        self._current = None
+        self._lines = []
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        completed = []
+
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            finished = self._consume_line(line)
+            if finished:
+                completed.append(finished)
+
+        return completed
+
+    def close(self) -> list:
+        completed = []
+
+        if self._buffer:
+            finished = self._consume_line(self._buffer)
+            self._buffer = ""
+            if finished:
+                completed.append(finished)
+
+        if self._current:
+            completed.append(self._finish())
+
+        return completed
+
+    def _consume_line(self, line: str):
+        match = HEADER_RE.match(line)
+        if not match:
+            if self._current:
+                self._lines.append(line)
+            return None
+
+        finished = self._finish() if self._current else None
+        self._current = match.group(1)
+        remainder = _header_remainder(match.group(2))
+        self._lines = [remainder] if remainder else []
+        return finished
+
+    def _finish(self):
+        section = (self._current, "\n".join(self._lines).strip())
+        self._current = None
+        self._lines = []
+        return section
+
@@ -0,0 +1,303 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .conf import get_setting
+from .metrics import timer
+from .parsing import parse_answer, response_format
+from .prompts import STRUCTURED_PROMPTS
+from .slicing import CHARS_PER_TOKEN
+from .tiering import STATIC_TIER, complete_tiered, tier_names
+
+# Debug sessions: server-held conversation state for follow-ups on an
+# answered submission. A session keeps the chat after the (static, per-mode)
+# system prompt: the first user message with the code and error, the answer,
+# then one short instruction and one answer per follow-up. Every follow-up
+# resends the same prefix, so the provider serves it from its prompt cache
+# and only the new instruction and the last answer are read afresh.
+#
+# Sessions live in a per-process LRU of at most MAX_SESSIONS (a miss reloads
+# the row) and in the DebugSession table, which every turn updates with a
+# conditional UPDATE on the turn count, so two requests on the same session
+# cannot both append. Sessions expire TTL_SECONDS after their last turn.
+#
+# Once the messages after the first exceed TOKEN_BUDGET, all but the last
+# KEEP_TURNS turns are folded into one summary message (built locally from
+# the answers, no model call).
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "MAX_SESSIONS": 1000,
+    "TTL_SECONDS": 60 * 60,
+    "MAX_TURNS": 20,
+    "TOKEN_BUDGET": 4000,
+    "KEEP_TURNS": 2,
+}
+
+# action -> (answer mode, instruction appended as a system message)
+FOLLOW_UPS = {
+    "next_hint": ("hint", (
+        "The user wants the next hint. Go one step further than the hints so far without giving the full "
+        "solution, and do not repeat earlier hints."
+    )),
+    "show_fix": ("full", (
+        "The user asked to see the fix, so the hint-only rule no longer applies. Give the full answer for the "
+        "code above: the cause, the problem line, an explanation, the corrected code and an example."
+    )),
+}
+
+# Characters kept from each folded answer.
+SUMMARY_CHARS = 300
+
+# Expired rows are deleted at most this often, when a session is created.
+PURGE_INTERVAL = 60
+
+SUMMARY_HEADER = "Summary of earlier turns in this session:"
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CONFIG, **get_setting("SESSIONS", {})}
+
+
+class SessionError(Exception):
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Session:
+    id: str
+    user_id: int
+    mode: str
+    tier: str
+    error_type: str
+    messages: list
+    summary: str = ""
+    turns: int = 0
+    expires_at: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @classmethod
+    def from_row(cls, row) -> "Session":
+        return cls(
+            str(row.pk), row.user_id, row.mode, row.tier, row.error_type,
+            list(row.messages), row.summary, row.turns, row.expires_at.timestamp(),
+        )
+
+
+def estimate_tokens(messages: list) -> int:
+    return sum(len(message["content"]) for message in messages) // CHARS_PER_TOKEN
+
+
+# ================= STORE =================
+
+class SessionStore:
+    # LRU of live sessions in front of the DebugSession table.
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if session.expires_at > time.time():
+                    self._sessions.move_to_end(session_id)
+                    return session
+                del self._sessions[session_id]
+
+        from .models import DebugSession
+
+        row = DebugSession.objects.filter(pk=session_id, expires_at__gt=timezone.now()).first()
+        if row is None:
+            return None
+        return self.put(Session.from_row(row))
+
+    def put(self, session: Session) -> Session:
+        # Returns the stored session; one already loaded by another thread wins.
+        with self._lock:
+            stored = self._sessions.setdefault(session.id, session)
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+            return stored
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+_store = None
+_store_lock = threading.Lock()
+_last_purge = 0.0
+
+
+def get_store() -> SessionStore:
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore(get_config()["MAX_SESSIONS"])
+    return _store
+
+
+def purge_expired() -> None:
+    global _last_purge
+
+    from .models import DebugSession
+
+    now = time.monotonic()
+    if now - _last_purge < PURGE_INTERVAL:
+        return
+    _last_purge = now
+    DebugSession.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+# ================= SESSIONS =================
+
+def start_session(item: dict, messages: list, answer: str, user=None) -> Session:
+    # `messages` are the ones the answer was (or would have been) produced
+    # from; the system prompt is not stored.
+    from .models import DebugSession
+
+    config = get_config()
+    purge_expired()
+
+    tier = item["tier"] if item["tier"] != STATIC_TIER else tier_names()[0]
+    expires_at = timezone.now() + timedelta(seconds=config["TTL_SECONDS"])
+    row = DebugSession.objects.create(
+        user=user,
+        mode="hint" if item["mode"] == "hint" else "full",
+        tier=tier,
+        error_type=item["error_type"],
+        messages=[message for message in messages if message["role"] != "system"] + [
+            {"role": "assistant", "content": answer}
+        ],
+        expires_at=expires_at,
+    )
+    return get_store().put(Session.from_row(row))
+
+
+def get_session(session_id: str, user_id=None) -> Session:
+    # Sessions of logged-in users are visible to their owner only.
+    session = get_store().get(str(session_id))
+    if session is None or (session.user_id is not None and session.user_id != user_id):
+        raise SessionError("Session not found or expired", 404)
+    return session
+
+
+def follow_up(session: Session, action: str) -> tuple:
+    # Runs one follow-up turn; returns (answer, item) where the item carries
+    # the mode, tier and error type for build_response_data.
+    if not isinstance(action, str) or action not in FOLLOW_UPS:
+        raise SessionError(f"Action must be one of: {', '.join(FOLLOW_UPS)}", 400)
+
+    config = get_config()
+    mode, instruction = FOLLOW_UPS[action]
+
+    if not session.lock.acquire(blocking=False):
+        raise SessionError("Another request on this session is in progress", 409)
+    try:
+        if session.turns >= config["MAX_TURNS"]:
+            raise SessionError("Session has reached its turn limit", 409)
+
+        turn = [{"role": "system", "content": instruction}]
+        messages = [{"role": "system", "content": STRUCTURED_PROMPTS[session.mode]}] + session.messages + turn
+        item = {
+            "mode": mode,
+            "tier": session.tier,
+            "error_type": session.error_type,
+            "local_answer": None,
+        }
+        with timer("llm"):
+            answer = complete_tiered(item, messages, response_format(mode))
+
+        updated = session.messages + turn + [{"role": "assistant", "content": answer}]
+        summary = session.summary
+        if estimate_tokens(updated[1:]) > config["TOKEN_BUDGET"]:
+            updated, summary = compact(updated, summary, session.mode, config["KEEP_TURNS"])
+
+        save_turn(session, updated, summary, config)
+        return answer, item
+    finally:
+        session.lock.release()
+
+
+def save_turn(session: Session, messages: list, summary: str, config: dict) -> None:
+    from .models import DebugSession
+
+    expires_at = timezone.now() + timedelta(seconds=config["TTL_SECONDS"])
+    with timer("db_write"):
+        saved = DebugSession.objects.filter(pk=session.id, turns=session.turns).update(
+            messages=messages,
+            summary=summary,
+            turns=session.turns + 1,
+            expires_at=expires_at,
+            updated_at=timezone.now(),
+        )
+    if not saved:
+        # Another process appended first; drop the stale copy.
+        get_store().discard(session.id)
+        raise SessionError("Session was updated by another request", 409)
+
+    session.messages = messages
+    session.summary = summary
+    session.turns += 1
+    session.expires_at = expires_at.timestamp()
+
+
+# ================= SUMMARY =================
+
+def answer_gist(content: str, mode: str) -> str:
+    # The hints, or the reason of a full answer, shortened to SUMMARY_CHARS.
+    try:
+        data = json.loads(content)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = parse_answer(content, mode)["sections"]
+
+    text = " ".join((data.get("hints") or data.get("reason") or content).split())
+    return text if len(text) <= SUMMARY_CHARS else text[:SUMMARY_CHARS - 3] + "..."
+
+
+def compact(messages: list, summary: str, mode: str, keep_turns: int) -> tuple:
+    # Folds every turn but the last keep_turns into the summary message that
+    # follows the first user message. Returns (messages, summary).
+    first, rest = messages[0], messages[1:]
+    if rest and rest[0]["role"] == "system" and rest[0]["content"].startswith(SUMMARY_HEADER):
+        rest = rest[1:]
+
+    # A turn is an instruction (or the first user message) and its answer.
+    split = max(len(rest) - keep_turns * 2, 0)
+    lines = [summary] if summary else []
+    lines.extend(
+        f"- {answer_gist(message['content'], mode)}"
+        for message in rest[:split] if message["role"] == "assistant"
+    )
+    summary = "\n".join(lines)
+
+    return [first, {"role": "system", "content": f"{SUMMARY_HEADER}\n{summary}"}] + rest[split:], summary
+
+
+def session_status(session: Session) -> dict:
+    return {
+        "session_id": session.id,
+        "mode": session.mode,
+        "turns": session.turns,
+        "summary": session.summary,
+        "expires_at": datetime.fromtimestamp(session.expires_at, dt_timezone.utc).isoformat(),
+        "actions": list(FOLLOW_UPS),
+    }
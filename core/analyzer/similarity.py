@@ -0,0 +1,607 @@
+import ast
+import builtins
+import hashlib
+import io
+import json
+import keyword
+import operator
+import re
+import threading
+import time
+import tokenize
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+from django.apps import apps
+
+from .conf import get_setting
+from .error_utils import parse_error
+
+# Near-duplicate lookup over answered submissions. Students often resend a
+# snippet someone already asked about with other variable names, spacing or
+# comments, which the exact response cache misses. Each answered submission
+# gets a fingerprint:
+#
+#   canonical hash  the AST with user identifiers renamed v0, v1, ... in
+#                   order of appearance, literals bucketed and docstrings
+#                   dropped (a token stream when the code does not parse)
+#   signature       a MinHash of 5-token shingles, banded for LSH lookups
+#
+# A new submission whose canonical hash matches an earlier one with the same
+# error type and mode reuses that answer, with identifiers and line numbers
+# mapped onto the new code. Full answers are only reused when the literal
+# values are the same too: a different string or index can change whether
+# the code fails at all. Hints may differ in literals, which are mapped
+# like identifiers (and the answer is not reused when that mapping is
+# ambiguous). Hint requests also reuse answers of the same user's near
+# matches (estimated similarity >= NEAR_SIMILARITY); hints do not quote the
+# fixed code, so they survive small edits, but their literals are not mapped,
+# so another user's strings and numbers would show through.
+#
+# The index is in memory per process, built from SubmissionFingerprint rows
+# and extended as submissions are saved (post_save, see apps.py); rows saved
+# by other processes are picked up every REFRESH_SECONDS.
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 50_000,
+    "NEAR_SIMILARITY": 0.9,
+    "REFRESH_SECONDS": 5,
+}
+
+KEEP_NAMES = frozenset(dir(builtins)) | frozenset(keyword.kwlist) | frozenset(keyword.softkwlist)
+
+SHINGLE_SIZE = 5
+BANDS = 16
+ROWS = 4
+SLOTS = BANDS * ROWS
+EMPTY = 0xFFFFFFFF
+VERIFY_CANDIDATES = 8
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CONFIG, **get_setting("SIMILARITY", {})}
+
+
+# ================= CANONICAL FORM =================
+
+@dataclass
+class Canonical:
+    hash: str
+    # Original identifiers, literal values and line numbers in visit order;
+    # two codes with the same hash have aligned lists.
+    names: list = field(default_factory=list)
+    literals: list = field(default_factory=list)
+    lines: list = field(default_factory=list)
+
+
+def literal_bucket(value):
+    if value is None or isinstance(value, bool) or value is ...:
+        return value
+    if isinstance(value, int):
+        return value if -1 <= value <= 2 else "<int>"
+    if isinstance(value, str):
+        return value if not value else "<str>"
+    return f"<{type(value).__name__}>"
+
+
+def strip_docstring(body: list) -> list:
+    if len(body) > 1 and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        return body[1:]
+    return body
+
+
+TOKEN_RE = re.compile(r"""
+    (?P<comment>\#[^\n]*)
+  | (?P<string>[rRbBuUfF]{0,2}(?:'''(?:\\.|[^\\])*?'''|\"\"\"(?:\\.|[^\\])*?\"\"\"|'(?:\\.|[^\\'\n])*'|"(?:\\.|[^\\"\n])*"))
+  | (?P<name>[^\W\d]\w*)
+  | (?P<number>\.?\d[\w.]*)
+  | (?P<indent>(?<=\n)[ \t]+(?=[^\s#]))
+  | (?P<op>\*\*=?|//=?|->|:=|[<>!=]=|<<=?|>>=?|[-+*/%&|^@]=|\S)
+""", re.VERBOSE)
+
+
+def scan_tokens(code: str) -> list:
+    # [(token, raw text, line)] from one regex pass (the tokenize module is
+    # several times slower). User identifiers become "<id>"; comments and
+    # blank space are dropped, indentation is kept.
+    tokens = []
+    line = 1
+    position = 0
+    for match in TOKEN_RE.finditer(code):
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+
+        raw = match.group()
+        line += code.count("\n", position, match.start())
+        position = match.start()
+
+        if kind == "name":
+            text = raw if raw in KEEP_NAMES else "<id>"
+        elif kind == "number":
+            text = raw if raw in ("0", "1", "2") else "<int>"
+        elif kind == "string":
+            text = "<str>"
+        elif kind == "indent":
+            text = f"<indent:{len(raw.expandtabs())}>"
+        else:
+            text = raw
+        tokens.append((text, raw, line))
+    return tokens
+
+
+def canonicalize(code: str, tokens: list = None) -> Canonical:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return canonical_tokens(tokens if tokens is not None else scan_tokens(code))
+
+    canonical = Canonical("")
+    renamed = {}
+
+    def rename(name):
+        if name is None or name in KEEP_NAMES:
+            return name
+        canonical.names.append(name)
+        return renamed.setdefault(name, f"v{len(renamed)}")
+
+    # Depth-first in source order, so the lists of two codes with the same
+    # dump line up.
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Name):
+            node.id = rename(node.id)
+        elif isinstance(node, ast.Constant):
+            canonical.literals.append(node.value)
+            node.value = literal_bucket(node.value)
+        elif isinstance(node, ast.arg):
+            node.arg = rename(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            node.name = rename(node.name)
+            node.body = strip_docstring(node.body)
+        elif isinstance(node, ast.Module):
+            node.body = strip_docstring(node.body)
+        elif isinstance(node, ast.alias):
+            node.asname = rename(node.asname)
+        elif isinstance(node, ast.ExceptHandler):
+            node.name = rename(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            node.names = [rename(name) for name in node.names]
+
+        if isinstance(node, ast.stmt):
+            canonical.lines.append(node.lineno)
+        stack.extend(reversed(list(ast.iter_child_nodes(node))))
+
+    canonical.hash = "ast:" + hashlib.sha256(ast.dump(tree).encode("utf-8")).hexdigest()
+    return canonical
+
+
+def canonical_tokens(tokens: list) -> Canonical:
+    # For code that does not parse: the token stream, with identifiers
+    # numbered in order of appearance.
+    canonical = Canonical("")
+    renamed = {}
+    parts = []
+    for text, raw, line in tokens:
+        if text == "<id>":
+            canonical.names.append(raw)
+            text = renamed.setdefault(raw, f"v{len(renamed)}")
+        elif text in ("<int>", "<str>"):
+            canonical.literals.append(literal_value(raw))
+        parts.append(text)
+        canonical.lines.append(line)
+    canonical.hash = "tok:" + hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return canonical
+
+
+def literal_value(text: str):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+# ================= MINHASH =================
+
+def minhash(tokens: list) -> array:
+    # One-permutation MinHash: each shingle hash falls into one of SLOTS
+    # slots and each slot keeps its minimum. Empty slots borrow the next
+    # filled slot's value (densification) so short code still compares.
+    slots = [EMPTY] * SLOTS
+    texts = [text for text, _, _ in tokens]
+    for start in range(max(len(texts) - SHINGLE_SIZE + 1, 1)):
+        shingle = "\x1f".join(texts[start:start + SHINGLE_SIZE]).encode("utf-8")
+        # crc32 is fast but weak in the high bits; a multiplicative mix
+        # spreads it before the top 6 bits pick the slot.
+        value = (zlib.crc32(shingle) * 0x9E3779B1) & EMPTY
+        slot, value = value >> 26, value & 0x3FFFFFF
+        if value < slots[slot]:
+            slots[slot] = value
+
+    if any(value != EMPTY for value in slots):
+        source = list(slots)
+        for index in range(SLOTS):
+            distance = 0
+            while source[(index + distance) % SLOTS] == EMPTY:
+                distance += 1
+            if distance:
+                # Slot values are below 2**26; the offset keeps borrowed
+                # values distinct from real ones.
+                slots[index] = source[(index + distance) % SLOTS] + (distance << 26)
+
+    return array("I", slots)
+
+
+def similarity(first: array, second: array) -> float:
+    # Estimated Jaccard similarity of the shingle sets.
+    return sum(map(operator.eq, first, second)) / SLOTS
+
+
+@dataclass
+class Fingerprint:
+    canonical: Canonical
+    signature: array
+
+
+def fingerprint(code: str) -> Fingerprint:
+    tokens = scan_tokens(code)
+    return Fingerprint(canonicalize(code, tokens), minhash(tokens))
+
+
+# ================= INDEX =================
+
+class SimilarityIndex:
+    # Exact canonical matches and LSH buckets, keyed by error type and mode.
+
+    def __init__(self, max_entries: int = 50_000, bucket_size: int = 16):
+        self.max_entries = max_entries
+        self.bucket_size = bucket_size
+        self.last_id = 0
+        # (canonical hash, error type, mode, error statement) -> submission id
+        self._exact = {}
+        # (error type, mode, band, band values) -> [submission ids]
+        self._buckets = {}
+        # submission id -> (signature, canonical key, bucket keys, user id),
+        # oldest first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, submission_id: int, canonical_hash: str, signature: array,
+            error_type: str, mode: str, error_statement=None, user_id=None) -> None:
+        exact_key = (canonical_hash, error_type, mode, error_statement)
+        bucket_keys = [
+            (error_type, mode, band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+            for band in range(BANDS)
+        ]
+
+        with self._lock:
+            if submission_id in self._entries:
+                return
+            self.last_id = max(self.last_id, submission_id)
+            self._exact[exact_key] = submission_id
+            for key in bucket_keys:
+                bucket = self._buckets.setdefault(key, [])
+                bucket.append(submission_id)
+                if len(bucket) > self.bucket_size:
+                    del bucket[0]
+            self._entries[submission_id] = (signature, exact_key, bucket_keys, user_id)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def remove(self, submission_id: int) -> None:
+        with self._lock:
+            if submission_id in self._entries:
+                self._remove(submission_id)
+
+    def _remove(self, submission_id: int) -> None:
+        _, exact_key, bucket_keys, _ = self._entries.pop(submission_id)
+        if self._exact.get(exact_key) == submission_id:
+            del self._exact[exact_key]
+        for key in bucket_keys:
+            bucket = self._buckets.get(key)
+            if bucket and submission_id in bucket:
+                bucket.remove(submission_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def exact(self, canonical_hash: str, error_type: str, mode: str, error_statement=None):
+        # Returns the submission id or None.
+        return self._exact.get((canonical_hash, error_type, mode, error_statement))
+
+    def near(self, signature: array, error_type: str, mode: str, threshold: float, user_id=None):
+        # Returns (submission id, similarity) of the best candidate sharing an
+        # LSH band, or None below the threshold. With a user_id, only that
+        # user's submissions are candidates.
+        with self._lock:
+            band_hits = Counter()
+            for band in range(BANDS):
+                key = (error_type, mode, band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+                band_hits.update(self._buckets.get(key, ()))
+            if user_id is not None:
+                band_hits = Counter({
+                    submission_id: hits for submission_id, hits in band_hits.items()
+                    if self._entries[submission_id][3] == user_id
+                })
+
+            # Candidates sharing the most bands are the likeliest matches;
+            # verifying a few of them keeps popular snippets cheap.
+            best = None
+            for submission_id, _ in band_hits.most_common(VERIFY_CANDIDATES):
+                score = similarity(signature, self._entries[submission_id][0])
+                if score >= threshold and (best is None or score > best[1]):
+                    best = (submission_id, score)
+        return best
+
+
+# ================= PERSISTENCE =================
+
+_index = None
+_index_lock = threading.Lock()
+_refreshed_at = 0.0
+
+
+def get_index() -> SimilarityIndex:
+    # Loaded from the database on first use, then topped up with rows saved
+    # by other processes every REFRESH_SECONDS.
+    global _index, _refreshed_at
+
+    config = get_config()
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = SimilarityIndex(config["MAX_ENTRIES"])
+                load_fingerprints(index, limit=config["MAX_ENTRIES"])
+                _refreshed_at = time.monotonic()
+                _index = index
+
+    if time.monotonic() - _refreshed_at > config["REFRESH_SECONDS"]:
+        _refreshed_at = time.monotonic()
+        load_fingerprints(_index, after=_index.last_id)
+
+    return _index
+
+
+def load_fingerprints(index: SimilarityIndex, after: int = 0, limit: int = None) -> None:
+    from .models import SubmissionFingerprint
+
+    rows = SubmissionFingerprint.objects.filter(submission_id__gt=after).order_by("-submission_id").values_list(
+        "submission_id", "canonical_hash", "signature", "error_type", "mode", "error_statement", "submission__user_id"
+    )
+    if limit is not None:
+        rows = rows[:limit]
+
+    for submission_id, canonical_hash, signature, error_type, mode, error_statement, user_id in reversed(list(rows)):
+        index.add(submission_id, canonical_hash, array("I", bytes(signature)), error_type, mode, error_statement,
+                  user_id)
+
+
+def reusable_answer(response) -> bool:
+    # Answers carried over from a user's previous attempt (analyzer/incremental.py)
+    # refer to that attempt, so they are not shared.
+    return (
+        bool(response)
+        and response.get("sections") is not None
+        and response.get("confidence") == "high"
+        and response.get("source") != "previous"
+    )
+
+
+def index_submissions(submissions) -> None:
+    # Fingerprints answered submissions and adds them to the index. Answers
+    # built on the user's previous attempt (analyzer/incremental.py) are not
+    # indexed.
+    from .models import SubmissionFingerprint
+
+    if not get_config()["ENABLED"]:
+        return
+
+    rows = []
+    owners = {}
+    for submission in submissions:
+        response = submission.ai_response
+        if submission.pk is None or not reusable_answer(response) or response.get("incremental"):
+            continue
+
+        error_info = parse_error(submission.error_message or "")
+        fp = fingerprint(submission.code)
+        rows.append(SubmissionFingerprint(
+            submission_id=submission.pk,
+            canonical_hash=fp.canonical.hash,
+            signature=fp.signature.tobytes(),
+            error_type=submission.error_type,
+            mode=response.get("mode", "full"),
+            error_statement=error_statement(fp.canonical, error_info.line if error_info else None),
+        ))
+        owners[submission.pk] = submission.user_id
+
+    if not rows:
+        return
+
+    SubmissionFingerprint.objects.bulk_create(rows, ignore_conflicts=True)
+    if _index is not None:
+        for row in rows:
+            _index.add(row.submission_id, row.canonical_hash, array("I", row.signature),
+                       row.error_type, row.mode, row.error_statement, owners[row.submission_id])
+
+
+def index_saved_submission(sender, instance, created, **kwargs):
+    # post_save receiver for CodeSubmission.
+    if created:
+        index_submissions([instance])
+
+
+# ================= REUSE =================
+
+def similar_answer(item: dict):
+    # Returns an earlier answer adapted to item["code"] (JSON, as cached), or
+    # None. Sets item["similar_to"] on a match.
+    if not apps.ready or item["bypass_cache"]:
+        return None
+
+    config = get_config()
+    if not config["ENABLED"]:
+        return None
+
+    from .models import CodeSubmission
+
+    index = get_index()
+    fp = fingerprint(item["code"])
+
+    match = index.exact(
+        fp.canonical.hash, item["error_type"], item["mode"], error_statement(fp.canonical, item["error_line"])
+    )
+    near = None
+    if match is None:
+        user = item.get("user")
+        if item["mode"] != "hint" or user is None:
+            return None
+        near = index.near(fp.signature, item["error_type"], item["mode"], config["NEAR_SIMILARITY"], user.pk)
+        if near is None:
+            return None
+
+    submission_id = match if match else near[0]
+    submission = CodeSubmission.objects.select_related("code_blob", "response_blob", "fixed_code_blob") \
+        .filter(pk=submission_id).first()
+    if submission is None or not reusable_answer(submission.ai_response):
+        index.remove(submission_id)
+        return None
+
+    if match:
+        sections = adapt_exact(submission, fp.canonical, item)
+    else:
+        sections = adapt_near(submission, fp, item)
+    if sections is None:
+        return None
+
+    item["similar_to"] = {"match": "exact" if match else "near", "similarity": 1.0 if match else round(near[1], 3)}
+    return json.dumps({**sections, "confidence": "high"})
+
+
+def error_statement(canonical: Canonical, error_line):
+    # Position of the failing line in the canonical visit order, so the same
+    # error in reformatted code gets the same exact key.
+    if error_line is None or error_line not in canonical.lines:
+        return None
+    return canonical.lines.index(error_line)
+
+
+def adapt_exact(submission, canonical: Canonical, item: dict):
+    # Same canonical form: the visit-order lists line up one to one.
+    previous = canonicalize(submission.code)
+    if previous.hash != canonical.hash:
+        return None
+
+    lines = {}
+    for old, new in zip(previous.lines, canonical.lines):
+        lines.setdefault(old, new)
+
+    old_literals = [(type(value), value) for value in previous.literals]
+    new_literals = [(type(value), value) for value in canonical.literals]
+    if item["mode"] != "hint" and old_literals != new_literals:
+        return None
+
+    names = pair_up(previous.names, canonical.names)
+    literals = pair_up(old_literals, new_literals)
+    # A literal paired with two different values would keep its old text.
+    if any(literals.get(old, old) != new for old, new in zip(old_literals, new_literals)):
+        return None
+    sections = adapt_sections(submission.ai_response["sections"], names, literals)
+    if sections.get("problem_line") is not None:
+        sections["problem_line"] = lines.get(sections["problem_line"], item["error_line"])
+    return sections
+
+
+def adapt_near(submission, fp: Fingerprint, item: dict):
+    # Hints on the user's own submissions only. Identifiers are paired along the matching runs of the two
+    # token streams.
+    from difflib import SequenceMatcher
+
+    old_tokens = scan_tokens(submission.code)
+    new_tokens = scan_tokens(item["code"])
+    matcher = SequenceMatcher(None, [t[0] for t in old_tokens], [t[0] for t in new_tokens], autojunk=False)
+
+    old_names, new_names = [], []
+    for old_start, new_start, size in matcher.get_matching_blocks():
+        for offset in range(size):
+            if old_tokens[old_start + offset][0] == "<id>":
+                old_names.append(old_tokens[old_start + offset][1])
+                new_names.append(new_tokens[new_start + offset][1])
+
+    return adapt_sections(submission.ai_response["sections"], pair_up(old_names, new_names), {})
+
+
+def pair_up(old: list, new: list) -> dict:
+    # old -> new for values that changed; ambiguous pairs are left out.
+    pairs = {}
+    ambiguous = set()
+    for a, b in zip(old, new):
+        if pairs.setdefault(a, b) != b:
+            ambiguous.add(a)
+    return {a: b for a, b in pairs.items() if a != b and a not in ambiguous}
+
+
+CODE_SECTIONS = ("fixed_code", "problem_snippet", "example")
+
+
+def adapt_sections(sections: dict, names: dict, literals: dict) -> dict:
+    adapted = dict(sections)
+    for key, value in sections.items():
+        if not isinstance(value, str) or not value:
+            continue
+        if key in CODE_SECTIONS:
+            adapted[key] = replace_in_code(value, names, literals)
+        else:
+            adapted[key] = replace_in_text(value, names, literals)
+    return adapted
+
+
+def replace_in_code(code: str, names: dict, literals: dict) -> str:
+    if not names and not literals:
+        return code
+
+    edits = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            new = None
+            if tok.type == tokenize.NAME:
+                new = names.get(tok.string)
+            elif tok.type in (tokenize.NUMBER, tokenize.STRING):
+                value = literal_value(tok.string)
+                if (type(value), value) in literals:
+                    new = repr(literals[(type(value), value)][1])
+            if new is not None and tok.start[0] == tok.end[0]:
+                edits.append((tok.start, tok.end, new))
+    except (tokenize.TokenError, SyntaxError):
+        return replace_in_text(code, names, literals)
+
+    lines = code.splitlines(keepends=True)
+    for (row, start), (_, end), text in reversed(edits):
+        lines[row - 1] = lines[row - 1][:start] + text + lines[row - 1][end:]
+    return "".join(lines)
+
+
+def replace_in_text(text: str, names: dict, literals: dict) -> str:
+    # Identifiers as whole words, string literals where they appear quoted.
+    replacements = dict(names)
+    for (kind, old), (_, new) in literals.items():
+        if kind is str:
+            for quote in ("'", '"'):
+                replacements[f"{quote}{old}{quote}"] = f"{quote}{new}{quote}"
+
+    if not replacements:
+        return text
+
+    pattern = re.compile("|".join(
+        rf"\b{re.escape(old)}\b" if old.isidentifier() else re.escape(old)
+        for old in sorted(replacements, key=len, reverse=True)
+    ))
+    return pattern.sub(lambda match: replacements[match.group(0)], text)
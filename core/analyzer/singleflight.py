@@ -0,0 +1,181 @@
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+
+from .conf import get_setting
+
+# Request coalescing ("single flight") for LLM calls. When many students send
+# the same snippet at once, the first request per cache key calls upstream
+# and the others wait for its answer instead of making their own call:
+#
+#   threads    requests in this process join the leader's Future
+#   processes  with a shared response cache (RESPONSE_CACHE "django"), the
+#              leader also takes a lock entry in that cache; leaders in other
+#              processes poll the cache until the answer lands, re-checking
+#              it once more after they get the lock themselves
+#
+# The lock entry expires after LOCK_SECONDS, so a crashed process cannot
+# block a key for longer than that.
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "PROCESS_LOCK": True,
+    "LOCK_SECONDS": 120,
+    "POLL_INTERVAL": 0.1,
+}
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CONFIG, **get_setting("SINGLEFLIGHT", {})}
+
+
+class SingleFlight:
+
+    def __init__(self, shared_cache=None, lock_seconds: float = 120, poll_interval: float = 0.1):
+        # shared_cache: a cache backend with add/get/delete visible to all
+        # processes, or None to coalesce within this process only.
+        self.shared_cache = shared_cache
+        self.lock_seconds = lock_seconds
+        self.poll_interval = poll_interval
+        self.calls = 0
+        self.saved = {"thread": 0, "process": 0}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, call, recheck=None):
+        # Returns (value, shared); shared is True when another request paid
+        # for the upstream call. recheck() reads the shared cache.
+        future, leader = self._join(key)
+        if not leader:
+            self._count("thread")
+            return future.result(), True
+
+        try:
+            value, shared = self._lead(key, call, recheck)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            return value, shared
+        finally:
+            self._leave(key)
+
+    async def ado(self, key: str, acall, recheck=None):
+        # do() for coroutines; sync and async callers share the same flights.
+        future, leader = self._join(key)
+        if not leader:
+            self._count("thread")
+            return await asyncio.shield(asyncio.wrap_future(future)), True
+
+        try:
+            value, shared = await self._alead(key, acall, recheck)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            return value, shared
+        finally:
+            self._leave(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"upstream_calls": self.calls, "saved": dict(self.saved), "in_flight": len(self._flights)}
+
+    # ================= LEADER =================
+
+    def _lead(self, key: str, call, recheck):
+        if self.shared_cache is None or recheck is None:
+            return self._call(call), False
+
+        deadline = time.monotonic() + self.lock_seconds
+        while True:
+            token = self._try_lock(key)
+            value = recheck()
+            if value is not None:
+                self._unlock(key, token)
+                self._count("process")
+                return value, True
+
+            if token is not None or time.monotonic() > deadline:
+                try:
+                    return self._call(call), False
+                finally:
+                    self._unlock(key, token)
+
+            time.sleep(self.poll_interval)
+
+    async def _alead(self, key: str, acall, recheck):
+        if self.shared_cache is None or recheck is None:
+            self._count_call()
+            return await acall(), False
+
+        deadline = time.monotonic() + self.lock_seconds
+        while True:
+            token = await sync_to_async(self._try_lock, thread_sensitive=False)(key)
+            value = await sync_to_async(recheck, thread_sensitive=False)()
+            if value is not None:
+                await sync_to_async(self._unlock, thread_sensitive=False)(key, token)
+                self._count("process")
+                return value, True
+
+            if token is not None or time.monotonic() > deadline:
+                try:
+                    self._count_call()
+                    return await acall(), False
+                finally:
+                    await sync_to_async(self._unlock, thread_sensitive=False)(key, token)
+
+            await asyncio.sleep(self.poll_interval)
+
+    def _try_lock(self, key: str):
+        # Returns a token when this process now holds the key, else None.
+        token = uuid.uuid4().hex
+        if self.shared_cache.add("singleflight:" + key, token, self.lock_seconds):
+            return token
+        return None
+
+    def _unlock(self, key: str, token) -> None:
+        if token is not None and self.shared_cache.get("singleflight:" + key) == token:
+            self.shared_cache.delete("singleflight:" + key)
+
+    # ================= BOOKKEEPING =================
+
+    def _join(self, key: str):
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return future, False
+            future = self._flights[key] = Future()
+            return future, True
+
+    def _leave(self, key: str) -> None:
+        with self._lock:
+            del self._flights[key]
+
+    def _call(self, call):
+        self._count_call()
+        return call()
+
+    def _count_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def _count(self, scope: str) -> None:
+        with self._lock:
+            self.saved[scope] += 1
+
+
+def make_singleflight(backend):
+    # None when disabled. The cross-process lock needs a shared backend.
+    config = get_config()
+    if not config["ENABLED"]:
+        return None
+
+    shared_cache = backend if config["PROCESS_LOCK"] and getattr(backend, "shared", False) else None
+    return SingleFlight(shared_cache, config["LOCK_SECONDS"], config["POLL_INTERVAL"])
@@ -0,0 +1,293 @@
+import ast
+from collections import deque
+from dataclasses import dataclass
+
+from .conf import get_setting
+from .error_utils import user_lines
+
+# Traceback-guided slicing of long submissions. Instead of pasting the whole
+# file into the prompt, only the code around the failing lines is sent:
+#
+#   focus       the top-level statement (function, class member or module
+#               statement) holding each user frame of the traceback,
+#               innermost first
+#   references  the definitions, constants and imports those statements
+#               name, breadth-first, so direct dependencies come first
+#
+# Units are added while the excerpt stays within TOKEN_BUDGET; the innermost
+# frame is always kept, cut to a window around the failing line when it is
+# too long on its own. Code that does not parse gets a window around the
+# failing lines, and code without any line to go on keeps whole top-level
+# statements in source order (the head of the file if even the first one is
+# too long).
+#
+# Lines keep their numbers from the full file and every omitted stretch is
+# marked, so PROBLEM_LINE still points into the submitted code. Submissions
+# under MIN_LINES lines are sent whole.
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "MIN_LINES": 80,
+    "TOKEN_BUDGET": 2000,
+}
+
+# Rough size of a token in characters, as in bench/prompt_tokens.py when
+# tiktoken is not installed.
+CHARS_PER_TOKEN = 4
+
+# Room taken by the line number prefix ("  120 | ").
+PREFIX_CHARS = 8
+
+
+def get_config() -> dict:
+    return {**DEFAULT_CONFIG, **get_setting("SLICING", {})}
+
+
+@dataclass
+class Excerpt:
+    code: str
+    lines: int
+    total: int
+
+
+def line_cost(line: str) -> int:
+    return len(line) + PREFIX_CHARS
+
+
+# ================= UNITS =================
+# A unit is a run of source lines that is kept or omitted as a whole: a
+# top-level statement, or the header and each member of a top-level class.
+
+@dataclass
+class Unit:
+    start: int
+    end: int
+    # The AST nodes whose names the unit uses; walked only once it is kept.
+    nodes: list
+    # First line of a function body; the lines before it are the signature.
+    body: int = None
+    parent: int = None
+
+
+def statement_start(node) -> int:
+    decorators = getattr(node, "decorator_list", None)
+    return min([node.lineno] + [decorator.lineno for decorator in decorators or ()])
+
+
+def referenced_names(nodes: list) -> set:
+    # Plain names and attribute names; the latter find methods called
+    # through self or an instance.
+    names = set()
+    for node in nodes:
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                names.add(child.id)
+            elif isinstance(child, ast.Attribute):
+                names.add(child.attr)
+    return names
+
+
+def bound_names(node) -> list:
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return [(alias.asname or alias.name).split(".")[0] for alias in node.names]
+    if isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        return [
+            child.id for target in targets for child in ast.walk(target)
+            if isinstance(child, ast.Name)
+        ]
+    return []
+
+
+def make_unit(node, parent: int = None) -> Unit:
+    body = None
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        body = statement_start(node.body[0])
+    return Unit(statement_start(node), node.end_lineno, [node], body, parent)
+
+
+def build_units(tree):
+    # Returns (units, bindings) where bindings maps a name to the units
+    # defining it; a class name maps to its header and every member.
+    units = []
+    bindings = {}
+
+    def bind(name, index):
+        bindings.setdefault(name, []).append(index)
+
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            units.append(make_unit(node))
+            for name in bound_names(node):
+                bind(name, len(units) - 1)
+            continue
+
+        header = len(units)
+        first = statement_start(node.body[0])
+        parts = node.bases + node.keywords + node.decorator_list
+        units.append(Unit(statement_start(node), max(first - 1, node.lineno), parts))
+        bind(node.name, header)
+
+        for member in node.body:
+            units.append(make_unit(member, header))
+            bind(node.name, len(units) - 1)
+            for name in bound_names(member):
+                bind(name, len(units) - 1)
+
+    return units, bindings
+
+
+def unit_at(units: list, line: int):
+    for index, unit in enumerate(units):
+        if unit.start <= line <= unit.end:
+            return index
+    return None
+
+
+# ================= SELECTION =================
+
+def window(source: list, start: int, end: int, center: int, budget: int) -> set:
+    # Lines of start..end around center, growing outwards while they fit.
+    kept = {center}
+    used = line_cost(source[center - 1])
+    low, high = center - 1, center + 1
+    while low >= start or high <= end:
+        grown = False
+        for line in (low, high):
+            if start <= line <= end:
+                cost = line_cost(source[line - 1])
+                if used + cost <= budget:
+                    kept.add(line)
+                    used += cost
+                    grown = True
+        if not grown:
+            break
+        low, high = low - 1, high + 1
+    return kept
+
+
+def select_lines(source: list, tree, focus: list, budget: int) -> set:
+    units, bindings = build_units(tree)
+    kept = set()
+    used = 0
+    seen = set()
+    queue = deque()
+
+    def cost(lines) -> int:
+        return sum(line_cost(source[line - 1]) for line in lines - kept)
+
+    def span(index) -> set:
+        unit = units[index]
+        lines = set(range(unit.start, unit.end + 1))
+        if unit.parent is not None:
+            lines |= span(unit.parent)
+        return lines
+
+    def keep(lines):
+        nonlocal used
+        used += cost(lines)
+        kept.update(lines)
+
+    def visit(index, forced_line=None):
+        if index in seen:
+            return
+        unit = units[index]
+        lines = span(index)
+        if used + cost(lines) > budget:
+            if forced_line is None:
+                return
+            # The innermost frame alone is over budget: keep its class
+            # header and signature, and a window around the failing line.
+            low = unit.start
+            lines = span(unit.parent) if unit.parent is not None else set()
+            if unit.body and forced_line >= unit.body:
+                lines |= set(range(unit.start, unit.body))
+                low = unit.body
+            keep(lines)
+            lines = window(source, low, unit.end, forced_line, budget - used)
+
+        keep(lines)
+        for owner in (index, unit.parent):
+            if owner is not None and owner not in seen:
+                seen.add(owner)
+                queue.append(referenced_names(units[owner].nodes))
+
+    # Innermost frame first; it is always kept.
+    for position, line in enumerate(reversed(focus)):
+        index = unit_at(units, line)
+        if index is not None:
+            visit(index, forced_line=line if position == 0 else None)
+
+    if not seen:
+        for index in range(len(units)):
+            visit(index)
+        return kept
+
+    while queue:
+        for name in sorted(queue.popleft()):
+            for index in bindings.get(name, ()):
+                visit(index)
+
+    return kept
+
+
+# ================= RENDERING =================
+
+def render(source: list, kept: set) -> str:
+    width = len(str(len(source)))
+    parts = []
+    previous = 0
+    for line in sorted(kept):
+        if line > previous + 1:
+            parts.append(omitted(previous + 1, line - 1, width))
+        parts.append(f"{line:>{width}} | {source[line - 1]}")
+        previous = line
+    if previous < len(source):
+        parts.append(omitted(previous + 1, len(source), width))
+    return "\n".join(parts)
+
+
+def omitted(first: int, last: int, width: int) -> str:
+    span = f"line {first}" if first == last else f"lines {first}-{last}"
+    return f"{'':>{width}} | ... ({span} omitted)"
+
+
+def slice_code(code: str, lines: list, budget: int):
+    # Returns an Excerpt of code fitted to `budget` tokens around the given
+    # 1-based lines (outermost frame first), or None when it all fits.
+    source = code.splitlines()
+    budget_chars = budget * CHARS_PER_TOKEN
+    if sum(line_cost(line) for line in source) <= budget_chars:
+        return None
+
+    lines = [line for line in lines if 1 <= line <= len(source)]
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        tree = None
+
+    if tree is not None:
+        kept = select_lines(source, tree, lines, budget_chars)
+    else:
+        kept = set()
+        share = budget_chars // max(len(set(lines)), 1)
+        for line in reversed(lines or [1]):
+            kept |= window(source, 1, len(source), line, share)
+
+    if not kept:
+        kept = window(source, 1, len(source), 1, budget_chars)
+    return Excerpt(render(source, kept), len(kept), len(source))
+
+
+def worth_slicing(code: str) -> bool:
+    config = get_config()
+    return config["ENABLED"] and code.count("\n") + 1 >= config["MIN_LINES"]
+
+
+def prompt_excerpt(code: str, error: str):
+    # The Excerpt to send instead of the code, or None to send it whole.
+    if not worth_slicing(code):
+        return None
+    return slice_code(code, user_lines(error), get_config()["TOKEN_BUDGET"])
@@ -170,7 +170,7 @@ ${example.innerText}
       document.querySelector("[name=csrfmiddlewaretoken]").value;
 
     try {
-      const response = await fetch("/debug/", {
+      const response = await fetch("/debug/stream/", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -179,14 +179,15 @@ ${example.innerText}
         body: JSON.stringify({ code, error, mode })
       });
 
-      const data = await response.json();
-
-      if (data.mode === "hint") {
-        showHintOnly(data.result);
-      } else {
-        showFullOutput(data.error || data.result);
+      // Validation errors come back as plain JSON before streaming starts
+      if (!response.ok) {
+        const data = await response.json();
+        showFullOutput(data.error);
+        return;
       }
 
+      await readDebugStream(response, mode);
+
     } catch (err) {
       console.error("Debug error:", err);
       alert("Something went wrong");
@@ -194,6 +195,92 @@ ${example.innerText}
   });
 });
 
+/* =============================
+   STREAMING RESPONSE
+============================= */
+const SECTION_ELEMENTS = {
+  ERROR_REASON: "errorReason",
+  PROBLEM_LINE: "problemLine",
+  EXPLANATION: "explanation",
+  FIXED_CODE: "fixedCode",
+  EXAMPLE: "example"
+};
+
+async function readDebugStream(response, mode) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let hintText = "";
+
+  if (mode === "hint") {
+    showHintOnly("");
+  } else {
+    document.getElementById("hintOutput").style.display = "none";
+    document.getElementById("fullOutput").style.display = "block";
+    Object.values(SECTION_ELEMENTS)
+      .forEach(id => document.getElementById(id).innerText = "—");
+  }
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      const { event, data } = parseSSE(rawEvent);
+
+      if (event === "token" && mode === "hint") {
+        hintText += data.text;
+        document.getElementById("hintText").innerText = hintText;
+      } else if (event === "section" && SECTION_ELEMENTS[data.name]) {
+        document.getElementById(SECTION_ELEMENTS[data.name]).innerText =
+          data.content || "—";
+      } else if (event === "done") {
+        if (data.mode === "hint") {
+          showHintOnly(data.result);
+        } else if (data.confidence === "low") {
+          showFullOutput(data.result);
+        } else if (data.sections) {
+          renderSections(data.sections);
+        }
+      }
+    }
+  }
+}
+
+// The final, typed answer from the server replaces the streamed sections.
+function renderSections(sections) {
+  const problem = sections.problem_line !== null
+    ? `Line ${sections.problem_line}: ${sections.problem_snippet}`
+    : sections.problem_snippet;
+
+  errorReason.innerText = sections.reason || "—";
+  problemLine.innerText = problem || "—";
+  explanation.innerText = sections.explanation || "—";
+  fixedCode.innerText = sections.fixed_code || "—";
+  example.innerText = sections.example || "—";
+}
+
+function parseSSE(rawEvent) {
+  let event = "message";
+  let data = "";
+
+  rawEvent.split("\n").forEach(line => {
+    if (line.startsWith("event: ")) {
+      event = line.slice(7);
+    } else if (line.startsWith("data: ")) {
+      data += line.slice(6);
+    }
+  });
+
+  return { event, data: data ? JSON.parse(data) : {} };
+}
+
 /* =============================
    OUTPUT HANDLING
 ============================= */
@@ -0,0 +1,570 @@
+import ast
+import builtins
+from dataclasses import dataclass, field
+
+# Local analysis for the beginner mistakes taught by the few-shot examples in
+# prompts.py. High-confidence findings are answered without calling the LLM.
+
+BUILTIN_NAMES = {
+    name for name in dir(builtins)
+    if not name.startswith("_") and not name[0].isupper()
+}
+
+MUTABLE_FACTORIES = {"list": "[]", "dict": "{}", "set": "set()"}
+
+# Methods that change a list, dict or set in place.
+MUTATING_METHODS = {
+    "append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+    "update", "setdefault", "popitem", "add", "discard",
+}
+
+
+@dataclass
+class Finding:
+    rule: str
+    line: int
+    reason: str
+    explanation: str
+    example: str
+    confidence: str = "high"
+    # Secondary findings (priority 1) never lead the answer when a more
+    # specific issue exists.
+    priority: int = 0
+    edits: list = field(default_factory=list)
+
+
+# ================= EDITS =================
+# ("replace", line, col, end_col, text) | ("insert", before_line, lines)
+# | ("delete", start_line, end_line). Lines are 1-based, columns are the
+# UTF-8 byte offsets reported by ast.
+
+def _char_col(line: str, byte_col: int) -> int:
+    return len(line.encode("utf-8")[:byte_col].decode("utf-8", "ignore"))
+
+
+def _edit_span(edit):
+    if edit[0] == "replace":
+        return edit[1], edit[1]
+    if edit[0] == "insert":
+        return edit[1], edit[1]
+    return edit[1], edit[2]
+
+
+def apply_edits(code: str, edits: list) -> str:
+    lines = code.split("\n")
+
+    def sort_key(edit):
+        start, _ = _edit_span(edit)
+        col = edit[2] if edit[0] == "replace" else 0
+        return start, col
+
+    for edit in sorted(edits, key=sort_key, reverse=True):
+        if edit[0] == "replace":
+            _, line_no, col, end_col, text = edit
+            line = lines[line_no - 1]
+            start = _char_col(line, col)
+            end = _char_col(line, end_col)
+            lines[line_no - 1] = line[:start] + text + line[end:]
+        elif edit[0] == "insert":
+            _, before, new_lines = edit
+            lines[before - 1:before - 1] = new_lines
+        else:
+            _, start, end = edit
+            del lines[start - 1:end]
+
+    return "\n".join(lines)
+
+
+def _indent_of(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+# ================= ANALYSIS =================
+
+class _Collector(ast.NodeVisitor):
+
+    def __init__(self):
+        self.loaded = set()
+        self.stored = {}
+        self.calls = 0
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.loaded.add(node.id)
+        else:
+            self.stored.setdefault(node.id, []).append(node)
+
+    def visit_Call(self, node):
+        self.calls += 1
+        self.generic_visit(node)
+
+
+def _constant_bindings(tree: ast.Module, collector: _Collector) -> dict:
+    # Names assigned exactly once, at module level, to a literal.
+    values = {}
+    for stmt in tree.body:
+        if (
+            isinstance(stmt, ast.Assign)
+            and len(stmt.targets) == 1
+            and isinstance(stmt.targets[0], ast.Name)
+            and isinstance(stmt.value, ast.Constant)
+            and len(collector.stored.get(stmt.targets[0].id, [])) == 1
+        ):
+            values[stmt.targets[0].id] = (stmt.value.value, stmt.lineno)
+    return values
+
+
+def _evaluate(node, constants: dict, before_line: int):
+    # Evaluates simple comparisons over known constants; LookupError if unknown.
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in constants and constants[node.id][1] < before_line:
+            return constants[node.id][0]
+        raise LookupError(node.id)
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        left = _evaluate(node.left, constants, before_line)
+        right = _evaluate(node.comparators[0], constants, before_line)
+        op = type(node.ops[0])
+        operations = {
+            ast.Gt: lambda a, b: a > b,
+            ast.GtE: lambda a, b: a >= b,
+            ast.Lt: lambda a, b: a < b,
+            ast.LtE: lambda a, b: a <= b,
+            ast.Eq: lambda a, b: a == b,
+            ast.NotEq: lambda a, b: a != b,
+        }
+        if op in operations:
+            return operations[op](left, right)
+    if isinstance(node, ast.BoolOp):
+        values = [_evaluate(value, constants, before_line) for value in node.values]
+        return all(values) if isinstance(node.op, ast.And) else any(values)
+    raise LookupError(ast.dump(node))
+
+
+def _check_discarded_comparisons(tree, code, lines, collector, findings):
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Expr) and isinstance(node.value, ast.Compare)):
+            continue
+
+        compare = node.value
+        source = ast.get_source_segment(code, compare) or ""
+
+        if (
+            isinstance(compare.left, ast.Name)
+            and len(compare.ops) == 1
+            and isinstance(compare.ops[0], ast.Eq)
+            and compare.left.id not in collector.stored
+            and node.lineno == node.end_lineno
+        ):
+            line = lines[node.lineno - 1]
+            start = _char_col(line, compare.col_offset)
+            end = _char_col(line, compare.end_col_offset)
+            fixed = line[start:end].replace("==", "=", 1)
+            findings.append(Finding(
+                rule="comparison-instead-of-assignment",
+                line=node.lineno,
+                reason="The equality operator `==` is used where an assignment `=` was probably intended (logical error).",
+                explanation=(
+                    f"`{source}` compares `{compare.left.id}` with a value and throws the result away. "
+                    f"`{compare.left.id}` is never assigned, so if the intention was to give it a value, "
+                    "the assignment operator `=` should be used."
+                ),
+                example="count = 5      # assignment\nprint(count == 5)  # comparison -> True",
+                edits=[("replace", node.lineno, compare.col_offset, compare.end_col_offset,
+                        fixed)],
+            ))
+            continue
+
+        edits = []
+        if node.lineno == node.end_lineno:
+            edits = [("replace", node.lineno, compare.col_offset, compare.end_col_offset,
+                      f"print({source})")]
+        findings.append(Finding(
+            rule="discarded-comparison",
+            line=node.lineno,
+            reason="A comparison expression is evaluated and then discarded (logical issue, no runtime error).",
+            explanation=(
+                f"`{source}` produces True or False, but the result is not stored, printed or used "
+                "in a condition, so the statement has no visible effect. "
+                "To make it meaningful, print or assign the result."
+            ),
+            example="x = 10\nis_double = x + x == 20\nprint(is_double)  # True",
+            edits=edits,
+        ))
+
+
+def _check_unreachable(tree, lines, findings):
+    terminators = (ast.Return, ast.Raise, ast.Continue, ast.Break)
+
+    for node in ast.walk(tree):
+        for field_name in ("body", "orelse", "finalbody"):
+            body = getattr(node, field_name, None)
+            if not isinstance(body, list):
+                continue
+
+            for index, stmt in enumerate(body[:-1]):
+                if not isinstance(stmt, terminators):
+                    continue
+
+                dead = body[index + 1:]
+                keyword = type(stmt).__name__.lower()
+                findings.append(Finding(
+                    rule="unreachable-code",
+                    line=dead[0].lineno,
+                    reason=f"Code after a `{keyword}` statement is unreachable (logical issue).",
+                    explanation=(
+                        f"The `{keyword}` on line {stmt.lineno} leaves the block, so the statements "
+                        f"from line {dead[0].lineno} to line {dead[-1].end_lineno} never execute. "
+                        f"Move them before the `{keyword}` or remove them."
+                    ),
+                    example='def test():\n    print("Hello")\n    return 10\n\nprint(test())  # Hello, then 10',
+                    edits=[("delete", dead[0].lineno, dead[-1].end_lineno)],
+                ))
+                break
+
+
+def _check_constant_conditions(tree, constants, findings):
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.If, ast.While)):
+            continue
+        if not any(isinstance(child, ast.Compare) for child in ast.walk(node.test)):
+            continue
+
+        try:
+            value = bool(_evaluate(node.test, constants, node.lineno))
+        except (LookupError, TypeError):
+            continue
+
+        if value and not (isinstance(node, ast.If) and node.orelse):
+            continue
+
+        names = sorted({
+            child.id for child in ast.walk(node.test) if isinstance(child, ast.Name)
+        })
+        known = ", ".join(f"{name} = {constants[name][0]!r}" for name in names)
+        branch = "body" if not value else "else branch"
+        findings.append(Finding(
+            rule="constant-condition",
+            line=node.lineno,
+            reason=f"The condition on line {node.lineno} always evaluates to {value}, so its {branch} never runs (logical issue).",
+            explanation=(
+                f"With {known}, the condition is always {value}. "
+                f"As a result, the {branch} is never executed. "
+                "The condition or the value may need to be adjusted."
+            ),
+            example='x = 15\nif x > 10:\n    print("Greater")  # Greater',
+            # Feature flags (DEBUG = False; if DEBUG == True:) look the same.
+            confidence="low",
+        ))
+
+
+def _check_empty_ranges(tree, findings):
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.For) and isinstance(node.iter, ast.Call)):
+            continue
+
+        call = node.iter
+        if not (
+            isinstance(call.func, ast.Name)
+            and call.func.id == "range"
+            and len(call.args) == 2
+            and not call.keywords
+            and all(isinstance(arg, ast.Constant) and isinstance(arg.value, int) for arg in call.args)
+        ):
+            continue
+
+        start, stop = (arg.value for arg in call.args)
+        if start <= stop:
+            continue
+
+        edits = []
+        if call.lineno == call.end_lineno:
+            edits = [("replace", call.lineno, call.col_offset, call.end_col_offset,
+                      f"range({start}, {stop}, -1)")]
+        findings.append(Finding(
+            rule="empty-range",
+            line=node.lineno,
+            reason=f"`range({start}, {stop})` is empty, so the loop body never runs (logical issue).",
+            explanation=(
+                f"`range` counts upwards by default, and {start} is already greater than {stop}, "
+                "so it generates an empty sequence. "
+                "To iterate backwards, a negative step value should be used."
+            ),
+            example="for i in range(5, 0, -1):\n    print(i)  # 5 4 3 2 1",
+            edits=edits,
+        ))
+
+
+def _is_mutable_default(node) -> bool:
+    if isinstance(node, (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.DictComp, ast.SetComp)):
+        return True
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in MUTABLE_FACTORIES
+    )
+
+
+def _mutates(function, name: str) -> bool:
+    # True when the body changes `name` in place: a mutating method call,
+    # item assignment or deletion, or an augmented assignment.
+    def is_name(node):
+        return isinstance(node, ast.Name) and node.id == name
+
+    for node in ast.walk(function):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if node.func.attr in MUTATING_METHODS and is_name(node.func.value):
+                return True
+        elif isinstance(node, ast.Subscript) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            if is_name(node.value):
+                return True
+        elif isinstance(node, ast.AugAssign) and is_name(node.target):
+            return True
+    return False
+
+
+def _check_mutable_defaults(tree, code, lines, findings):
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+
+        positional = node.args.posonlyargs + node.args.args
+        pairs = list(zip(positional[len(positional) - len(node.args.defaults):], node.args.defaults))
+        pairs += [
+            (arg, default) for arg, default in zip(node.args.kwonlyargs, node.args.kw_defaults)
+            if default is not None
+        ]
+
+        for arg, default in pairs:
+            if not _is_mutable_default(default):
+                continue
+
+            source = ast.get_source_segment(code, default) or "[]"
+            body_line = node.body[0].lineno
+            indent = _indent_of(lines[body_line - 1])
+            edits = []
+            if default.lineno == default.end_lineno:
+                edits = [
+                    ("replace", default.lineno, default.col_offset, default.end_col_offset, "None"),
+                    ("insert", body_line, [
+                        f"{indent}if {arg.arg} is None:",
+                        f"{indent}    {arg.arg} = {source}",
+                    ]),
+                ]
+            findings.append(Finding(
+                rule="mutable-default-argument",
+                line=node.lineno,
+                reason=f"`{node.name}` uses a mutable default argument `{arg.arg}={source}` (logical issue).",
+                explanation=(
+                    "Default values are created once, when the function is defined. "
+                    f"The same `{source}` object is reused across calls, so changes made in one call "
+                    "leak into the next. A safer approach is to use `None` as the default value and "
+                    "create a new object inside the function."
+                ),
+                example=(
+                    "def add_item(item, items=None):\n"
+                    "    if items is None:\n"
+                    "        items = []\n"
+                    "    items.append(item)\n"
+                    "    return items\n\n"
+                    "print(add_item(1))  # [1]\n"
+                    "print(add_item(2))  # [2]"
+                ),
+                # A default that is only read is not the bug; leave it to the model.
+                confidence="high" if _mutates(node, arg.arg) else "low",
+                edits=edits,
+            ))
+
+
+def _check_shadowed_builtins(tree, collector, findings):
+    for stmt in tree.body:
+        if not isinstance(stmt, ast.Assign):
+            continue
+
+        for target in stmt.targets:
+            if not (isinstance(target, ast.Name) and target.id in BUILTIN_NAMES):
+                continue
+
+            name = target.id
+            new_name = f"my_{name}"
+            edits = [
+                ("replace", node.lineno, node.col_offset, node.end_col_offset, new_name)
+                for node in ast.walk(tree)
+                if isinstance(node, ast.Name) and node.id == name
+            ]
+            findings.append(Finding(
+                rule="shadowed-builtin",
+                line=stmt.lineno,
+                reason=f"The variable name `{name}` shadows Python's built-in `{name}` (logical issue).",
+                explanation=(
+                    f"After this assignment, `{name}` no longer refers to the built-in, so any later "
+                    f"call such as `{name}(...)` uses your value instead. While the code works, "
+                    "overriding built-in names can lead to confusing bugs. Using a different variable "
+                    "name is recommended."
+                ),
+                example=f"{new_name} = [1, 2, 3]\nprint({name}(range(2)))  # the built-in still works",
+                edits=edits,
+            ))
+
+
+def _only_definitions(tree) -> bool:
+    allowed = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Import, ast.ImportFrom)
+    return all(
+        isinstance(stmt, allowed)
+        or (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant))
+        for stmt in tree.body
+    )
+
+
+def _check_uncalled_functions(tree, lines, collector, findings):
+    if not _only_definitions(tree):
+        return
+
+    for stmt in tree.body:
+        if not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if stmt.name in collector.loaded:
+            continue
+
+        required = len(stmt.args.posonlyargs + stmt.args.args) - len(stmt.args.defaults)
+        edits = []
+        if required == 0 and not isinstance(stmt, ast.AsyncFunctionDef):
+            edits = [("insert", len(lines) + 1, ["", f"{stmt.name}()"])]
+
+        findings.append(Finding(
+            rule="uncalled-function",
+            line=stmt.lineno,
+            reason=f"The function `{stmt.name}` is defined but never called (logical issue).",
+            explanation=(
+                f"Defining `{stmt.name}` only creates the function object. "
+                "Because it is never called, its body never runs and the code produces no output. "
+                "To execute it, the function must be called."
+            ),
+            example='def greet():\n    print("Hello")\n\ngreet()  # Hello',
+            # Any library module is definitions only.
+            confidence="low",
+            priority=1,
+            edits=edits,
+        ))
+
+
+def _check_unused_variables(tree, lines, collector, findings):
+    # Only reported confidently for straight-line scripts with nothing else
+    # going on; in larger programs an unused name is rarely the real issue.
+    trivial = collector.calls == 0 and all(isinstance(stmt, ast.Assign) for stmt in tree.body)
+
+    for stmt in tree.body:
+        if not isinstance(stmt, ast.Assign):
+            continue
+        for target in stmt.targets:
+            if not isinstance(target, ast.Name):
+                continue
+            name = target.id
+            if name in collector.loaded or name.startswith("_") or name in BUILTIN_NAMES:
+                continue
+
+            findings.append(Finding(
+                rule="unused-variable",
+                line=stmt.lineno,
+                reason=f"The variable `{name}` is assigned but never used (no error).",
+                explanation=(
+                    f"`{name}` is defined correctly, but it is never read afterwards. "
+                    "This statement has no observable effect unless the variable is used later."
+                ),
+                example=f"{name} = 100\nprint({name})  # 100",
+                confidence="high" if trivial else "low",
+                priority=1,
+                edits=[("insert", len(lines) + 1, [f"print({name})"])],
+            ))
+
+
+def analyze_code(code: str) -> list:
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+
+    lines = code.split("\n")
+    collector = _Collector()
+    collector.visit(tree)
+    constants = _constant_bindings(tree, collector)
+
+    findings = []
+    _check_discarded_comparisons(tree, code, lines, collector, findings)
+    _check_unreachable(tree, lines, findings)
+    _check_constant_conditions(tree, constants, findings)
+    _check_empty_ranges(tree, findings)
+    _check_mutable_defaults(tree, code, lines, findings)
+    _check_shadowed_builtins(tree, collector, findings)
+    _check_uncalled_functions(tree, lines, collector, findings)
+    _check_unused_variables(tree, lines, collector, findings)
+
+    findings.sort(key=lambda finding: (finding.confidence != "high", finding.priority, finding.line))
+    return findings
+
+
+# ================= LOCAL ANSWERS =================
+
+def _fixed_code(code: str, findings: list) -> str:
+    # Apply every non-overlapping edit; fall back to the primary finding
+    # alone if the combined result does not compile.
+    edits = []
+    touched = set()
+    for finding in findings:
+        spans = [_edit_span(edit) for edit in finding.edits]
+        lines = {line for start, end in spans for line in range(start, end + 1)}
+        if lines & touched:
+            continue
+        touched |= lines
+        edits.extend(finding.edits)
+
+    for candidate in (edits, findings[0].edits):
+        fixed = apply_edits(code, candidate)
+        try:
+            compile(fixed, "<fixed_code>", "exec")
+            return fixed
+        except SyntaxError:
+            continue
+
+    return code
+
+
+def format_answer(code: str, findings: list, mode: str) -> str:
+    lines = code.split("\n")
+    primary = findings[0]
+
+    if mode == "hint":
+        hints = [
+            f"{index}. Look at line {finding.line}: {finding.reason}"
+            for index, finding in enumerate(findings, start=1)
+        ]
+        return "HINTS:\n" + "\n".join(hints)
+
+    explanation = primary.explanation
+    others = findings[1:]
+    if others:
+        explanation += "\n\nAlso check:\n" + "\n".join(
+            f"- Line {finding.line}: {finding.reason}" for finding in others
+        )
+
+    if primary.edits:
+        fixed = _fixed_code(code, findings)
+    else:
+        fixed = code
+
+    return (
+        f"ERROR_REASON: {primary.reason}\n\n"
+        f"PROBLEM_LINE: Line {primary.line}: {lines[primary.line - 1].strip()}\n\n"
+        f"EXPLANATION: {explanation}\n\n"
+        f"FIXED_CODE: 🛠️\n{fixed}\n\n"
+        f"EXAMPLE: ✅\n{primary.example}\n"
+    )
+
+
+def answer_locally(code: str, mode: str):
+    # Returns a response in the LLM format, or None when the model is needed.
+    findings = [finding for finding in analyze_code(code) if finding.confidence == "high"]
+    if not findings:
+        return None
+    return format_answer(code, findings, mode)
@@ -0,0 +1,51 @@
+from django.test import SimpleTestCase
+
+from analyzer.incremental import changed_lines, code_lines, diff_code, line_ranges, map_line, merge
+
+OLD = ["a = 1", "b = 2", "c = a + b", "print(c)"]
+
+
+class DiffTests(SimpleTestCase):
+
+    def test_code_lines_drop_trailing_blank_lines_and_spaces(self):
+        self.assertEqual(code_lines("a = 1   \n\nb = 2\n\n\n"), ["a = 1", "", "b = 2"])
+
+    def test_below_the_minimum_similarity(self):
+        self.assertIsNone(diff_code(OLD, ["x = 9", "y = 8", "z = 7", "print(x)"], 0.6))
+
+    def test_changed_and_inserted_lines(self):
+        new = ["a = 1", "b = 3", "c = a + b", "d = c", "print(c)"]
+        diff = diff_code(OLD, new)
+        self.assertEqual(changed_lines(diff, len(new)), [2, 4])
+
+    def test_deletion_marks_the_following_line(self):
+        new = ["a = 1", "c = a + b", "print(c)"]
+        diff = diff_code(OLD, new)
+        self.assertEqual(changed_lines(diff, len(new)), [2])
+
+    def test_map_line_follows_unchanged_lines(self):
+        diff = diff_code(OLD, ["import sys"] + OLD)
+        self.assertEqual(map_line(diff, 4), 5)
+
+    def test_map_line_of_an_edited_line_is_none(self):
+        diff = diff_code(OLD, ["a = 1", "b = 3", "c = a + b", "print(c)"])
+        self.assertIsNone(map_line(diff, 2))
+        self.assertEqual(map_line(diff, 3), 3)
+
+    def test_line_ranges(self):
+        self.assertEqual(line_ranges([9, 3, 4, 5, 4]), "3-5, 9")
+        self.assertEqual(line_ranges([]), "")
+
+
+class MergeTests(SimpleTestCase):
+
+    def test_disjoint_edits_are_combined(self):
+        ours = ["a = 10", "b = 2", "c = a + b", "print(c)"]
+        fixed = ["a = 1", "b = 2", "c = a + b", "print(int(c))"]
+        merged = merge(OLD, (diff_code(OLD, ours), ours), (diff_code(OLD, fixed), fixed))
+        self.assertEqual(merged, ["a = 10", "b = 2", "c = a + b", "print(int(c))"])
+
+    def test_overlapping_edits_do_not_merge(self):
+        ours = ["a = 1", "b = 2", "c = a - b", "print(c)"]
+        fixed = ["a = 1", "b = 2", "c = a * b", "print(c)"]
+        self.assertIsNone(merge(OLD, (diff_code(OLD, ours), ours), (diff_code(OLD, fixed), fixed)))
@@ -0,0 +1,133 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from analyzer import tiering
+from analyzer.jobs import callback_allowed, claim, dedup_key, enqueue, get_config, requeue_expired, run_job
+from analyzer.models import CodeSubmission, DebugJob
+from analyzer.router import LLMResult
+
+ANSWER = json.dumps({
+    "reason": "Missing parenthesis", "problem_line": 1, "problem_snippet": "print((1)",
+    "explanation": "The call is not closed.", "fixed_code": "print(1)", "example": "", "confidence": "high",
+})
+
+
+def payload(code="print((1)", **fields):
+    return {"code": code, "error": "", "mode": "full", "execute": False, "bypass_cache": True, **fields}
+
+
+def complete(messages, response_format=None, tier=None, **options):
+    return LLMResult(ANSWER, "m", "b", usage={})
+
+
+class EnqueueTests(TestCase):
+
+    def test_identical_active_jobs_are_merged(self):
+        first, created = enqueue(payload())
+        second, created_again = enqueue(payload())
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.pk, second.pk)
+
+    def test_different_callbacks_are_separate_jobs(self):
+        self.assertNotEqual(dedup_key(None, payload(), "https://a.test/"), dedup_key(None, payload(), "https://b.test/"))
+        first, _ = enqueue(payload(), callback_url="https://a.test/")
+        second, created = enqueue(payload(), callback_url="https://b.test/")
+        self.assertTrue(created)
+        self.assertNotEqual(first.pk, second.pk)
+
+    def test_users_do_not_share_jobs(self):
+        alice, bob = User.objects.create_user("alice"), User.objects.create_user("bob")
+        self.assertNotEqual(enqueue(payload(), alice)[0].pk, enqueue(payload(), bob)[0].pk)
+
+    def test_interactive_request_moves_a_batch_job_forward(self):
+        job, _ = enqueue(payload(), priority=DebugJob.BATCH)
+        merged, _ = enqueue(payload(), priority=DebugJob.INTERACTIVE)
+        self.assertEqual(merged.pk, job.pk)
+        self.assertEqual(DebugJob.objects.get(pk=job.pk).priority, DebugJob.INTERACTIVE)
+
+    def test_finished_jobs_are_not_reused(self):
+        job, _ = enqueue(payload())
+        DebugJob.objects.filter(pk=job.pk).update(status=DebugJob.DONE)
+        self.assertNotEqual(enqueue(payload())[0].pk, job.pk)
+
+    @override_settings(JOBS={"CALLBACK_HOSTS": ["hooks.test"]})
+    def test_callback_hosts(self):
+        self.assertTrue(callback_allowed("https://hooks.test/done"))
+        self.assertFalse(callback_allowed("https://other.test/done"))
+        self.assertFalse(callback_allowed("ftp://hooks.test/done"))
+        self.assertFalse(callback_allowed("https://hooks.test/" + "x" * 500))
+
+
+class QueueTests(TestCase):
+
+    def test_claims_by_priority_then_age(self):
+        batch, _ = enqueue(payload("a = ("), priority=DebugJob.BATCH)
+        interactive, _ = enqueue(payload("b = ("))
+        self.assertEqual(claim("w1", 60).pk, interactive.pk)
+        self.assertEqual(claim("w1", 60).pk, batch.pk)
+        self.assertIsNone(claim("w1", 60))
+
+    def test_jobs_waiting_for_a_retry_are_not_claimed(self):
+        job, _ = enqueue(payload())
+        DebugJob.objects.filter(pk=job.pk).update(run_after=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(claim("w1", 60))
+
+    def test_expired_leases_are_requeued_then_failed(self):
+        job, _ = enqueue(payload())
+        claim("w1", 60)
+        past = timezone.now() - timedelta(seconds=1)
+        DebugJob.objects.filter(pk=job.pk).update(lease_expires_at=past)
+
+        self.assertEqual(requeue_expired(max_attempts=2), 1)
+        self.assertEqual(DebugJob.objects.get(pk=job.pk).status, DebugJob.QUEUED)
+
+        claim("w2", 60)
+        DebugJob.objects.filter(pk=job.pk).update(lease_expires_at=past)
+        requeue_expired(max_attempts=2)
+        self.assertEqual(DebugJob.objects.get(pk=job.pk).status, DebugJob.FAILED)
+
+
+class RunJobTests(TestCase):
+
+    def test_runs_and_saves_the_submission(self):
+        user = User.objects.create_user("alice")
+        enqueue(payload(), user)
+        job = claim("w1", 60)
+
+        with mock.patch.object(tiering, "complete", complete):
+            run_job(job, get_config())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DebugJob.DONE)
+        self.assertEqual(job.result["sections"]["fixed_code"], "print(1)")
+        self.assertEqual(CodeSubmission.objects.get(pk=job.submission_id).user, user)
+
+    def test_failures_are_retried_until_max_attempts(self):
+        enqueue(payload())
+        config = {**get_config(), "MAX_ATTEMPTS": 2, "RETRY_DELAY": 0}
+
+        with mock.patch.object(tiering, "complete", side_effect=RuntimeError("backend down")):
+            run_job(claim("w1", 60), config)
+            job = DebugJob.objects.get()
+            self.assertEqual(job.status, DebugJob.QUEUED)
+            self.assertIn("backend down", job.error)
+
+            run_job(claim("w1", 60), config)
+
+        self.assertEqual(DebugJob.objects.get().status, DebugJob.FAILED)
+
+    def test_a_worker_that_lost_its_lease_does_not_finish_the_job(self):
+        enqueue(payload())
+        job = claim("w1", 60)
+        DebugJob.objects.filter(pk=job.pk).update(status=DebugJob.QUEUED, worker="")
+
+        with mock.patch.object(tiering, "complete", complete):
+            run_job(job, get_config())
+
+        self.assertEqual(DebugJob.objects.get(pk=job.pk).status, DebugJob.QUEUED)
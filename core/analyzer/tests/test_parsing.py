@@ -0,0 +1,100 @@
+import json
+
+from django.test import SimpleTestCase
+
+from analyzer.parsing import RESPONSE_SCHEMAS, answer_text, parse_answer, render_answer
+
+FULL = {
+    "reason": "Division by zero",
+    "problem_line": 3,
+    "problem_snippet": "return total / len(values)",
+    "explanation": "len([]) is 0",
+    "fixed_code": "def average(values):\n    return sum(values) / len(values) if values else 0",
+    "example": "average([]) -> 0",
+}
+
+
+def answer(**fields):
+    return json.dumps({**FULL, "confidence": "high", **fields})
+
+
+class JsonAnswerTests(SimpleTestCase):
+
+    def test_valid_answer(self):
+        parsed = parse_answer(answer(), "full")
+        self.assertEqual(parsed["format"], "json")
+        self.assertEqual(parsed["confidence"], "high")
+        self.assertEqual(parsed["sections"], FULL)
+
+    def test_low_confidence(self):
+        self.assertEqual(parse_answer(answer(confidence="low"), "full")["confidence"], "low")
+
+    def test_line_numbers_below_one_are_dropped(self):
+        for line in (0, -4):
+            self.assertIsNone(parse_answer(answer(problem_line=line), "full")["sections"]["problem_line"])
+
+    def test_schema_requires_positive_lines(self):
+        self.assertEqual(RESPONSE_SCHEMAS["full"]["properties"]["problem_line"]["minimum"], 1)
+
+    def test_missing_fields_get_empty_values(self):
+        parsed = parse_answer(json.dumps({"reason": "r"}), "full")
+        self.assertEqual(parsed["format"], "json")
+        self.assertEqual(parsed["sections"]["fixed_code"], "")
+        self.assertIsNone(parsed["sections"]["problem_line"])
+
+
+class MalformedAnswerTests(SimpleTestCase):
+    # Anything that is not a valid answer object is read as header text.
+
+    def assert_text(self, text, mode="full"):
+        parsed = parse_answer(text, mode)
+        self.assertEqual(parsed["format"], "text")
+        return parsed
+
+    def test_truncated_json(self):
+        parsed = self.assert_text(answer()[:40])
+        self.assertEqual(parsed["sections"]["reason"], "")
+
+    def test_json_that_is_not_an_object(self):
+        self.assert_text("[1, 2, 3]")
+
+    def test_wrong_field_types(self):
+        self.assert_text(answer(problem_line="3"))
+        self.assert_text(answer(fixed_code=None))
+
+    def test_boolean_line_number(self):
+        self.assert_text(answer(problem_line=True))
+
+    def test_unknown_confidence(self):
+        self.assert_text(answer(confidence="medium"))
+
+    def test_empty_text(self):
+        parsed = self.assert_text("")
+        self.assertEqual(parsed["sections"]["reason"], "")
+
+    def test_hint_without_headers_is_the_whole_text(self):
+        parsed = self.assert_text("  Look at the loop bounds.  ", "hint")
+        self.assertEqual(parsed["sections"]["hints"], "Look at the loop bounds.")
+
+    def test_hedging_is_low_confidence(self):
+        self.assertEqual(self.assert_text("ERROR_REASON: It might be the loop")["confidence"], "low")
+
+
+class TextAnswerTests(SimpleTestCase):
+
+    def test_render_round_trip(self):
+        parsed = parse_answer(render_answer(FULL, "full"), "full")
+        self.assertEqual(parsed["sections"], FULL)
+
+    def test_line_number_is_split_from_the_snippet(self):
+        parsed = parse_answer("ERROR_REASON: x\nPROBLEM_LINE: Line 7: y = z", "full")
+        self.assertEqual(parsed["sections"]["problem_line"], 7)
+        self.assertEqual(parsed["sections"]["problem_snippet"], "y = z")
+
+    def test_line_zero_is_dropped(self):
+        parsed = parse_answer("PROBLEM_LINE: line 0: y = z", "full")
+        self.assertIsNone(parsed["sections"]["problem_line"])
+
+    def test_answer_text_renders_json(self):
+        self.assertEqual(answer_text(answer(), "full"), render_answer(FULL, "full"))
+        self.assertEqual(answer_text("HINTS:\nh", "hint"), "HINTS:\nh")
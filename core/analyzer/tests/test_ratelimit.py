@@ -0,0 +1,91 @@
+from django.test import SimpleTestCase, TestCase
+
+from analyzer.ratelimit import CacheBackend, DatabaseBackend, LocMemBackend, RateLimiter, window_estimate
+
+WINDOW = 60
+START = 6000.0  # the start of a window
+
+
+class WindowEstimateTests(SimpleTestCase):
+
+    def test_previous_window_fades_out_linearly(self):
+        self.assertEqual(window_estimate(10, 0, START, WINDOW), 10)
+        self.assertEqual(window_estimate(10, 0, START + 30, WINDOW), 5)
+        self.assertEqual(window_estimate(10, 2, START + 45, WINDOW), 4.5)
+
+
+class BackendTestsMixin:
+    # Runs against self.backend.
+
+    def hits(self, key, limit, count, now):
+        return [self.backend.hit(key, limit, WINDOW, now) for _ in range(count)]
+
+    def test_allows_exactly_the_limit(self):
+        self.assertEqual(self.hits("k", 3, 4, START), [False, False, False, True])
+
+    def test_rejected_hits_are_not_counted(self):
+        self.hits("k", 2, 5, START)
+        # Half the previous window's 2 hits still count: one more fits.
+        self.assertEqual(self.hits("k", 2, 2, START + WINDOW + WINDOW / 2), [False, True])
+
+    def test_last_instant_of_a_window(self):
+        self.hits("k", 2, 2, START)
+        self.assertTrue(self.backend.hit("k", 2, WINDOW, START + WINDOW - 0.001))
+        # At the next boundary the previous window still weighs in fully.
+        self.assertTrue(self.backend.hit("k", 2, WINDOW, START + WINDOW))
+
+    def test_window_two_back_is_forgotten(self):
+        self.hits("k", 2, 2, START)
+        self.assertEqual(self.hits("k", 2, 2, START + 2 * WINDOW), [False, False])
+
+    def test_keys_are_independent(self):
+        self.hits("a", 1, 1, START)
+        self.assertFalse(self.backend.hit("b", 1, WINDOW, START))
+
+    def test_undo_takes_a_hit_back(self):
+        self.hits("k", 2, 2, START)
+        self.backend.undo("k", WINDOW, START)
+        self.assertFalse(self.backend.hit("k", 2, WINDOW, START))
+
+
+class LocMemBackendTests(BackendTestsMixin, SimpleTestCase):
+
+    def setUp(self):
+        self.backend = LocMemBackend()
+
+    def test_idle_keys_are_evicted(self):
+        self.backend.hit("old", 5, WINDOW, START)
+        self.backend.hit("new", 5, WINDOW, START + 2 * WINDOW)
+        self.assertEqual(len(self.backend), 1)
+
+
+class DatabaseBackendTests(BackendTestsMixin, TestCase):
+
+    def setUp(self):
+        self.backend = DatabaseBackend()
+
+
+class CacheBackendTests(BackendTestsMixin, SimpleTestCase):
+
+    def setUp(self):
+        self.backend = CacheBackend()
+        self.backend._cache.clear()
+
+
+class RateLimiterTests(SimpleTestCase):
+
+    def test_user_limit_applies_across_addresses(self):
+        limiter = RateLimiter(LocMemBackend(), max_requests=10, window_seconds=WINDOW, user_max_requests=2)
+        results = [limiter.is_limited(ip, 7, START) for ip in ("1.1.1.1", "2.2.2.2", "3.3.3.3")]
+        self.assertEqual(results, [False, False, True])
+
+    def test_user_rejections_do_not_use_up_the_ip_allowance(self):
+        limiter = RateLimiter(LocMemBackend(), max_requests=4, window_seconds=WINDOW, user_max_requests=1)
+        self.assertEqual([limiter.is_limited("1.1.1.1", 7, START) for _ in range(4)], [False, True, True, True])
+        # Only user 7's accepted request counted against the address.
+        self.assertEqual([limiter.is_limited("1.1.1.1", 8, START) for _ in range(2)], [False, True])
+        self.assertEqual([limiter.is_limited("1.1.1.1", None, START) for _ in range(3)], [False, False, True])
+
+    def test_anonymous_requests_only_use_the_ip_limit(self):
+        limiter = RateLimiter(LocMemBackend(), max_requests=2, window_seconds=WINDOW)
+        self.assertEqual([limiter.is_limited("1.1.1.1", None, START) for _ in range(3)], [False, False, True])
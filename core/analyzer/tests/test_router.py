@@ -0,0 +1,183 @@
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+from django.test import SimpleTestCase
+
+from analyzer.router import Backend, CircuitBreaker, CircuitOpen, LLMUnavailable, Router
+
+REQUEST = httpx.Request("POST", "https://llm.test/v1/chat/completions")
+
+
+def connection_error():
+    return openai.APIConnectionError(request=REQUEST)
+
+
+def bad_request():
+    return openai.BadRequestError("context length exceeded", response=httpx.Response(400, request=REQUEST), body=None)
+
+
+def server_error():
+    return openai.InternalServerError("upstream failed", response=httpx.Response(503, request=REQUEST), body=None)
+
+
+def response(text):
+    message = SimpleNamespace(content=text)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], model="m", usage=None)
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.closed = False
+
+    def __iter__(self):
+        return iter(chunk(text) for text in self.texts)
+
+    def close(self):
+        self.closed = True
+
+
+def make_backend(name, outcomes, **options):
+    # A backend whose client answers (or raises) `outcomes` in order.
+    backend = Backend(name=name, model="m", max_retries=0, **options)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    backend._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    backend.calls = calls
+    return backend
+
+
+def make_router(*backends):
+    return Router(list(backends), backoff_base=0)
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class FallbackTests(SimpleTestCase):
+
+    def test_falls_back_to_the_next_backend(self):
+        first = make_backend("a", [connection_error()])
+        second = make_backend("b", [response("ok")])
+
+        result = make_router(first, second).complete(MESSAGES)
+
+        self.assertEqual(result.text, "ok")
+        self.assertEqual(result.backend, "b")
+        self.assertEqual(len(first.calls), 1)
+
+    def test_retries_a_retryable_error_on_the_same_backend(self):
+        backend = make_backend("a", [connection_error(), response("ok")])
+        backend.max_retries = 1
+
+        result = make_router(backend).complete(MESSAGES)
+
+        self.assertEqual(result.text, "ok")
+        self.assertEqual(result.attempts, 2)
+
+    def test_client_errors_are_not_retried(self):
+        backend = make_backend("a", [bad_request(), response("ok")])
+        backend.max_retries = 3
+
+        with self.assertRaises(LLMUnavailable):
+            make_router(backend).complete(MESSAGES)
+        self.assertEqual(len(backend.calls), 1)
+
+    def test_all_backends_failing_raises_llm_unavailable(self):
+        router = make_router(make_backend("a", [connection_error()]), make_backend("b", [server_error()]))
+
+        with self.assertRaises(LLMUnavailable) as raised:
+            router.complete(MESSAGES)
+        self.assertEqual([name for name, _ in raised.exception.errors], ["a", "b"])
+
+    def test_stream_falls_back_before_the_first_chunk(self):
+        first = make_backend("a", [connection_error()])
+        second = make_backend("b", [FakeStream(["he", "llo"])])
+
+        self.assertEqual("".join(make_router(first, second).stream(MESSAGES)), "hello")
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def test_opens_after_consecutive_backend_faults(self):
+        backend = make_backend("a", [server_error()], breaker=CircuitBreaker(failure_threshold=2, cooldown=60))
+        router = make_router(backend)
+
+        for _ in range(2):
+            with self.assertRaises(LLMUnavailable):
+                router.complete(MESSAGES)
+
+        self.assertEqual(backend.breaker.state, "open")
+        self.assertEqual(router.ranked(), [])
+        with self.assertRaises(CircuitOpen):
+            router._call_backend(backend, MESSAGES, {})
+        self.assertEqual(len(backend.calls), 2)
+
+    def test_client_errors_do_not_count_against_the_backend(self):
+        backend = make_backend("a", [bad_request()], breaker=CircuitBreaker(failure_threshold=1))
+
+        with self.assertRaises(LLMUnavailable):
+            make_router(backend).complete(MESSAGES)
+
+        self.assertEqual(backend.breaker.state, "closed")
+        self.assertEqual(backend.window.error_rate(), 0.0)
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, "closed")
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+        breaker.record_failure()
+        breaker.opened_at = time.monotonic() - 30
+
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.before_call())
+        self.assertFalse(breaker.before_call())
+        self.assertFalse(breaker.available())
+
+    def test_failed_trial_reopens_and_successful_trial_closes(self):
+        breaker = CircuitBreaker(failure_threshold=5, cooldown=30)
+        for _ in range(5):
+            breaker.record_failure()
+        breaker.opened_at = time.monotonic() - 30
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+        breaker.opened_at = time.monotonic() - 30
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_abandoned_stream_releases_the_trial(self):
+        stream = FakeStream(["a", "b", "c"])
+        backend = make_backend("a", [stream], breaker=CircuitBreaker(failure_threshold=1, cooldown=30))
+        backend.breaker.record_failure()
+        backend.breaker.opened_at = time.monotonic() - 30
+
+        chunks = make_router(backend).stream(MESSAGES)
+        self.assertEqual(next(chunks), "a")
+        chunks.close()
+
+        self.assertTrue(stream.closed)
+        self.assertFalse(backend.breaker.trial_running)
+        self.assertTrue(backend.breaker.available())
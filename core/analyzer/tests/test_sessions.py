@@ -0,0 +1,106 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from analyzer import sessions
+from analyzer.models import DebugSession
+from analyzer.sessions import (
+    SUMMARY_HEADER, SessionError, answer_gist, compact, follow_up, get_session, start_session,
+)
+
+ITEM = {"mode": "hint", "tier": "small", "error_type": "IndexError"}
+MESSAGES = [
+    {"role": "system", "content": "system prompt"},
+    {"role": "user", "content": "code and error"},
+]
+
+
+def hint(text):
+    return json.dumps({"hints": text, "confidence": "high"})
+
+
+class SummaryTests(SimpleTestCase):
+
+    def test_gist_of_json_and_text_answers(self):
+        self.assertEqual(answer_gist(hint("Check the   loop."), "hint"), "Check the loop.")
+        self.assertEqual(answer_gist("ERROR_REASON: Off by one\n\nFIXED_CODE:\nx", "full"), "Off by one")
+        self.assertTrue(answer_gist(hint("x" * 1000), "hint").endswith("..."))
+
+    def test_compact_keeps_the_first_message_and_the_last_turns(self):
+        messages = [{"role": "user", "content": "code"}]
+        for index in range(4):
+            messages += [{"role": "system", "content": f"step {index}"}, {"role": "assistant", "content": hint(f"h{index}")}]
+
+        compacted, summary = compact(messages, "", "hint", keep_turns=1)
+
+        self.assertEqual(summary, "- h0\n- h1\n- h2")
+        self.assertEqual(compacted[0], messages[0])
+        self.assertTrue(compacted[1]["content"].startswith(SUMMARY_HEADER))
+        self.assertEqual(compacted[2:], messages[-2:])
+
+    def test_compacting_again_extends_the_summary(self):
+        messages = [{"role": "user", "content": "code"}, {"role": "system", "content": f"{SUMMARY_HEADER}\n- h0"}]
+        messages += [{"role": "system", "content": "step"}, {"role": "assistant", "content": hint("h1")}]
+
+        compacted, summary = compact(messages, "- h0", "hint", keep_turns=0)
+
+        self.assertEqual(summary, "- h0\n- h1")
+        self.assertEqual(len(compacted), 2)
+
+
+class SessionTests(TestCase):
+
+    def setUp(self):
+        sessions.get_store()._sessions.clear()
+        self.user = User.objects.create_user("alice")
+        self.session = start_session(ITEM, MESSAGES, hint("first"), self.user)
+
+    def test_system_prompt_is_not_stored(self):
+        self.assertEqual([message["role"] for message in self.session.messages], ["user", "assistant"])
+
+    def test_sessions_are_private(self):
+        other = User.objects.create_user("bob")
+        with self.assertRaises(SessionError) as raised:
+            get_session(self.session.id, other.pk)
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(get_session(self.session.id, self.user.pk).id, self.session.id)
+
+    def test_follow_up_appends_a_turn(self):
+        with mock.patch.object(sessions, "complete_tiered", return_value=hint("second")) as complete:
+            answer, item = follow_up(self.session, "next_hint")
+
+        sent = complete.call_args[0][1]
+        self.assertEqual(sent[0]["role"], "system")
+        self.assertEqual(sent[1:3], self.session.messages[:2])
+        self.assertEqual(answer, hint("second"))
+        self.assertEqual(item["mode"], "hint")
+        self.assertEqual(self.session.turns, 1)
+        self.assertEqual(len(self.session.messages), 4)
+
+    def test_show_fix_switches_to_a_full_answer(self):
+        with mock.patch.object(sessions, "complete_tiered", return_value="{}"):
+            _, item = follow_up(self.session, "show_fix")
+        self.assertEqual(item["mode"], "full")
+
+    def test_unknown_actions_are_rejected(self):
+        for action in ("explain", None, ["next_hint"]):
+            with self.assertRaises(SessionError) as raised:
+                follow_up(self.session, action)
+            self.assertEqual(raised.exception.status, 400)
+
+    def test_turn_limit(self):
+        self.session.turns = sessions.get_config()["MAX_TURNS"]
+        with self.assertRaises(SessionError) as raised:
+            follow_up(self.session, "next_hint")
+        self.assertEqual(raised.exception.status, 409)
+
+    def test_concurrent_update_is_rejected(self):
+        # Another process's copy of the same session.
+        stale = sessions.Session.from_row(DebugSession.objects.get(pk=self.session.id))
+        with mock.patch.object(sessions, "complete_tiered", return_value=hint("second")):
+            follow_up(self.session, "next_hint")
+            with self.assertRaises(SessionError) as raised:
+                follow_up(stale, "next_hint")
+        self.assertEqual(raised.exception.status, 409)
@@ -0,0 +1,82 @@
+from django.test import SimpleTestCase
+
+from analyzer.similarity import SimilarityIndex, canonicalize, fingerprint, pair_up, replace_in_code, similarity
+
+CODE = "scores = [88, 92, 79]\nfor i in range(len(scores) + 1):\n    print(scores[i])\n"
+RENAMED = "# hw 3\nmarks = [5, 60, 71]\n\nfor k in range(len(marks) + 1):   # loop\n    print(marks[k])\n"
+
+
+class CanonicalTests(SimpleTestCase):
+
+    def test_renaming_and_formatting_keep_the_hash(self):
+        self.assertEqual(canonicalize(CODE).hash, canonicalize(RENAMED).hash)
+
+    def test_structure_changes_the_hash(self):
+        self.assertNotEqual(canonicalize(CODE).hash, canonicalize(CODE.replace("+ 1", "- 1")).hash)
+
+    def test_names_and_lines_line_up(self):
+        old, new = canonicalize(CODE), canonicalize(RENAMED)
+        self.assertEqual(pair_up(old.names, new.names), {"scores": "marks", "i": "k"})
+        self.assertEqual(list(zip(old.lines, new.lines))[-1], (3, 5))
+
+    def test_code_that_does_not_parse_still_gets_a_hash(self):
+        self.assertEqual(canonicalize("x = (1,\ny").hash, canonicalize("z = (1,\nw").hash)
+
+
+class PairUpTests(SimpleTestCase):
+
+    def test_unchanged_values_are_left_out(self):
+        self.assertEqual(pair_up(["a", "b"], ["a", "c"]), {"b": "c"})
+
+    def test_ambiguous_values_are_left_out(self):
+        self.assertEqual(pair_up(["a", "a", "b"], ["x", "y", "z"]), {"b": "z"})
+
+    def test_replace_in_code_only_touches_tokens(self):
+        code = "print(scores)  # scores\ntext = 'scores'\n"
+        self.assertEqual(replace_in_code(code, {"scores": "marks"}, {}), "print(marks)  # scores\ntext = 'scores'\n")
+
+
+class IndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = SimilarityIndex(max_entries=3)
+
+    def add(self, submission_id, code, user_id=None, mode="hint"):
+        fp = fingerprint(code)
+        self.index.add(submission_id, fp.canonical.hash, fp.signature, "IndexError", mode, None, user_id)
+
+    def test_exact_match_is_keyed_by_error_type_and_mode(self):
+        self.add(1, CODE, mode="full")
+        key = canonicalize(RENAMED).hash
+        self.assertEqual(self.index.exact(key, "IndexError", "full"), 1)
+        self.assertIsNone(self.index.exact(key, "IndexError", "hint"))
+        self.assertIsNone(self.index.exact(key, "KeyError", "full"))
+
+    def test_near_match_above_the_threshold(self):
+        self.add(1, CODE)
+        edited = CODE + "print(1)\n"
+        near = self.index.near(fingerprint(edited).signature, "IndexError", "hint", 0.8)
+        self.assertEqual(near[0], 1)
+        self.assertGreaterEqual(near[1], 0.8)
+
+    def test_near_match_is_limited_to_the_user(self):
+        self.add(1, CODE, user_id=7)
+        signature = fingerprint(CODE + "print(1)\n").signature
+        self.assertIsNone(self.index.near(signature, "IndexError", "hint", 0.8, user_id=8))
+        self.assertEqual(self.index.near(signature, "IndexError", "hint", 0.8, user_id=7)[0], 1)
+
+    def test_unrelated_code_does_not_match(self):
+        self.add(1, CODE)
+        other = fingerprint("import json\n\ndata = json.loads('{}')\nprint(data['key'])\n")
+        self.assertIsNone(self.index.near(other.signature, "IndexError", "hint", 0.8))
+        self.assertLess(similarity(other.signature, fingerprint(CODE).signature), 0.5)
+
+    def test_oldest_entries_are_evicted(self):
+        for submission_id in range(1, 5):
+            self.add(submission_id, CODE.replace("88", str(submission_id * 1000)))
+        self.assertEqual(len(self.index), 3)
+
+    def test_removed_entries_are_not_returned(self):
+        self.add(1, CODE, mode="full")
+        self.index.remove(1)
+        self.assertIsNone(self.index.exact(canonicalize(CODE).hash, "IndexError", "full"))
@@ -0,0 +1,86 @@
+from django.test import SimpleTestCase, override_settings
+
+from analyzer.error_utils import parse_error, user_lines
+from analyzer.slicing import prompt_excerpt, slice_code, worth_slicing
+
+
+def long_module(functions=200):
+    parts = ["import math\n\nLIMIT = 10\n"]
+    for index in range(functions):
+        parts.append(f"def f{index}(x):\n    y = x + {index}\n    return y * LIMIT\n")
+    parts.append("def failing(values):\n    total = sum(values)\n    return total / len(values)\n")
+    parts.append("print(failing([]))\n")
+    return "\n\n".join(parts)
+
+
+CODE = long_module()
+FAILING_LINE = CODE.splitlines().index("    return total / len(values)") + 1
+LAST_LINE = len(CODE.splitlines())
+
+
+def traceback(file):
+    return (
+        "Traceback (most recent call last):\n"
+        f'  File "{file}", line {LAST_LINE}, in <module>\n'
+        f'  File "{file}", line {FAILING_LINE}, in failing\n'
+        "ZeroDivisionError: division by zero"
+    )
+
+
+class SliceTests(SimpleTestCase):
+
+    def test_code_within_the_budget_is_sent_whole(self):
+        self.assertIsNone(slice_code("print(1)\n", [1], 100))
+
+    def test_keeps_the_failing_unit_and_its_references(self):
+        excerpt = slice_code(CODE, [LAST_LINE, FAILING_LINE], 200)
+        self.assertIn(f"{FAILING_LINE} |     return total / len(values)", excerpt.code)
+        self.assertIn("print(failing([]))", excerpt.code)
+        self.assertNotIn("def f100(x):", excerpt.code)
+        self.assertIn("omitted)", excerpt.code)
+        self.assertEqual(excerpt.total, LAST_LINE)
+
+    def test_stays_within_the_budget(self):
+        excerpt = slice_code(CODE, [FAILING_LINE], 100)
+        self.assertLessEqual(len(excerpt.code), 100 * 4 + 200)
+
+    def test_code_that_does_not_parse_gets_a_window(self):
+        broken = CODE.replace("def failing(values):", "def failing(values:")
+        excerpt = slice_code(broken, [FAILING_LINE], 100)
+        self.assertIn("def failing(values:", excerpt.code)
+
+    @override_settings(SLICING={"ENABLED": True, "MIN_LINES": 80, "TOKEN_BUDGET": 200})
+    def test_short_code_is_not_sliced(self):
+        self.assertFalse(worth_slicing("\n".join(["print(1)"] * 79)))
+        self.assertTrue(worth_slicing("\n".join(["print(1)"] * 80)))
+
+    @override_settings(SLICING={"ENABLED": False, "MIN_LINES": 80, "TOKEN_BUDGET": 200})
+    def test_disabled(self):
+        self.assertIsNone(prompt_excerpt(CODE, traceback("<user_code>")))
+
+
+class FocusLineTests(SimpleTestCase):
+
+    def test_user_code_frames(self):
+        self.assertEqual(user_lines(traceback("<user_code>")), [LAST_LINE, FAILING_LINE])
+
+    def test_pasted_traceback_uses_the_users_own_file(self):
+        pasted = traceback("/home/student/app.py").replace(
+            "ZeroDivisionError",
+            '  File "/usr/lib/python3.11/statistics.py", line 300, in mean\n'
+            '  File "/home/student/.venv/lib/python3.11/site-packages/lib/x.py", line 9, in y\n'
+            "ZeroDivisionError",
+        )
+        self.assertEqual(user_lines(pasted), [LAST_LINE, FAILING_LINE])
+        self.assertEqual(parse_error(pasted).line, FAILING_LINE)
+
+    def test_only_library_frames(self):
+        self.assertEqual(user_lines('  File "/usr/lib/python3.11/json/decoder.py", line 3, in x\nValueError: v'), [])
+
+    def test_plain_line_mention(self):
+        self.assertEqual(user_lines("SyntaxError: invalid syntax on line 4"), [4])
+
+    @override_settings(SLICING={"ENABLED": True, "MIN_LINES": 80, "TOKEN_BUDGET": 200})
+    def test_pasted_traceback_focuses_the_excerpt(self):
+        excerpt = prompt_excerpt(CODE, traceback("app.py"))
+        self.assertIn("return total / len(values)", excerpt.code)
@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase
+
+from analyzer.parsing import parse_answer
+from analyzer.static_checks import analyze_code, answer_locally
+
+
+def findings(code):
+    return {finding.rule: finding.confidence for finding in analyze_code(code)}
+
+
+class ConfidenceTests(SimpleTestCase):
+
+    def test_mutated_mutable_default_is_high(self):
+        for body in ("items.append(x)", "items[x] = 1", "items += [x]", "del items[0]"):
+            code = f"def add(x, items=[]):\n    {body}\n    return items\n\nprint(add(1))\n"
+            self.assertEqual(findings(code)["mutable-default-argument"], "high", body)
+
+    def test_unmutated_mutable_default_is_low(self):
+        code = "def keep(x, items=[]):\n    return items + [x]\n\nprint(keep(1))\n"
+        self.assertEqual(findings(code), {"mutable-default-argument": "low"})
+
+    def test_uncalled_function_is_low(self):
+        self.assertEqual(findings("def f():\n    return 1\n"), {"uncalled-function": "low"})
+
+    def test_constant_condition_is_low(self):
+        code = "DEBUG = False\nif DEBUG == True:\n    print('debug')\n"
+        self.assertEqual(findings(code).get("constant-condition"), "low")
+
+    def test_clean_code_has_no_findings(self):
+        self.assertEqual(analyze_code("def total(values):\n    return sum(values)\n\nprint(total([1]))\n"), [])
+
+    def test_code_that_does_not_parse_has_no_findings(self):
+        self.assertEqual(analyze_code("def broken(:\n    pass\n"), [])
+
+
+class AnswerLocallyTests(SimpleTestCase):
+
+    def test_only_high_confidence_findings_are_answered(self):
+        self.assertIsNone(answer_locally("def f():\n    return 1\n", "full"))
+        self.assertIsNone(answer_locally("def keep(x, items=[]):\n    return items + [x]\n\nprint(keep(1))\n", "full"))
+
+    def test_high_confidence_answer_carries_a_fix(self):
+        code = "def add(x, items=[]):\n    items.append(x)\n    return items\n\nprint(add(1))\n"
+        sections = parse_answer(answer_locally(code, "full"), "full")["sections"]
+        self.assertEqual(sections["problem_line"], 1)
+        self.assertIn("items=None", sections["fixed_code"])
+        compile(sections["fixed_code"], "<fixed>", "exec")
+
+    def test_hint_mode_does_not_give_the_fix(self):
+        code = "x = 1\nx == 2\nprint(x)\n"
+        sections = parse_answer(answer_locally(code, "hint"), "hint")["sections"]
+        self.assertTrue(sections["hints"])
+        self.assertNotIn("x = 2", sections["hints"])
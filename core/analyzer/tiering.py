@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import deque
+
+from .conf import get_setting
+from .llm import acomplete, complete, get_tiers, stream_llm
+from .metrics import LLM_TOKENS
+from .parsing import parse_answer
+
+# Picks the model tier for a submission. Static answers never reach a model;
+# short snippets with a recognised error (or a compile error) and hint
+# requests go to the first, cheapest tier; everything else goes to the
+# strongest. A low-confidence answer from a cheaper tier is retried once on
+# the next tier up.
+
+STATIC_TIER = "static"
+
+DEFAULT_POLICY = {
+    "FAST_ERROR_TYPES": [
+        "IndexError", "KeyError", "TypeError", "ValueError",
+        "NameError", "AttributeError", "ZeroDivisionError",
+    ],
+    "FAST_MAX_LINES": 60,
+    "ESCALATE_ON_LOW_CONFIDENCE": True,
+}
+
+
+def get_policy() -> dict:
+    return {**DEFAULT_POLICY, **get_setting("TIERING", {})}
+
+
+def tier_names() -> list:
+    # Cheapest first, in settings order.
+    return list(get_tiers())
+
+
+def choose_tier(item: dict) -> str:
+    if item["local_answer"]:
+        return STATIC_TIER
+
+    policy = get_policy()
+    fast, strong = tier_names()[0], tier_names()[-1]
+
+    if item["mode"] == "hint":
+        return fast
+
+    # Long code sent as an excerpt is judged by what the model sees.
+    lines = item["excerpt"].lines if item.get("excerpt") else len(item["code"].splitlines())
+    if lines > policy["FAST_MAX_LINES"]:
+        return strong
+
+    if item["error_source"] == "compile" or item["error_type"] in policy["FAST_ERROR_TYPES"]:
+        return fast
+
+    return strong
+
+
+def next_tier(tier: str):
+    names = tier_names()
+    index = names.index(tier)
+    return names[index + 1] if index + 1 < len(names) else None
+
+
+def should_escalate(text: str, item: dict, tier: str) -> bool:
+    return (
+        get_policy()["ESCALATE_ON_LOW_CONFIDENCE"]
+        and next_tier(tier) is not None
+        and parse_answer(text, item["mode"])["confidence"] == "low"
+    )
+
+
+# ================= METRICS =================
+
+class TierStats:
+    # Per-tier call counts, escalations, latency and token cost since start-up.
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._tiers = {}
+        self._lock = threading.Lock()
+
+    def _tier(self, tier: str) -> dict:
+        if tier not in self._tiers:
+            self._tiers[tier] = {
+                "calls": 0,
+                "errors": 0,
+                "escalated": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cost": 0.0,
+                "latencies": deque(maxlen=self.window),
+            }
+        return self._tiers[tier]
+
+    def record(self, tier: str, latency: float, usage: dict = None, escalated: bool = False) -> None:
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+
+        # Prices are USD per million tokens.
+        config = get_tiers().get(tier, {})
+        cost = (prompt_tokens * config.get("INPUT_COST", 0)
+                + completion_tokens * config.get("OUTPUT_COST", 0)) / 1_000_000
+
+        if usage:
+            LLM_TOKENS.observe(prompt_tokens, tier, "prompt")
+            LLM_TOKENS.observe(completion_tokens, tier, "completion")
+
+        with self._lock:
+            stats = self._tier(tier)
+            stats["calls"] += 1
+            stats["escalated"] += escalated
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost"] += cost
+            stats["latencies"].append(latency)
+
+    def record_error(self, tier: str) -> None:
+        with self._lock:
+            self._tier(tier)["errors"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            tiers = {name: dict(stats, latencies=sorted(stats["latencies"]))
+                     for name, stats in self._tiers.items()}
+
+        result = {}
+        for name, stats in tiers.items():
+            latencies = stats.pop("latencies")
+            stats["p50"] = latencies[len(latencies) // 2] if latencies else None
+            stats["p95"] = latencies[int(0.95 * (len(latencies) - 1))] if latencies else None
+            stats["cost"] = round(stats["cost"], 6)
+            result[name] = stats
+        return result
+
+
+tier_stats = TierStats()
+
+
+# ================= CALLS =================
+
+def complete_tiered(item: dict, messages: list, response_format: dict = None) -> str:
+    # Sets item["tier"] to the tier that produced the returned answer.
+    tier = item["tier"]
+    escalated = False
+
+    while True:
+        try:
+            result = complete(messages, response_format, tier)
+        except Exception:
+            tier_stats.record_error(tier)
+            raise
+        tier_stats.record(tier, result.latency, result.usage, escalated)
+
+        if escalated or not should_escalate(result.text, item, tier):
+            item["tier"] = tier
+            return result.text
+
+        tier = next_tier(tier)
+        escalated = True
+
+
+async def acomplete_tiered(item: dict, messages: list, response_format: dict = None) -> str:
+    tier = item["tier"]
+    escalated = False
+
+    while True:
+        try:
+            result = await acomplete(messages, response_format, tier)
+        except Exception:
+            tier_stats.record_error(tier)
+            raise
+        tier_stats.record(tier, result.latency, result.usage, escalated)
+
+        if escalated or not should_escalate(result.text, item, tier):
+            item["tier"] = tier
+            return result.text
+
+        tier = next_tier(tier)
+        escalated = True
+
+
+def stream_tiered(item: dict, messages: list):
+    # Streamed text reaches the client as it arrives, so it is not escalated.
+    started = time.perf_counter()
+    try:
+        yield from stream_llm(messages, item["tier"])
+    except Exception:
+        tier_stats.record_error(item["tier"])
+        raise
+    tier_stats.record(item["tier"], time.perf_counter() - started)
@@ -6,6 +6,15 @@ urlpatterns = [
     path("", home, name="home"),
     path('register/', views.register, name='register'),
     path("debug/", debug_code, name="debug_code"),
+    path("debug/async/", views.debug_code_async, name="debug_code_async"),
+    path("debug/batch/", views.debug_code_batch, name="debug_code_batch"),
+    path("debug/stream/", views.debug_code_stream, name="debug_code_stream"),
+    path("debug/jobs/<uuid:job_id>/", views.debug_job, name="debug_job"),
+    path("debug/sessions/<uuid:session_id>/", views.debug_session, name="debug_session"),
+    path("debug/stats/", views.debug_stats, name="debug_stats"),
+    path("metrics/", views.metrics, name="metrics"),
     path("history/", views.history_view, name="history"),
+    path("history/<int:pk>/", views.history_detail, name="history_detail"),
+    path("api/history/", views.history_api, name="history_api"),
 
 ]
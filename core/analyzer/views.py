@@ -1,17 +1,41 @@
 import json
-import time
-import traceback
-from .models import CodeSubmission
-from django.http import JsonResponse
-from django.shortcuts import render, redirect
+from datetime import datetime
+from .models import CodeSubmission, DebugJob
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from .error_utils import classify_error
-from .prompts import build_prompt
-from .llm import call_llm
-from .models import CodeSubmission
+from .llm import get_router
+from .tiering import stream_tiered, tier_names, tier_stats
+from .cache import get_response_cache
+from .conf import get_setting
+from .incremental import plan_incremental
+from .jobs import PRIORITIES, callback_allowed, enqueue, job_status
+from .metrics import get_config as get_metrics_config, render_metrics, timer
+from .parsing import answer_text
+from .sections import SectionStreamParser
+from .similarity import index_submissions, similar_answer
+from .screening import REQUEST_STAGES, Screening
+from .sessions import SessionError, follow_up, get_config as get_sessions_config, get_session, session_status, \
+    start_session
+from .sandbox import sandbox_enabled
+from .pipeline import (
+    aresolve_item,
+    build_response_data,
+    item_error,
+    item_messages,
+    prepare_item,
+    resolve_item,
+    resolve_many,
+)
 
 
 # ================= REGISTER =================
@@ -29,184 +53,569 @@ def register(request):
     return render(request, "register.html", {"form": form})
 
 
-# ================= PYTHON ERROR DETECTION =================
+# ================= RESPONSE CACHE =================
 
-def detect_python_error(code: str):
-    try:
-        compile(code, "<user_code>", "exec")
-        return None
-    except Exception:
-        return traceback.format_exc()
+def wants_fresh_response(request, data: dict) -> bool:
+    if data.get("no_cache"):
+        return True
 
+    cache_control = request.headers.get("Cache-Control", "")
+    return "no-cache" in cache_control.lower()
 
-# ================= RATE LIMITING =================
 
-RATE_LIMIT = {}
-MAX_REQUESTS = 5
-WINDOW_SECONDS = 60
+# ================= EXECUTION =================
 
-def is_rate_limited(ip: str) -> bool:
-    now = time.time()
+def wants_execution(data: dict) -> bool:
+    # Runs the snippet in the sandbox when the server enables it,
+    # unless the client sends "execute": false.
+    return sandbox_enabled() and data.get("execute", True) is not False
 
-    if ip not in RATE_LIMIT:
-        RATE_LIMIT[ip] = []
 
-    RATE_LIMIT[ip] = [
-        timestamp for timestamp in RATE_LIMIT[ip]
-        if now - timestamp < WINDOW_SECONDS
-    ]
+# ================= HOME =================
+
+@login_required
+def home(request):
+    return render(request, "analyzer/home.html")
 
-    if len(RATE_LIMIT[ip]) >= MAX_REQUESTS:
-        return True
 
-    RATE_LIMIT[ip].append(now)
-    return False
+# ================= DEBUG API =================
 
+def rejection_response(rejection, screening: Screening) -> JsonResponse:
+    message, status = rejection
+    return JsonResponse({"error": message, "reason": screening.reason}, status=status)
 
-# ================= CONFIDENCE CHECK =================
 
-LOW_CONFIDENCE_PHRASES = [
-    "not sure",
-    "might be",
-    "possibly",
-    "cannot determine",
-    "unclear",
-    "guess"
-]
+def parse_body(request, screening: Screening):
+    # Returns (data, None) or (None, rejection).
+    with screening.timed("parse"):
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            data = None
 
-def is_low_confidence(response: str) -> bool:
-    response = response.strip()
+    if not isinstance(data, dict):
+        return None, screening.reject("parse", "Request body must be a JSON object", 400)
+    return data, None
 
-    if response.startswith(
-        "ERROR_REASON: Unable to determine confidently"
-    ):
-        return True
 
-    response_lower = response.lower()
-    return any(phrase in response_lower for phrase in LOW_CONFIDENCE_PHRASES)
+def screen_submission(request):
+    # Shared screening for the debug endpoints: request checks before the
+    # body is parsed, then the code and error (see analyzer/screening.py).
+    # Returns (data, None) or (None, error_response).
+    screening = Screening()
 
+    rejection = screening.screen_request(request)
+    if rejection:
+        return None, rejection_response(rejection, screening)
 
-# ================= HOME =================
+    data, rejection = parse_body(request, screening)
+    if rejection:
+        return None, rejection_response(rejection, screening)
 
-@login_required
-def home(request):
-    return render(request, "analyzer/home.html")
+    # INPUT VALIDATION
+    rejection = screening.screen_input(data.get("code", ""), data.get("error", ""))
+    if rejection:
+        return None, rejection_response(rejection, screening)
 
+    return data, None
+
+
+def build_submission(request, data: dict) -> dict:
+    submission = prepare_item(
+        data.get("code", ""),
+        data.get("error", ""),
+        data.get("mode", "full"),
+        execute=wants_execution(data)
+    )
+    submission["bypass_cache"] = wants_fresh_response(request, data)
+    submission["user"] = request.user if request.user.is_authenticated else None
+
+    # RESUBMISSION (diff against the user's previous attempt)
+    if submission["user"] is not None:
+        plan_incremental(submission, submission["user"].pk)
+    return submission
+
+
+def prepare_submission(request):
+    # Returns (submission, None) or (None, error_response).
+    data, error_response = screen_submission(request)
+    if error_response:
+        return None, error_response
+    return build_submission(request, data), None
+
+
+def history_entry(submission: dict, response_data: dict) -> CodeSubmission:
+    return CodeSubmission(
+        user=submission["user"],
+        code=submission["code"],
+        language="python",
+        error_message=submission["error"],
+        ai_response=response_data
+    )
+
+
+def save_history(submission: dict, response_data: dict) -> None:
+    if submission["user"] is None:
+        return
+
+    with timer("db_write"):
+        history_entry(submission, response_data).save()
+
+
+def start_debug(request):
+    # Returns (data, submission, None), or (data, None, response) when the
+    # request was rejected or queued as a background job.
+    data, error_response = screen_submission(request)
+    if error_response:
+        return data, None, error_response
+
+    # BACKGROUND JOB ("async": true answers 202 with a job id)
+    if data.get("async"):
+        return data, None, enqueue_submission(request, data)
+
+    return data, build_submission(request, data), None
+
+
+def finish_debug(data: dict, submission: dict, result: str, cache_hit: bool) -> JsonResponse:
+    response_data = build_response_data(result, submission, cache_hit)
+
+    # SESSION ("session": true keeps the conversation for follow-ups)
+    if data.get("session") and get_sessions_config()["ENABLED"]:
+        session = start_session(submission, item_messages(submission), result, submission["user"])
+        response_data["session_id"] = session.id
+        response_data["session_url"] = reverse("debug_session", args=[session.id])
+
+    # ================= SAVE HISTORY =================
+    save_history(submission, response_data)
+
+    return JsonResponse(response_data)
 
-# ================= DEBUG API =================
 
 @csrf_exempt
 def debug_code(request):
-    if request.method != "POST":
-        return JsonResponse(
-            {"error": "Invalid request method"},
-            status=405
-        )
+    data, submission, response = start_debug(request)
+    if response:
+        return response
 
-    data = json.loads(request.body)
+    # BUILD PROMPT AND CALL LLM (CACHED)
+    result, cache_hit = resolve_item(submission)
 
-    code = data.get("code", "")
-    error = data.get("error", "")
-    mode = data.get("mode", "full")
+    return finish_debug(data, submission, result, cache_hit)
 
-    # INPUT VALIDATION
-    if not code.strip():
+
+# ================= BACKGROUND JOBS =================
+# Run by `python manage.py run_debug_workers`; see analyzer/jobs.py.
+
+def enqueue_submission(request, data: dict) -> JsonResponse:
+    callback_url = data.get("callback_url") or ""
+    if callback_url and not callback_allowed(callback_url):
+        return JsonResponse(
+            {"error": "Callback URL not allowed"},
+            status=400
+        )
+
+    priority = PRIORITIES.get(data.get("priority", "interactive"))
+    if priority is None:
         return JsonResponse(
-            {"error": "Code input is empty"},
+            {"error": f"Priority must be one of: {', '.join(PRIORITIES)}"},
             status=400
         )
 
-    detected_error = detect_python_error(code)
+    payload = {
+        "code": data.get("code", ""),
+        "error": data.get("error", ""),
+        "mode": data.get("mode", "full"),
+        "execute": wants_execution(data),
+        "bypass_cache": wants_fresh_response(request, data),
+    }
+    user = request.user if request.user.is_authenticated else None
+
+    job, created = enqueue(payload, user, priority, callback_url)
+    return JsonResponse({**job_status(job), "deduplicated": not created}, status=202)
+
+
+def debug_job(request, job_id):
+    job = get_object_or_404(DebugJob, pk=job_id)
+
+    # Jobs of logged-in users are visible to their owner only.
+    if job.user_id is not None and job.user_id != request.user.pk:
+        raise Http404
+
+    return JsonResponse(job_status(job))
+
+
+# ================= DEBUG SESSIONS =================
+# Follow-ups on an answer from POST /debug/ with "session": true; see
+# analyzer/sessions.py.
+
+@csrf_exempt
+def debug_session(request, session_id):
+    user_id = request.user.pk if request.user.is_authenticated else None
+    try:
+        session = get_session(session_id, user_id)
+    except SessionError as exc:
+        return JsonResponse({"error": str(exc)}, status=exc.status)
+
+    if request.method == "GET":
+        return JsonResponse(session_status(session))
+
+    screening = Screening()
+    rejection = screening.screen_request(request)
+    if rejection:
+        return rejection_response(rejection, screening)
+
+    data, rejection = parse_body(request, screening)
+    if rejection:
+        return rejection_response(rejection, screening)
+
+    try:
+        answer, item = follow_up(session, data.get("action", "next_hint"))
+    except SessionError as exc:
+        return JsonResponse({"error": str(exc)}, status=exc.status)
+
+    response_data = build_response_data(answer, item, False)
+    response_data["session"] = session_status(session)
+    return JsonResponse(response_data)
+
+
+# ================= ASYNC DEBUG API =================
+
+@csrf_exempt
+async def debug_code_async(request):
+    # Same contract as debug_code ("async" jobs and "session" included), but
+    # the LLM round trip does not hold a worker thread. Serve it through
+    # core.asgi.
+    data, submission, response = await sync_to_async(start_debug, thread_sensitive=False)(request)
+    if response:
+        return response
+
+    result, cache_hit = await aresolve_item(submission)
+
+    return await sync_to_async(finish_debug)(data, submission, result, cache_hit)
+
+
+# ================= STREAMING DEBUG API =================
 
-    error = error.strip()
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    if detected_error:
-        error = detected_error
-    elif not error:
-        error = "No explicit error message provided. Analyze the code and infer possible issues."
 
-    # LINE LIMIT
-    MAX_LINES = 300
-    if len(code.splitlines()) > MAX_LINES:
+def stream_debug_events(submission: dict):
+    cache = get_response_cache()
+    parser = SectionStreamParser()
+
+    cached = None
+    if not submission["local_answer"] and not submission["bypass_cache"]:
+        cached = cache.lookup(submission["cache_key"])
+
+    reused = None
+    if not submission["local_answer"] and cached is None:
+        with timer("similarity"):
+            reused = similar_answer(submission)
+
+    if submission["local_answer"]:
+        chunks = [submission["local_answer"]]
+    elif cached is not None or reused is not None:
+        # Cached and reused answers may be structured JSON; stream them as headers.
+        chunks = [answer_text(cached or reused, submission["mode"])]
+    else:
+        messages = item_messages(submission, structured=False)
+        chunks = stream_tiered(submission, messages)
+
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield sse_event("token", {"text": chunk})
+
+        for name, content in parser.feed(chunk):
+            yield sse_event("section", {"name": name, "content": content})
+
+    for name, content in parser.close():
+        yield sse_event("section", {"name": name, "content": content})
+
+    # The confidence check and history save run on the full answer.
+    if cached is not None:
+        result = cached
+    elif reused is not None:
+        result = reused
+        cache.store(submission["cache_key"], result)
+    else:
+        result = "".join(parts)
+        if not submission["local_answer"]:
+            cache.store(submission["cache_key"], result)
+
+    response_data = build_response_data(result, submission, cached is not None)
+    save_history(submission, response_data)
+
+    yield sse_event("done", response_data)
+
+
+async def iterate_in_thread(iterator):
+    # Lets the ASGI handler stream a blocking generator without buffering it.
+    sentinel = object()
+    while True:
+        item = await sync_to_async(next, thread_sensitive=False)(iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
+
+
+@csrf_exempt
+def debug_code_stream(request):
+    submission, error_response = prepare_submission(request)
+    if error_response:
+        return error_response
+
+    events = stream_debug_events(submission)
+    if isinstance(request, ASGIRequest):
+        events = iterate_in_thread(events)
+
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# ================= BATCH DEBUG API =================
+
+BATCH_REQUEST_STAGES = [stage for stage in REQUEST_STAGES if stage[0] != "body_size"]
+
+
+@csrf_exempt
+def debug_code_batch(request):
+    # Debugs a list of {code, error, mode} items. Results are streamed back
+    # as one JSON line per item, in input order, and history rows are written
+    # with a single bulk_create once every item is done.
+    # A batch counts as one request against the rate limit; its body may
+    # hold up to BATCH_MAX_ITEMS snippets, so the single-request size cap
+    # does not apply.
+    screening = Screening()
+
+    rejection = screening.screen_request(request, BATCH_REQUEST_STAGES)
+    if rejection:
+        return rejection_response(rejection, screening)
+
+    data, rejection = parse_body(request, screening)
+    if rejection:
+        return rejection_response(rejection, screening)
+
+    items = data.get("items")
+
+    max_items = get_setting("BATCH_MAX_ITEMS", 500)
+    if not isinstance(items, list) or not items:
         return JsonResponse(
-            {"error": "Code too long. Please submit under 300 lines."},
+            {"error": "Provide a non-empty list of items"},
             status=400
         )
-
-    # PROMPT INJECTION PROTECTION
-    suspicious_phrases = [
-        "ignore previous",
-        "you are chatgpt",
-        "act as",
-        "system prompt"
-    ]
-
-    lower_code = code.lower()
-    for phrase in suspicious_phrases:
-        if phrase in lower_code:
-            return JsonResponse(
-                {"error": "Invalid or unsafe input detected"},
-                status=400
-            )
-
-    # RATE LIMITING
-    ip = request.META.get("REMOTE_ADDR", "unknown")
-    if is_rate_limited(ip):
+    if len(items) > max_items:
         return JsonResponse(
-            {"error": "Too many requests. Please try again after some time."},
-            status=429
+            {"error": f"Too many items. Please submit at most {max_items} per batch."},
+            status=400
         )
 
-    # CLASSIFY ERROR
-    error_type = classify_error(error)
+    user = request.user if request.user.is_authenticated else None
+    bypass_cache = wants_fresh_response(request, data)
 
-    # BUILD PROMPT
-    prompt = build_prompt(code, error, error_type, mode)
+    lines = stream_batch_results(items, user, bypass_cache)
+    if isinstance(request, ASGIRequest):
+        lines = iterate_in_thread(lines)
 
-    # CALL LLM
-    result = call_llm(prompt)
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")
 
-    # BUILD RESPONSE DATA FIRST
-    if is_low_confidence(result):
-        response_data = {
-            "result": "Unable to confidently diagnose the issue with the given information.",
-            "error_type": error_type,
-            "mode": mode,
-            "confidence": "low",
-            "timestamp": time.time()
-        }
-    else:
-        response_data = {
-            "result": result,
-            "error_type": error_type,
-            "mode": mode,
-            "confidence": "high",
-            "timestamp": time.time()
-        }
 
-    # ================= SAVE HISTORY =================
-    if request.user.is_authenticated:
-        CodeSubmission.objects.create(
-            user=request.user,
-            code=code,
-            language="python",
-            error_message=error,
-            ai_response=response_data
-        )
+def stream_batch_results(items: list, user, bypass_cache: bool):
+    rejected = {}
+    prepared = []
+    positions = []
 
-    return JsonResponse(response_data)
+    for index, raw in enumerate(items):
+        raw = raw if isinstance(raw, dict) else {}
+        code, error = raw.get("code", ""), raw.get("error", "")
+        screening = Screening()
+        rejection = screening.screen_input(code, error)
+        if rejection:
+            rejected[index] = {"error": rejection[0], "reason": screening.reason}
+            continue
+
+        item = prepare_item(code, error, raw.get("mode", "full"))
+        item["bypass_cache"] = bypass_cache
+        item["user"] = user
+        prepared.append(item)
+        positions.append(index)
+
+    max_concurrency = get_setting("BATCH_MAX_CONCURRENCY", 8)
+    results = resolve_many(prepared, max_concurrency)
+    entries = []
+
+    def save():
+        CodeSubmission.objects.bulk_create(entries)
+        # bulk_create sends no post_save; fingerprint the new rows here.
+        index_submissions(entries)
+
+    # Answers already streamed are saved even if the client goes away.
+    try:
+        for index in range(len(items)):
+            if index in rejected:
+                yield json.dumps({"index": index, **rejected[index]}) + "\n"
+                continue
+
+            position, result, cache_hit, error = next(results)
+            if error is not None:
+                yield json.dumps({"index": positions[position], "error": item_error(error)}) + "\n"
+                continue
+
+            item = prepared[position]
+            response_data = build_response_data(result, item, cache_hit)
+            if user is not None:
+                entries.append(history_entry(item, response_data))
+
+            yield json.dumps({"index": positions[position], **response_data}) + "\n"
+    finally:
+        save()
+
+    yield json.dumps({"done": True, "count": len(items), "saved": len(entries)}) + "\n"
+
+
+# ================= STATS =================
+
+@staff_member_required
+def debug_stats(request):
+    # In-process numbers for tuning the tiering thresholds and backends.
+    cache = get_response_cache()
+    return JsonResponse({
+        "tiers": tier_stats.snapshot(),
+        "backends": {tier: get_router(tier).stats() for tier in tier_names()},
+        "cache": cache.stats(),
+        "singleflight": cache.flight.stats() if cache.flight else None,
+    })
 
 
-# ================= HISTORY PAGE =================
+# ================= METRICS =================
+
+def metrics(request):
+    # Prometheus text format. Set METRICS["TOKEN"] to require
+    # "Authorization: Bearer <token>" from the scraper.
+    config = get_metrics_config()
+    if not config["ENABLED"]:
+        return HttpResponse(status=404)
+
+    if config["TOKEN"] and request.headers.get("Authorization") != f"Bearer {config['TOKEN']}":
+        return HttpResponse(status=401)
+
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ================= HISTORY =================
+# Keyset pagination over (submitted_at, id), served by the
+# (user, -submitted_at, -id) index, so every page costs the same no matter
+# how long a user's history is. List queries skip the large columns and never
+# touch the code/response blobs; those are loaded per entry from
+# history_detail when it is expanded.
+
+HISTORY_LIST_DEFERRED = ("error_message", "response_meta", "reason")
+
+
+def encode_cursor(submission: CodeSubmission) -> str:
+    raw = f"{submission.submitted_at.isoformat()}|{submission.pk}"
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(cursor: str):
+    try:
+        submitted_at, pk = urlsafe_base64_decode(cursor).decode().split("|")
+        return datetime.fromisoformat(submitted_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+HISTORY_FILTERS = ("error_type", "confidence")
+
+
+def history_page(user, cursor: str = None, filters: dict = None):
+    page_size = get_setting("HISTORY_PAGE_SIZE", 20)
+
+    submissions = CodeSubmission.objects.filter(
+        user=user,
+        **(filters or {})
+    ).defer(*HISTORY_LIST_DEFERRED).order_by("-submitted_at", "-id")
+
+    if cursor:
+        submitted_at, pk = cursor
+        submissions = submissions.filter(
+            Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, pk__lt=pk)
+        )
+
+    rows = list(submissions[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
 
 @login_required
 def history_view(request):
-    submissions = CodeSubmission.objects.filter(
-        user=request.user
-    ).order_by("-submitted_at")
+    cursor = None
+    if request.GET.get("cursor"):
+        cursor = decode_cursor(request.GET["cursor"])
+        if cursor is None:
+            return redirect("history")
+
+    submissions, next_cursor = history_page(request.user, cursor)
 
     return render(request, "analyzer/history.html", {
-        "submissions": submissions
+        "submissions": submissions,
+        "next_cursor": next_cursor,
     })
 
 
+@login_required
+def history_api(request):
+    cursor = None
+    if request.GET.get("cursor"):
+        cursor = decode_cursor(request.GET["cursor"])
+        if cursor is None:
+            return JsonResponse(
+                {"error": "Invalid cursor"},
+                status=400
+            )
+
+    # Filters on the typed answer fields, e.g. ?error_type=IndexError
+    filters = {
+        name: request.GET[name]
+        for name in HISTORY_FILTERS
+        if request.GET.get(name)
+    }
+
+    submissions, next_cursor = history_page(request.user, cursor, filters)
+
+    return JsonResponse({
+        "results": [
+            {
+                "id": item.pk,
+                "language": item.language,
+                "submitted_at": item.submitted_at.isoformat(),
+                "error_type": item.error_type,
+                "confidence": item.confidence,
+                "problem_line": item.problem_line,
+                "detail_url": reverse("history_detail", args=[item.pk]),
+            }
+            for item in submissions
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@login_required
+def history_detail(request, pk: int):
+    item = get_object_or_404(
+        CodeSubmission.objects.select_related("code_blob", "response_blob", "fixed_code_blob"),
+        pk=pk,
+        user=request.user
+    )
+
+    return JsonResponse({
+        "id": item.pk,
+        "language": item.language,
+        "submitted_at": item.submitted_at.isoformat(),
+        "code": item.code,
+        "error_message": item.error_message,
+        "ai_response": item.ai_response,
+    })
@@ -0,0 +1,174 @@
+"""
+Storage and latency report for blob-backed CodeSubmission payloads.
+
+Writes the same classroom-style workload (many students resubmitting a small
+set of snippets) into two SQLite files: one with the old inline code /
+ai_response columns and one with the content-addressed, compressed blob
+table. Prints the file sizes and per-row write/read latency of each.
+
+    python bench/blob_storage.py --submissions 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.blobs import decode_text, encode_text  # noqa: E402
+
+SNIPPET = '''import csv
+
+
+def load_scores(path):
+    scores = {{}}
+    with open(path) as f:
+        for row in csv.DictReader(f):
+            scores[row["name"]] = int(row["score"])
+    return scores
+
+
+def average(scores):
+    total = 0
+    for name in scores:
+        total += scores[name]
+    return total / len(scores)
+
+
+def report(path):
+    scores = load_scores(path)
+    best = max(scores, key=scores.get)
+    print("Best student:", best)
+    print("Average:", average(scores))
+    print("Top three:", sorted(scores.values())[{offset}:3])
+
+
+report("scores_{variant}.csv")
+'''
+
+ANSWER = '''ERROR_REASON: ZeroDivisionError raised by average() when the CSV file is empty (runtime error).
+
+PROBLEM_LINE: Line 16: return total / len(scores)
+
+EXPLANATION: When the file has no rows, `scores` is an empty dict, so `len(scores)` is 0 and the
+division fails. Variant {variant}: guard against empty input before dividing.
+
+FIXED_CODE: 🛠️
+def average(scores):
+    if not scores:
+        return 0
+    return sum(scores.values()) / len(scores)
+
+EXAMPLE: ✅
+>>> average({{}})
+0
+>>> average({{"ana": 80, "ben": 90}})
+85.0
+'''
+
+
+def workload(count: int, distinct: int, seed: int = 7):
+    rng = random.Random(seed)
+    for i in range(count):
+        variant = rng.randrange(distinct)
+        code = SNIPPET.format(offset=variant % 3, variant=variant)
+        response = {
+            "result": ANSWER.format(variant=variant),
+            "error_type": "ZeroDivisionError",
+            "mode": "full",
+            "confidence": "high",
+            "timestamp": time.time(),
+        }
+        yield code, response
+
+
+def run_inline(path: str, rows) -> dict:
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE submission (id INTEGER PRIMARY KEY, code TEXT, ai_response TEXT)")
+
+    started = time.perf_counter()
+    with db:
+        for code, response in rows:
+            db.execute("INSERT INTO submission (code, ai_response) VALUES (?, ?)",
+                       (code, json.dumps(response)))
+    write = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for code, response in db.execute("SELECT code, ai_response FROM submission"):
+        json.loads(response)
+    read = time.perf_counter() - started
+
+    db.execute("VACUUM")
+    db.close()
+    return {"write": write, "read": read, "bytes": os.path.getsize(path)}
+
+
+def run_blobs(path: str, rows) -> dict:
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE blob (hash TEXT PRIMARY KEY, data BLOB, compression TEXT, size INTEGER)")
+    db.execute("CREATE TABLE submission (id INTEGER PRIMARY KEY, code_blob TEXT, "
+               "response_blob TEXT, response_meta TEXT)")
+
+    def store(text: str) -> str:
+        fields = encode_text(text)
+        db.execute("INSERT OR IGNORE INTO blob VALUES (?, ?, ?, ?)",
+                   (fields["hash"], fields["data"], fields["compression"], fields["size"]))
+        return fields["hash"]
+
+    started = time.perf_counter()
+    with db:
+        for code, response in rows:
+            meta = dict(response)
+            result = meta.pop("result")
+            db.execute("INSERT INTO submission (code_blob, response_blob, response_meta) VALUES (?, ?, ?)",
+                       (store(code), store(result), json.dumps(meta)))
+    write = time.perf_counter() - started
+
+    started = time.perf_counter()
+    query = """
+        SELECT c.data, c.compression, r.data, r.compression, s.response_meta
+        FROM submission s
+        JOIN blob c ON c.hash = s.code_blob
+        JOIN blob r ON r.hash = s.response_blob
+    """
+    for code, code_compression, result, result_compression, meta in db.execute(query):
+        decode_text(code, code_compression)
+        response = json.loads(meta)
+        response["result"] = decode_text(result, result_compression)
+    read = time.perf_counter() - started
+
+    db.execute("VACUUM")
+    db.close()
+    return {"write": write, "read": read, "bytes": os.path.getsize(path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, default=60,
+                        help="number of distinct snippets students submit")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = list(workload(args.submissions, args.distinct))
+        inline = run_inline(os.path.join(tmp, "inline.sqlite3"), rows)
+        blobs = run_blobs(os.path.join(tmp, "blobs.sqlite3"), rows)
+
+    n = args.submissions
+    print(f"{n:,} submissions, {args.distinct} distinct snippets\n")
+    print(f"{'':<8} {'db size':>12} {'write us/row':>13} {'read us/row':>12}")
+    for name, result in (("inline", inline), ("blobs", blobs)):
+        print(f"{name:<8} {result['bytes'] / 2**20:>10.2f}MB "
+              f"{result['write'] / n * 1e6:>13.1f} {result['read'] / n * 1e6:>12.1f}")
+
+    saved = inline["bytes"] - blobs["bytes"]
+    print(f"\nbytes saved: {saved / 2**20:.2f}MB ({saved / inline['bytes']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Accuracy and speed report for the error classifier.
+
+Builds a corpus of real tracebacks by running short snippets that raise every
+built-in exception (directly, from nested calls, chained with "raise from" or
+raised while handling another exception, and from code whose source lines
+mention other exception names), plus compile errors and bare
+"Name: message" lines. Each entry is classified by:
+
+    legacy       the old four-name substring chain
+    linear       a substring scan over every built-in exception name,
+                 keeping the one that appears last in the text
+    parse_error  the single-pass traceback parser in analyzer.error_utils
+
+and the report shows type accuracy, line accuracy (parse_error only) and
+microseconds per traceback.
+
+    python bench/classifier_bench.py --tracebacks 5000
+"""
+
+import argparse
+import contextlib
+import io
+import linecache
+import os
+import random
+import sys
+import time
+import traceback
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.error_utils import BUILTIN_EXCEPTIONS, USER_CODE, parse_error  # noqa: E402
+
+# Snippets that trigger the exception through a real operation.
+NATURAL = {
+    "IndexError": "items = [1, 2, 3]\nprint(items[{n}])",
+    "KeyError": "scores = {{'ann': 1}}\nprint(scores['student_{n}'])",
+    "TypeError": "total = {n}\nprint(total + 'points')",
+    "ValueError": "print(int('{n}x'))",
+    "NameError": "print(undefined_{n})",
+    "UnboundLocalError": "def f():\n    print(count)\n    count = {n}\nf()",
+    "AttributeError": "value = {n}\nvalue.append(1)",
+    "ZeroDivisionError": "print({n} / 0)",
+    "ModuleNotFoundError": "import missing_module_{n}",
+    "ImportError": "from os import missing_name_{n}",
+    "FileNotFoundError": "open('/nonexistent/file_{n}.txt')",
+    "RecursionError": "def f(n):\n    return f(n + 1)\nf({n})",
+    "StopIteration": "it = iter([])\nnext(it)",
+    "OverflowError": "import math\nprint(math.exp({n} + 1000))",
+    "UnicodeDecodeError": "print(b'\\xff{n}'.decode('utf-8'))",
+    "UnicodeEncodeError": "print('\\u00e9{n}'.encode('ascii'))",
+    "AssertionError": "assert {n} < 0, 'expected a negative number'",
+    "NotImplementedError": "class Shape:\n    def area(self):\n        raise NotImplementedError\nShape().area()",
+}
+
+# Source lines shown in the traceback that mention other exception names,
+# which trips the substring scans.
+DECOYS = [
+    "try:\n    pass\nexcept IndexError:\n    pass",
+    "# handles KeyError and ValueError below",
+    "errors = ['TypeError', 'ValueError']",
+]
+
+SYNTAX_ERRORS = [
+    "def f(:\n    pass",
+    "print('unclosed",
+    "if x == 1\n    print(x)",
+    "for i in range(3):\nprint(i)",
+    "x = (1, 2",
+]
+
+
+def raise_snippet(name: str, n: int) -> str:
+    if name in NATURAL:
+        return NATURAL[name].format(n=n)
+    if name in ("UnicodeDecodeError", "UnicodeEncodeError", "UnicodeTranslateError"):
+        return f"raise {name}('utf-8', '', 0, 1, 'case {n}')"
+    if name.endswith("Group"):
+        return f"raise {name}('case {n}', [ValueError('inner')])"
+    return f"raise {name}('case {n}')"
+
+
+def wrap(body: str, depth: int) -> str:
+    # Moves the failing code `depth` calls deep.
+    for level in range(depth):
+        body = f"def level_{level}():\n" + "\n".join("    " + line for line in body.splitlines()) + f"\nlevel_{level}()"
+    return body
+
+
+def chain(body: str, how: str, n: int) -> str:
+    indented = "\n".join("    " + line for line in body.splitlines())
+    if how == "context":
+        return f"try:\n    {{}}['missing_{n}']\nexcept KeyError:\n{indented}"
+    nested = "\n".join("    " + line for line in indented.splitlines())
+    return (f"try:\n    int('bad_{n}')\nexcept ValueError as exc:\n    try:\n{nested}\n"
+            f"    except BaseException as inner:\n        raise inner from exc")
+
+
+def summary(exc: BaseException) -> str:
+    return "".join(traceback.format_exception_only(type(exc), exc)).rstrip().splitlines()[-1]
+
+
+def run(code: str):
+    # Returns (formatted traceback, last line of it, exception type name,
+    # line) or None when the snippet did not raise.
+    linecache.cache[USER_CODE] = (len(code), None, code.splitlines(True), USER_CODE)
+    try:
+        compiled = compile(code, USER_CODE, "exec")
+    except SyntaxError as exc:
+        return traceback.format_exc(), summary(exc), type(exc).__name__, exc.lineno
+
+    try:
+        with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+            warnings.simplefilter("error")
+            exec(compiled, {"__name__": "__main__"})
+    except BaseException as exc:
+        text = traceback.format_exc()
+        tb = exc.__traceback__
+        line = None
+        while tb is not None:
+            if tb.tb_frame.f_code.co_filename == USER_CODE:
+                line = tb.tb_lineno
+            tb = tb.tb_next
+        return text, summary(exc), type(exc).__name__, line
+    return None
+
+
+def build_corpus(size: int, seed: int) -> list:
+    rng = random.Random(seed)
+    names = sorted(BUILTIN_EXCEPTIONS)
+    corpus = []
+
+    while len(corpus) < size:
+        n = rng.randrange(1000)
+        roll = rng.random()
+
+        if roll < 0.05:
+            code = rng.choice(SYNTAX_ERRORS)
+        else:
+            name = rng.choice(names)
+            code = wrap(raise_snippet(name, n), rng.choice([0, 0, 1, 2, 3]))
+            if roll < 0.20:
+                code = chain(code, rng.choice(["context", "cause"]), n)
+            if rng.random() < 0.3:
+                code = rng.choice(DECOYS) + "\n" + code
+
+        outcome = run(code)
+        if outcome is None:
+            continue
+        text, last_line, name, line = outcome
+
+        if rng.random() < 0.1:
+            # Only the last line, as students often paste.
+            corpus.append((last_line, name, None))
+        else:
+            corpus.append((text, name, line))
+
+    return corpus
+
+
+def legacy(text: str) -> str:
+    if "IndexError" in text:
+        return "IndexError"
+    elif "TypeError" in text:
+        return "TypeError"
+    elif "KeyError" in text:
+        return "KeyError"
+    elif "ValueError" in text:
+        return "ValueError"
+    return "UnknownError"
+
+
+NAMES_LONGEST_FIRST = sorted(BUILTIN_EXCEPTIONS, key=len, reverse=True)
+
+
+def linear(text: str) -> str:
+    best, best_at = "UnknownError", -1
+    for name in NAMES_LONGEST_FIRST:
+        at = text.rfind(name)
+        if at > best_at:
+            best, best_at = name, at
+    return best
+
+
+def parsed(text: str) -> str:
+    info = parse_error(text)
+    return info.type if info else "UnknownError"
+
+
+def measure(classify, corpus: list, repeat: int) -> tuple:
+    correct = sum(classify(text) == name for text, name, _ in corpus)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text, _, _ in corpus:
+            classify(text)
+    elapsed = time.perf_counter() - started
+    return correct / len(corpus), elapsed / (repeat * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tracebacks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=14)
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(200)
+    corpus = build_corpus(args.tracebacks, args.seed)
+    sys.setrecursionlimit(1000)
+
+    with_line = [(text, line) for text, _, line in corpus if line is not None]
+    line_accuracy = sum(parse_error(text).line == line for text, line in with_line) / len(with_line)
+    types = len({name for _, name, _ in corpus})
+    average = sum(len(text) for text, _, _ in corpus) / len(corpus)
+
+    print(f"{len(corpus)} tracebacks, {types} exception types, {average:.0f} chars on average\n")
+    print(f"{'':<12} {'type acc':>9} {'us/tb':>8}")
+    for label, classify in (("legacy", legacy), ("linear", linear), ("parse_error", parsed)):
+        accuracy, micros = measure(classify, corpus, args.repeat)
+        print(f"{label:<12} {accuracy:>9.1%} {micros:>8.1f}")
+    print(f"\nparse_error line accuracy: {line_accuracy:.1%} of {len(with_line)} tracebacks with a <user_code> frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Code/traceback submissions for the offline benchmarks.
+
+SNIPPETS holds the kind of code students paste: runtime errors, compile
+errors and silent logic bugs, in a few sizes. Runtime tracebacks are
+produced by actually running the snippet, so they look exactly like what a
+student copies from a terminal. submissions() expands the snippets into a
+workload with a chosen share of repeated items (cache hits) and hint
+requests.
+
+    from corpus import submissions
+    items = submissions(1000, unique_fraction=0.8)
+"""
+
+import linecache
+import random
+import sys
+import traceback
+
+USER_CODE = "<user_code>"
+
+# (name, code, run it for a traceback?)
+SNIPPETS = [
+    ("index_error", """scores = [88, 92, 79]
+for i in range(len(scores) + 1):
+    print(scores[i])
+""", True),
+    ("key_error", """inventory = {"apples": 3, "pears": 0}
+order = ["apples", "bananas"]
+for item in order:
+    inventory[item] -= 1
+""", True),
+    ("type_error", """def average(values):
+    return sum(values) / len(values)
+
+ages = [21, 34, 19]
+print("Average age: " + average(ages))
+""", True),
+    ("value_error", """raw = "12, 7, x, 40"
+numbers = [int(part) for part in raw.split(",")]
+print(max(numbers))
+""", True),
+    ("name_error", """def greet(name):
+    message = "Hello, " + name
+    return mesage
+
+print(greet("Ada"))
+""", True),
+    ("attribute_error", """class Account:
+    def __init__(self, owner):
+        self.owner = owner
+        self.balance = 0
+
+    def deposit(self, amount):
+        self.balance += amount
+
+account = Account("sam")
+account.deposit(50)
+account.withdraw(20)
+""", True),
+    ("zero_division", """def percent(part, whole):
+    return part / whole * 100
+
+totals = {"passed": 0, "failed": 0}
+print(percent(totals["passed"], totals["passed"] + totals["failed"]))
+""", True),
+    ("unbound_local", """count = 0
+
+def increment():
+    count += 1
+    return count
+
+increment()
+""", True),
+    ("recursion", """def factorial(n):
+    return n * factorial(n - 1)
+
+print(factorial(5))
+""", True),
+    ("file_not_found", """with open("grades.csv") as f:
+    for line in f:
+        print(line.strip().split(","))
+""", True),
+    ("module_not_found", """import numpyy as np
+
+print(np.mean([1, 2, 3]))
+""", True),
+    ("nested_type_error", """import json
+
+
+def load_config(text):
+    config = json.loads(text)
+    return config
+
+
+def port_for(config, service):
+    return config["services"][service]["port"] + 1
+
+
+def main():
+    config = load_config('{"services": {"web": {"port": "8080"}}}')
+    for service in config["services"]:
+        print(service, port_for(config, service))
+
+
+main()
+""", True),
+    ("syntax_missing_colon", """def is_even(n)
+    return n % 2 == 0
+
+print(is_even(4))
+""", False),
+    ("syntax_unclosed", """names = ["ana", "bo", "cy"
+for name in names:
+    print(name.title())
+""", False),
+    ("indentation", """def total(prices):
+    result = 0
+    for price in prices:
+    result += price
+    return result
+""", False),
+    ("logic_off_by_one", """def last_three(items):
+    return items[len(items) - 4:len(items) - 1]
+
+print(last_three([1, 2, 3, 4, 5]))
+""", False),
+    ("logic_mutable_default", """def add_student(name, roster=[]):
+    roster.append(name)
+    return roster
+
+print(add_student("ana"))
+print(add_student("bo"))
+""", False),
+    ("logic_missing_return", """def discount(price, percent):
+    final = price - price * percent / 100
+
+total = discount(80, 25)
+print("You pay", total)
+""", False),
+    ("long_report", "\n".join(
+        [
+            "import csv",
+            "",
+            "",
+            "def load(path):",
+            "    rows = []",
+            "    with open(path) as f:",
+            "        for row in csv.DictReader(f):",
+            "            rows.append(row)",
+            "    return rows",
+            "",
+        ]
+        + [
+            line
+            for index in range(12)
+            for line in (
+                f"def summary_{index}(rows):",
+                f"    values = [float(row['score_{index}']) for row in rows]",
+                "    return sum(values) / len(values)",
+                "",
+            )
+        ]
+        + [
+            "rows = [{'score_%d' % i: str(i * 10) for i in range(12)}]",
+            "print(summary_3(rows), summary_11(rows))",
+            "print(summary_12(rows))",
+        ]
+    ) + "\n", True),
+]
+
+
+def run_for_traceback(code: str) -> str:
+    # The traceback a student would see, without this module's frame.
+    linecache.cache[USER_CODE] = (len(code), None, code.splitlines(True), USER_CODE)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)
+    try:
+        exec(compile(code, USER_CODE, "exec"), {"__name__": "__main__", "print": lambda *args, **kwargs: None})
+    except Exception as exc:
+        return "".join(traceback.format_exception(type(exc), exc, exc.__traceback__.tb_next))
+    finally:
+        sys.setrecursionlimit(limit)
+    return ""
+
+
+_base = None
+
+
+def base_submissions() -> list:
+    global _base
+
+    if _base is None:
+        _base = [
+            {"name": name, "code": code, "error": run_for_traceback(code) if run else ""}
+            for name, code, run in SNIPPETS
+        ]
+    return _base
+
+
+def submissions(count: int, unique_fraction: float = 1.0, hint_fraction: float = 0.2,
+                seed: int = 17) -> list:
+    # unique_fraction of the items get a distinct trailing comment (a distinct
+    # cache key); the rest repeat earlier items exactly.
+    rng = random.Random(seed)
+    base = base_submissions()
+    items = []
+
+    for index in range(count):
+        if items and rng.random() >= unique_fraction:
+            items.append(dict(rng.choice(items)))
+            continue
+
+        snippet = rng.choice(base)
+        items.append({
+            "name": snippet["name"],
+            "code": snippet["code"] + f"# submission {index}\n",
+            "error": snippet["error"],
+            "mode": "hint" if rng.random() < hint_fraction else "full",
+        })
+
+    return items
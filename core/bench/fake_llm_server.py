@@ -0,0 +1,242 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8001/v1 and any
+OPENAI_API_KEY. Every request sleeps for --latency seconds before answering
+and then produces the answer at --tokens-per-second, so concurrency can be
+load-tested offline without spending tokens. --error-rate answers that
+fraction of requests with --error-status instead.
+
+    python bench/fake_llm_server.py --port 8001 --latency 1.5 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+from http import HTTPStatus
+import random
+import time
+import uuid
+
+CANNED_RESPONSE = """ERROR_REASON: The list index is out of range (runtime IndexError).
+
+PROBLEM_LINE: Line 2: print(items[3])
+
+EXPLANATION: The list has three elements, so valid indexes are 0, 1 and 2.
+
+FIXED_CODE: 🛠️
+items = [1, 2, 3]
+print(items[2])
+
+EXAMPLE: ✅
+>>> [1, 2, 3][2]
+3
+"""
+
+# Returned when the request asks for structured output (response_format).
+CANNED_JSON_RESPONSE = json.dumps({
+    "reason": "The list index is out of range (runtime IndexError).",
+    "problem_line": 2,
+    "problem_snippet": "print(items[3])",
+    "explanation": "The list has three elements, so valid indexes are 0, 1 and 2.",
+    "fixed_code": "items = [1, 2, 3]\nprint(items[2])",
+    "example": ">>> [1, 2, 3][2]\n3",
+    "confidence": "high",
+})
+
+
+def count_tokens(text: str) -> int:
+    # Rough estimate (about four characters per token), good enough for the
+    # usage numbers the app records.
+    return max(1, len(text) // 4)
+
+
+def prompt_tokens(payload: dict) -> int:
+    return sum(count_tokens(str(message.get("content", ""))) for message in payload.get("messages", []))
+
+
+def completion_body(model: str, content: str, prompt_token_count: int = 0) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_token_count,
+            "completion_tokens": count_tokens(content),
+            "total_tokens": prompt_token_count + count_tokens(content),
+        },
+    }
+
+
+def stream_chunk(model: str, completion_id: str, content: str, finish_reason=None) -> bytes:
+    delta = {"content": content} if content else {}
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(body)}\n\n".encode()
+
+
+class FakeLLMServer:
+
+    def __init__(self, latency: float, tokens_per_second: float,
+                 tail_latency: float = 0, tail_fraction: float = 0,
+                 error_rate: float = 0, error_status: int = 500):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        # A tail_fraction of requests take tail_latency instead of latency.
+        self.tail_latency = tail_latency
+        self.tail_fraction = tail_fraction
+        # An error_rate fraction of requests fail with error_status.
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                await self.respond(writer, *request)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, value = line.decode("latin-1").split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        body = await reader.readexactly(length) if length else b""
+        return method, path, body
+
+    async def respond(self, writer, method, path, body):
+        if method != "POST" or not path.rstrip("/").endswith("/chat/completions"):
+            self.write_json(writer, 404, {"error": {"message": "not found"}})
+            await writer.drain()
+            return
+
+        payload = json.loads(body or b"{}")
+        model = payload.get("model", "fake-model")
+
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            slow = self.tail_fraction and random.random() < self.tail_fraction
+            await asyncio.sleep(self.tail_latency if slow else self.latency)
+
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors += 1
+                self.write_json(writer, self.error_status, {
+                    "error": {"message": "injected failure", "type": "server_error", "code": None},
+                })
+                await writer.drain()
+            elif payload.get("stream"):
+                await self.write_stream(writer, model)
+            else:
+                content = CANNED_JSON_RESPONSE if payload.get("response_format") else CANNED_RESPONSE
+                if self.tokens_per_second:
+                    await asyncio.sleep(count_tokens(content) / self.tokens_per_second)
+                self.write_json(writer, 200, completion_body(model, content, prompt_tokens(payload)))
+                await writer.drain()
+        finally:
+            self.in_flight -= 1
+
+    def write_json(self, writer, status: int, body: dict):
+        data = json.dumps(body).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: keep-alive\r\n\r\n".encode() + data
+        )
+
+    async def write_stream(self, writer, model: str):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        delay = 1 / self.tokens_per_second if self.tokens_per_second else 0
+
+        for token in CANNED_RESPONSE.split(" "):
+            self.write_chunk(writer, stream_chunk(model, completion_id, token + " "))
+            await writer.drain()
+            if delay:
+                await asyncio.sleep(delay)
+
+        self.write_chunk(writer, stream_chunk(model, completion_id, "", "stop"))
+        self.write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def write_chunk(writer, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+async def serve(host: str, port: int, latency: float, tokens_per_second: float,
+                tail_latency: float = 0, tail_fraction: float = 0,
+                error_rate: float = 0, error_status: int = 500):
+    fake = FakeLLMServer(latency, tokens_per_second, tail_latency, tail_fraction, error_rate, error_status)
+    server = await asyncio.start_server(fake.handle, host, port, backlog=4096)
+    print(f"Fake LLM listening on http://{host}:{port}/v1 (latency {latency}s)")
+
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=1.0,
+                        help="seconds to wait before answering")
+    parser.add_argument("--tokens-per-second", type=float, default=50,
+                        help="rate at which answers are produced (0 = no delay)")
+    parser.add_argument("--tail-latency", type=float, default=0,
+                        help="latency of the slow requests")
+    parser.add_argument("--tail-fraction", type=float, default=0,
+                        help="fraction of requests that take --tail-latency")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=500,
+                        help="HTTP status of injected failures (e.g. 429, 500, 503)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency, args.tokens_per_second,
+                          args.tail_latency, args.tail_fraction, args.error_rate, args.error_status))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
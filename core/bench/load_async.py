@@ -0,0 +1,118 @@
+"""
+Offline concurrency test for the async debug view.
+
+Starts the fake LLM server and drives core.asgi.application in-process with
+N concurrent requests, each from its own client address so the rate limiter
+does not kick in.
+
+    python bench/load_async.py --requests 500 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+
+async def asgi_post(application, path: str, body: dict, client_ip: str) -> int:
+    payload = json.dumps(body).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+        ],
+        "client": (client_ip, 50000),
+        "server": ("localhost", 80),
+    }
+    sent = False
+    status = None
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await application(scope, receive, send)
+    return status
+
+
+async def run(args):
+    fake = FakeLLMServer(args.latency, tokens_per_second=0)
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", 0, backlog=4096)
+    port = server.sockets[0].getsockname()[1]
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+    from core.asgi import application
+
+    body = {"code": "items = [1, 2, 3]\nprint(items[3])", "mode": "full", "no_cache": True}
+
+    async def one(i: int):
+        started = time.perf_counter()
+        ip = f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" if i >= 0 else "127.0.0.1"
+        status = await asgi_post(application, args.path, body, ip)
+        return status, time.perf_counter() - started
+
+    # Warm up imports, URL resolution and the connection pool.
+    await one(-1)
+    fake.peak_in_flight = 0
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    server.close()
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    print(f"requests:          {args.requests}")
+    print(f"statuses:          {statuses}")
+    print(f"wall time:         {elapsed:.2f}s (upstream latency {args.latency}s)")
+    print(f"throughput:        {args.requests / elapsed:.1f} req/s")
+    print(f"p50 latency:       {statistics.median(latencies):.3f}s")
+    print(f"max latency:       {latencies[-1]:.3f}s")
+    print(f"peak upstream:     {fake.peak_in_flight} concurrent calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--path", default="/debug/async/")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Per-call overhead of the request metrics.
+
+Times the primitives in analyzer/metrics.py in a tight loop: a bare
+perf_counter pair for reference, Counter.inc, Histogram.observe, and a full
+`with timer(...)` block both outside a request and inside one (where the
+stage is also kept for the Server-Timing header). Optionally repeats the
+timer from several threads to show lock contention.
+
+    python bench/metrics_overhead.py --calls 200000 --threads 4
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.metrics import ANSWERS, STAGE_SECONDS, _request_timings, timer  # noqa: E402
+
+
+def per_call(function, calls: int) -> float:
+    started = time.perf_counter()
+    function(calls)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def bare(calls: int) -> None:
+    for _ in range(calls):
+        started = time.perf_counter()
+        time.perf_counter() - started
+
+
+def counter(calls: int) -> None:
+    for _ in range(calls):
+        ANSWERS.inc("llm", "high")
+
+
+def histogram(calls: int) -> None:
+    for _ in range(calls):
+        STAGE_SECONDS.observe(0.003, "bench")
+
+
+def timed(calls: int) -> None:
+    for _ in range(calls):
+        with timer("bench"):
+            pass
+
+
+def timed_in_request(calls: int) -> None:
+    # A real request holds a dozen stages; reset the list so it stays small.
+    for _ in range(calls // 10):
+        token = _request_timings.set([])
+        for _ in range(10):
+            with timer("bench"):
+                pass
+        _request_timings.reset(token)
+
+
+def threaded(calls: int, threads: int) -> float:
+    workers = [threading.Thread(target=timed, args=(calls // threads,)) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.calls} calls\n")
+    print(f"{'':<28} {'us/call':>8}")
+    for label, function in (
+        ("perf_counter pair", bare),
+        ("Counter.inc", counter),
+        ("Histogram.observe", histogram),
+        ("timer", timed),
+        ("timer inside a request", timed_in_request),
+    ):
+        print(f"{label:<28} {per_call(function, args.calls):>8.2f}")
+
+    if args.threads > 1:
+        print(f"{f'timer, {args.threads} threads':<28} {threaded(args.calls, args.threads):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
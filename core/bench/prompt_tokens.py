@@ -0,0 +1,85 @@
+"""
+Input-token report for the debug prompt, per mode.
+
+Shows how much of each request is the static system prefix (eligible for
+provider-side prompt caching) and what a request costs once that prefix is
+cached. Uses tiktoken when installed, otherwise estimates 4 characters per
+token.
+
+    python bench/prompt_tokens.py
+"""
+
+import argparse
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.prompts import SYSTEM_PROMPTS, build_messages  # noqa: E402
+
+# OpenAI caches prompt prefixes of at least 1024 tokens and bills cached
+# input tokens at half price.
+MIN_CACHEABLE_PREFIX = 1024
+CACHED_TOKEN_PRICE = 0.5
+
+SAMPLE_CODE = """def average(values):
+    total = 0
+    for value in values:
+        total += value
+    return total / len(values)
+
+print(average([]))
+"""
+
+SAMPLE_ERROR = """Traceback (most recent call last):
+  File "<user_code>", line 7, in <module>
+  File "<user_code>", line 5, in average
+ZeroDivisionError: division by zero
+"""
+
+
+def get_token_counter(model: str):
+    approximate = (lambda text: max(1, len(text) // 4)), "approx. (4 chars/token)"
+
+    try:
+        import tiktoken
+    except ImportError:
+        return approximate
+
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken downloads its encodings on first use; stay usable offline.
+        return approximate
+    return lambda text: len(encoding.encode(text)), f"tiktoken ({encoding.name})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args()
+
+    count, method = get_token_counter(args.model)
+    print(f"Token counts: {method}\n")
+    print(f"{'mode':<11} {'system':>8} {'user':>6} {'total':>7} {'cacheable':>10} {'effective':>10} {'saving':>7}")
+
+    for mode, structured in itertools.product(SYSTEM_PROMPTS, (False, True)):
+        system, user = build_messages(SAMPLE_CODE, SAMPLE_ERROR, "ZeroDivisionError", mode, structured)
+        system_tokens = count(system["content"])
+        user_tokens = count(user["content"])
+        total = system_tokens + user_tokens
+
+        cacheable = system_tokens >= MIN_CACHEABLE_PREFIX
+        effective = user_tokens + system_tokens * (CACHED_TOKEN_PRICE if cacheable else 1)
+        saving = 1 - effective / total
+
+        label = f"{mode}/{'json' if structured else 'text'}"
+        print(f"{label:<11} {system_tokens:>8} {user_tokens:>6} {total:>7} "
+              f"{'yes' if cacheable else 'no':>10} {effective:>10.0f} {saving:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Per-request cost of the rate limiter as the number of distinct client IPs grows.
+
+Compares the original per-IP timestamp-list dict with the sliding-window
+counter in analyzer.ratelimit (locmem backend).
+
+    python bench/ratelimit_bench.py --max-ips 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.ratelimit import LocMemBackend, RateLimiter  # noqa: E402
+
+MAX_REQUESTS = 5
+WINDOW_SECONDS = 60
+
+
+class LegacyLimiter:
+    # The implementation that used to live in analyzer/views.py.
+
+    def __init__(self):
+        self.rate_limit = {}
+
+    def is_limited(self, ip: str, now: float) -> bool:
+        if ip not in self.rate_limit:
+            self.rate_limit[ip] = []
+
+        self.rate_limit[ip] = [
+            timestamp for timestamp in self.rate_limit[ip]
+            if now - timestamp < WINDOW_SECONDS
+        ]
+
+        if len(self.rate_limit[ip]) >= MAX_REQUESTS:
+            return True
+
+        self.rate_limit[ip].append(now)
+        return False
+
+
+def ip_for(i: int) -> str:
+    return f"{i >> 24 & 255}.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def measure(check, distinct_ips: int, samples: int) -> tuple:
+    # Each IP is seen once per second of simulated time, so long-running
+    # servers accumulate state for every client they have ever served.
+    tracemalloc.start()
+    now = 0.0
+    for i in range(distinct_ips):
+        check(ip_for(i), now)
+        now += 1.0 / 1000
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter_ns()
+    for i in range(samples):
+        check(ip_for(i * 7919 % distinct_ips), now)
+    per_call = (time.perf_counter_ns() - started) / samples
+
+    return per_call, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-ips", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=200_000)
+    args = parser.parse_args()
+
+    sizes = [size for size in (1_000, 10_000, 100_000, 1_000_000) if size <= args.max_ips]
+
+    print(f"{'distinct IPs':>12} | {'legacy ns/call':>14} {'legacy MB':>10} | "
+          f"{'window ns/call':>14} {'window MB':>10} {'live keys':>10}")
+
+    for size in sizes:
+        legacy = LegacyLimiter()
+        legacy_ns, legacy_mem = measure(legacy.is_limited, size, args.samples)
+
+        backend = LocMemBackend()
+        limiter = RateLimiter(backend, MAX_REQUESTS, WINDOW_SECONDS)
+        window_ns, window_mem = measure(
+            lambda ip, now: limiter.is_limited(ip, now=now), size, args.samples
+        )
+
+        print(f"{size:>12,} | {legacy_ns:>14.0f} {legacy_mem / 2**20:>10.1f} | "
+              f"{window_ns:>14.0f} {window_mem / 2**20:>10.1f} {len(backend):>10,}")
+
+
+if __name__ == "__main__":
+    main()
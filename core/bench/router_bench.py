@@ -0,0 +1,117 @@
+"""
+Tail-latency report for the LLM router.
+
+Starts two fake LLM servers whose answers occasionally take --tail-latency
+seconds and sends the same sequence of calls through a router with one
+backend, two backends without hedging and two backends with hedging.
+Prints p50 / p95 / p99 latency and how many calls were hedged.
+
+    python bench/router_bench.py --calls 400 --tail-fraction 0.03
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analyzer.router import Backend, Router  # noqa: E402
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "x = [1]\nprint(x[3])"}]
+
+
+def start_servers(count: int, latency: float, tail_latency: float, tail_fraction: float) -> list:
+    loop = asyncio.new_event_loop()
+    ports = []
+    ready = threading.Event()
+
+    async def start():
+        for _ in range(count):
+            fake = FakeLLMServer(latency, 0, tail_latency, tail_fraction)
+            server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+            ports.append(server.sockets[0].getsockname()[1])
+        ready.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start())
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return ports
+
+
+def make_router(ports: list, hedge: bool) -> Router:
+    backends = [
+        Backend(name=f"fake-{port}", model="fake", base_url=f"http://127.0.0.1:{port}/v1", api_key="x")
+        for port in ports
+    ]
+    # Without hedging the minimum sample count is never reached.
+    return Router(backends, hedge_min_samples=20 if hedge else 10 ** 9)
+
+
+def run(router: Router, calls: int, concurrency: int) -> dict:
+    latencies = []
+    hedged = 0
+    lock = threading.Lock()
+    remaining = iter(range(calls))
+
+    def worker():
+        nonlocal hedged
+        for _ in remaining:
+            result = router.complete(MESSAGES)
+            with lock:
+                latencies.append(result.latency)
+                hedged += result.hedged
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "p99": latencies[int(0.99 * (len(latencies) - 1))],
+        "hedged": hedged,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tail-latency", type=float, default=1.0)
+    parser.add_argument("--tail-fraction", type=float, default=0.03)
+    args = parser.parse_args()
+
+    ports = start_servers(2, args.latency, args.tail_latency, args.tail_fraction)
+    setups = [
+        ("1 backend", make_router(ports[:1], hedge=False)),
+        ("2 backends", make_router(ports, hedge=False)),
+        ("2 + hedging", make_router(ports, hedge=True)),
+    ]
+
+    print(f"{args.calls} calls, latency {args.latency}s, "
+          f"{args.tail_fraction:.0%} at {args.tail_latency}s\n")
+    print(f"{'':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hedged':>7}")
+    for name, router in setups:
+        started = time.perf_counter()
+        result = run(router, args.calls, args.concurrency)
+        print(f"{name:<12} {result['p50'] * 1000:>8.0f} {result['p95'] * 1000:>8.0f} "
+              f"{result['p99'] * 1000:>8.0f} {result['hedged']:>7}"
+              f"   ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
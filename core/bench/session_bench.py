@@ -0,0 +1,105 @@
+"""
+Input tokens of session follow-ups versus fresh "next hint" requests.
+
+Replays --turns "next hint" follow-ups on each corpus snippet (buried in a
+--lines module and sliced as in production), with canned answers of
+--answer-chars characters, through the session message layout and
+summarization of analyzer/sessions.py. A fresh request has to resend the
+code, the error and the hints given so far (a plain resend would get the
+first hint again from the response cache); a follow-up resends the stored
+conversation. "new" counts what follows the longest prefix shared with the
+previous request of the same kind, i.e. what the provider's prompt cache
+cannot serve. Uses tiktoken when installed, otherwise estimates 4
+characters per token.
+
+    python bench/session_bench.py --turns 12 --lines 600
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.error_utils import user_lines  # noqa: E402
+from analyzer.prompts import build_messages  # noqa: E402
+from analyzer.sessions import FOLLOW_UPS, compact, estimate_tokens  # noqa: E402
+from analyzer.slicing import DEFAULT_CONFIG as SLICING, slice_code  # noqa: E402
+from corpus import SNIPPETS, run_for_traceback  # noqa: E402
+from prompt_tokens import get_token_counter  # noqa: E402
+from slicing_bench import long_module  # noqa: E402
+
+
+def canned_answer(turn: int, size: int) -> str:
+    hint = f"Hint {turn + 1}: look at how the loop bound relates to the length of the list. "
+    return json.dumps({"hints": (hint * (size // len(hint) + 1))[:size], "confidence": "high"})
+
+
+def first_messages(code: str, error: str) -> tuple:
+    excerpt = slice_code(code, user_lines(error), SLICING["TOKEN_BUDGET"])
+    if excerpt is None:
+        return tuple(build_messages(code, error, "", "hint", structured=True))
+    return tuple(build_messages(excerpt.code, error, "", "hint", structured=True, excerpt=True))
+
+
+def joined(messages: list) -> str:
+    return "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--lines", type=int, default=0, help="pad each snippet to a module of this many lines")
+    parser.add_argument("--budget", type=int, default=4000, help="session TOKEN_BUDGET")
+    parser.add_argument("--keep-turns", type=int, default=2)
+    parser.add_argument("--answer-chars", type=int, default=600)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args()
+
+    count_tokens, counter_name = get_token_counter(args.model)
+
+    instruction = {"role": "system", "content": FOLLOW_UPS["next_hint"][1]}
+    totals = {"fresh": [0, 0], "follow-up": [0, 0]}
+    largest = 0
+    requests = 0
+
+    for name, code, run in SNIPPETS:
+        if args.lines:
+            code = long_module(code, args.lines)
+        error = run_for_traceback(code) if run else ""
+        system, user = first_messages(code, error)
+
+        answers = [canned_answer(0, args.answer_chars)]
+        messages = [user, {"role": "assistant", "content": answers[0]}]
+        previous = {"fresh": joined([system, user]), "follow-up": joined([system, user])}
+        summary = ""
+        for turn in range(1, args.turns + 1):
+            hints = "\n".join(json.loads(answer)["hints"] for answer in answers)
+            fresh = {"role": "user", "content": f"{user['content']}\nHINTS ALREADY GIVEN:\n{hints}\n"}
+            prompts = {"fresh": [system, fresh], "follow-up": [system] + messages + [instruction]}
+
+            for kind, prompt in prompts.items():
+                text = joined(prompt)
+                shared = len(os.path.commonprefix([text, previous[kind]]))
+                totals[kind][0] += count_tokens(text)
+                totals[kind][1] += count_tokens(text[shared:])
+                previous[kind] = text
+            largest = max(largest, count_tokens(previous["follow-up"]))
+            requests += 1
+
+            answers.append(canned_answer(turn, args.answer_chars))
+            messages = messages + [instruction, {"role": "assistant", "content": answers[-1]}]
+            if estimate_tokens(messages[1:]) > args.budget:
+                messages, summary = compact(messages, summary, "hint", args.keep_turns)
+
+    print(f"Tokens counted with {counter_name}; {requests} next-hint requests, {args.turns} per snippet, "
+          f"{args.lines or 'unpadded'} lines, budget {args.budget}\n")
+    print(f"{'':<20} {'prompt':>8} {'new':>8}")
+    for kind, (prompt, new) in totals.items():
+        print(f"{kind:<20} {prompt / requests:>8.0f} {new / requests:>8.0f}")
+    print(f"\nlargest follow-up prompt: {largest} tokens")
+
+
+if __name__ == "__main__":
+    main()
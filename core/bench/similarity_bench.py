@@ -0,0 +1,123 @@
+"""
+Near-duplicate lookup: fingerprint cost, lookup latency and match quality.
+
+Fills a SimilarityIndex with --entries submissions derived from the corpus
+snippets (renamed identifiers, changed literals, extra statements), then
+queries it with three kinds of variants of each snippet:
+
+    renamed    other identifiers, comments and blank lines (should match
+               exactly and be reused)
+    edited     one extra statement (should be a near match, >= --threshold)
+    unrelated  a different snippet with the same error type (should not match)
+
+    python bench/similarity_bench.py --entries 20000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.error_utils import parse_error  # noqa: E402
+from analyzer.similarity import SimilarityIndex, canonicalize, fingerprint  # noqa: E402
+from corpus import base_submissions  # noqa: E402
+
+WORDS = ["total", "items", "value", "data", "result", "count", "row", "entry", "thing", "numbers"]
+
+
+def rename(code: str, rng: random.Random) -> str:
+    # Imported module names stay; renaming them changes the program.
+    modules = set(re.findall(r"^\s*import (\w+)", code, re.MULTILINE))
+    names = sorted(set(canonicalize(code).names) - modules, key=len, reverse=True)
+    mapping = {name: f"{rng.choice(WORDS)}_{index}" for index, name in enumerate(names)}
+    if not mapping:
+        return code
+    pattern = re.compile(r"(?<!\.)\b(" + "|".join(map(re.escape, mapping)) + r")\b")
+    return pattern.sub(lambda match: mapping[match.group(1)], code)
+
+
+def renamed_variant(code: str, rng: random.Random) -> str:
+    lines = [line + ("  # note" if rng.random() < 0.3 else "") for line in rename(code, rng).splitlines()]
+    return "# my homework\n\n" + "\n".join(lines) + "\n"
+
+
+def edited_variant(code: str, rng: random.Random) -> str:
+    return f"print('starting {rng.randint(0, 999)}')\n" + rename(code, rng)
+
+
+def timed(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20_000)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = base_submissions()
+    types = {}
+    for snippet in base:
+        info = parse_error(snippet["error"])
+        types[snippet["name"]] = info.type if info else "UnknownError"
+
+    # INDEX
+    index = SimilarityIndex(max_entries=args.entries)
+    originals = {}
+    started = time.perf_counter()
+    for submission_id in range(1, args.entries + 1):
+        snippet = base[submission_id % len(base)]
+        code = snippet["code"] if submission_id <= len(base) else edited_variant(snippet["code"], rng)
+        fp = fingerprint(code)
+        index.add(submission_id, fp.canonical.hash, fp.signature, types[snippet["name"]], "full")
+        originals.setdefault(snippet["name"], submission_id)
+    build = (time.perf_counter() - started) / args.entries * 1e6
+
+    # QUALITY
+    results = {"renamed": 0, "edited": 0, "unrelated": 0}
+    for snippet in base:
+        error_type = types[snippet["name"]]
+
+        fp = fingerprint(renamed_variant(snippet["code"], rng))
+        match = index.exact(fp.canonical.hash, error_type, "full")
+        results["renamed"] += match == originals[snippet["name"]]
+
+        fp = fingerprint(edited_variant(snippet["code"], rng))
+        results["edited"] += index.near(fp.signature, error_type, "full", args.threshold) is not None
+
+        others = [other for other in base if other["name"] != snippet["name"]]
+        other = rng.choice(others)
+        fp = fingerprint(other["code"])
+        near = index.near(fp.signature, error_type, "full", args.threshold)
+        results["unrelated"] += near is not None and base[near[0] % len(base)]["name"] != other["name"]
+
+    # LATENCY
+    short = renamed_variant(base[0]["code"], rng)
+    long = renamed_variant(base[-1]["code"], rng)
+    fp = fingerprint(edited_variant(base[0]["code"], rng))
+    error_type = types[base[0]["name"]]
+
+    print(f"{args.entries} indexed submissions, {build:.0f} us each to fingerprint and add\n")
+    print(f"{'':<34} {'us':>8}")
+    print(f"{f'fingerprint, {short.count(chr(10))} lines':<34} {timed(lambda: fingerprint(short), 500):>8.1f}")
+    print(f"{f'fingerprint, {long.count(chr(10))} lines':<34} {timed(lambda: fingerprint(long), 100):>8.1f}")
+    print(f"{'exact lookup':<34} {timed(lambda: index.exact(fp.canonical.hash, error_type, 'full'), 20000):>8.2f}")
+    print(f"{'near lookup (LSH + verify)':<34} "
+          f"{timed(lambda: index.near(fp.signature, error_type, 'full', args.threshold), 2000):>8.2f}")
+
+    print(f"\n{'variant':<12} {'matched':>8}")
+    for kind, count in results.items():
+        print(f"{kind:<12} {count:>4}/{len(base)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Upstream calls saved by request coalescing.
+
+Simulates a class submitting the same snippet at once: --clients threads (or
+coroutines with --async) ask the response cache for the same few keys while
+a fake upstream call sleeps for --latency seconds. Runs once without and
+once with SingleFlight and reports the upstream calls made, the calls saved
+and the wall time.
+
+    python bench/singleflight_bench.py --clients 50 --keys 3 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.cache import LocMemBackend, ResponseCache  # noqa: E402
+from analyzer.singleflight import SingleFlight  # noqa: E402
+
+
+def run_threads(cache: ResponseCache, clients: int, keys: int, latency: float) -> int:
+    calls = []
+    start = threading.Barrier(clients)
+
+    def upstream():
+        calls.append(1)
+        time.sleep(latency)
+        return "answer"
+
+    def client(index: int):
+        start.wait()
+        cache.get_or_call(f"key-{index % keys}", upstream)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(calls)
+
+
+def run_async(cache: ResponseCache, clients: int, keys: int, latency: float) -> int:
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(latency)
+        return "answer"
+
+    async def main():
+        await asyncio.gather(*(
+            cache.aget_or_call(f"key-{index % keys}", upstream) for index in range(clients)
+        ))
+
+    asyncio.run(main())
+    return len(calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--async", dest="use_async", action="store_true")
+    args = parser.parse_args()
+
+    run = run_async if args.use_async else run_threads
+    print(f"{args.clients} clients, {args.keys} distinct submissions, {args.latency}s upstream\n")
+    print(f"{'':<14} {'upstream':>9} {'saved':>6} {'wall s':>7}")
+    for label, flight in (("no coalescing", None), ("singleflight", SingleFlight())):
+        cache = ResponseCache(LocMemBackend(), flight)
+        started = time.perf_counter()
+        calls = run(cache, args.clients, args.keys, args.latency)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<14} {calls:>9} {args.clients - calls:>6} {elapsed:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Prompt size with and without traceback-guided slicing on long files.
+
+Each corpus snippet is buried in a generated module of --lines lines
+(helper functions before and after it), run for a real traceback, and sent
+through prompt_excerpt(). Reports the prompt tokens of the whole file and of
+the excerpt, the lines kept, whether every <user_code> frame line survived,
+and the slicing time. Uses tiktoken when installed, otherwise estimates 4
+characters per token.
+
+    python bench/slicing_bench.py --lines 2000 --budget 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer.error_utils import detect_python_error, user_lines  # noqa: E402
+from analyzer.prompts import build_messages  # noqa: E402
+from analyzer.slicing import slice_code  # noqa: E402
+from corpus import SNIPPETS, run_for_traceback  # noqa: E402
+from prompt_tokens import get_token_counter  # noqa: E402
+
+HELPER = '''def helper_{i}(records, factor={i}):
+    """Scale the records of kind k{i} and summarise them."""
+    result = []
+    for row in records:
+        if row.get("kind") == "k{i}":
+            result.append(row["value"] * factor)
+    total = sum(result)
+    return {{"name": "helper_{i}", "total": total, "count": len(result)}}
+
+'''
+
+
+def helpers(start: int, lines: int) -> str:
+    count = max(0, lines // HELPER.count("\n"))
+    return "".join(HELPER.format(i=i) for i in range(start, start + count))
+
+
+def long_module(code: str, lines: int) -> str:
+    # About a third of the filler before the snippet, the rest after it.
+    before = lines // 3
+    return "import json\nimport os\n\n" + helpers(0, before) + code + "\n\n" + helpers(1000, lines - before)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--budget", type=int, default=2000, help="excerpt token budget")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args()
+
+    count_tokens, counter_name = get_token_counter(args.model)
+
+    print(f"Tokens counted with {counter_name}; {args.lines}-line modules, budget {args.budget}\n")
+    print(f"{'snippet':<22} {'lines':>6} {'full':>8} {'excerpt':>8} {'kept':>6} {'frames':>7} {'ms':>7}")
+
+    totals = [0, 0]
+    for name, code, run in SNIPPETS:
+        module = long_module(code, args.lines)
+        error = (run_for_traceback(module) if run else "") or detect_python_error(module) or ""
+        frames = user_lines(error)
+
+        started = time.perf_counter()
+        excerpt = slice_code(module, frames, args.budget)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        full = count_tokens(build_messages(module, error, "", "full", True)[1]["content"])
+        if excerpt is None:
+            sliced, kept, found = full, module.count("\n"), "-"
+        else:
+            sliced = count_tokens(build_messages(excerpt.code, error, "", "full", True, excerpt=True)[1]["content"])
+            kept = excerpt.lines
+            shown = {int(line.split("|", 1)[0]) for line in excerpt.code.splitlines() if line.split("|", 1)[0].strip()}
+            found = f"{sum(line in shown for line in frames)}/{len(frames)}"
+
+        totals[0] += full
+        totals[1] += sliced
+        print(f"{name:<22} {module.count(chr(10)):>6} {full:>8} {sliced:>8} {kept:>6} {found:>7} {elapsed:>7.2f}")
+
+    print(f"\nuser message tokens: {totals[0]} whole, {totals[1]} sliced "
+          f"({100 * (1 - totals[1] / totals[0]):.0f}% fewer)")
+
+
+if __name__ == "__main__":
+    main()
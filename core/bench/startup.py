@@ -0,0 +1,155 @@
+"""
+Cold-start import time of the CLI, the pipeline and the views, against a budget.
+
+Each target runs --repeats times in a fresh interpreter under
+`python -X importtime`; the fastest run counts. "import ms" is the summed
+top-level cumulative import time minus that of an empty interpreter (site,
+.pth files), "wall ms" the whole process. The heaviest top-level imports
+are listed per target.
+
+bench/startup_budget.json holds, per target, the allowed import time and
+the modules that must not be imported at all (openai and httpx are only
+needed once an LLM call is made). The exit status is 1 when a target is
+over budget or imports a forbidden module; --update rewrites the budgets to
+the measured times plus --headroom.
+
+    python bench/startup.py --repeats 5
+    python bench/startup.py --update --headroom 0.5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CORE_DIR = os.path.dirname(BENCH_DIR)
+MAIN = os.path.join(os.path.dirname(CORE_DIR), "main.py")
+
+BUDGET_FILE = os.path.join(BENCH_DIR, "startup_budget.json")
+
+VIEWS = (
+    "import os, django; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings'); "
+    "django.setup(); import analyzer.views"
+)
+
+CLEAN_FILE = "def total(values):\n    return sum(values)\n\n\nprint(total([1, 2, 3]))\n"
+
+
+def targets(clean_file: str) -> dict:
+    # name -> interpreter arguments after -X importtime
+    return {
+        "cli-help": [MAIN, "--help"],
+        "cli-scan": [MAIN, clean_file, "--no-cache", "--workers", "1"],
+        "pipeline": ["-c", "import analyzer.pipeline"],
+        "views": ["-c", VIEWS],
+    }
+
+
+def parse_importtime(stderr: str) -> tuple:
+    # Returns ({top-level module: cumulative us}, every imported module).
+    top = {}
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        if not name[1:].startswith(" "):
+            top[name.strip()] = top.get(name.strip(), 0) + int(cumulative)
+    return top, modules
+
+
+def run_once(arguments: list) -> tuple:
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "", "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "bench")}
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *arguments],
+        cwd=CORE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    wall = (time.perf_counter() - started) * 1000
+    top, modules = parse_importtime(completed.stderr)
+    return wall, top, modules
+
+
+def measure(arguments: list, repeats: int) -> dict:
+    best = None
+    for _ in range(repeats):
+        wall, top, modules = run_once(arguments)
+        imports = sum(top.values()) / 1000
+        if best is None or imports < best["import_ms"]:
+            best = {"wall_ms": wall, "import_ms": imports, "top": top, "modules": modules}
+    return best
+
+
+def forbidden_imports(modules: set, forbid: list) -> list:
+    return sorted(name for name in forbid if any(module == name or module.startswith(name + ".") for module in modules))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--targets", help="comma-separated subset of the targets")
+    parser.add_argument("--heaviest", type=int, default=3, help="top-level imports listed per target")
+    parser.add_argument("--budget", default=BUDGET_FILE)
+    parser.add_argument("--update", action="store_true", help="rewrite the budgets from this run")
+    parser.add_argument("--headroom", type=float, default=0.5, help="margin added to the budgets by --update")
+    args = parser.parse_args()
+
+    with open(args.budget, encoding="utf-8") as f:
+        budgets = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clean_file = os.path.join(tmp, "clean.py")
+        with open(clean_file, "w", encoding="utf-8") as f:
+            f.write(CLEAN_FILE)
+
+        selected = targets(clean_file)
+        if args.targets:
+            selected = {name: selected[name] for name in args.targets.split(",")}
+
+        baseline = measure(["-c", "pass"], args.repeats)
+        results = {name: measure(arguments, args.repeats) for name, arguments in selected.items()}
+
+    print(f"Python {sys.version.split()[0]}; best of {args.repeats}; "
+          f"empty interpreter {baseline['import_ms']:.0f} ms of imports, {baseline['wall_ms']:.0f} ms wall\n")
+    print(f"{'target':<10} {'import ms':>10} {'budget':>8} {'wall ms':>8}  heaviest imports")
+
+    failures = []
+    for name, result in results.items():
+        budget = budgets.get(name, {})
+        imports = result["import_ms"] - baseline["import_ms"]
+        own = {module: us for module, us in result["top"].items() if module not in baseline["top"]}
+        heaviest = sorted(own.items(), key=lambda item: -item[1])[:args.heaviest]
+        shown = ", ".join(f"{module} {us / 1000:.0f}" for module, us in heaviest)
+        limit = budget.get("import_ms")
+        print(f"{name:<10} {imports:>10.0f} {limit if limit is not None else '-':>8} "
+              f"{result['wall_ms']:>8.0f}  {shown}")
+
+        if args.update:
+            budgets[name] = {**budget, "import_ms": round(imports * (1 + args.headroom))}
+            continue
+        if limit is not None and imports > limit:
+            failures.append(f"{name}: {imports:.0f} ms of imports, budget {limit} ms")
+        for module in forbidden_imports(result["modules"], budget.get("forbid", [])):
+            failures.append(f"{name}: imports {module}")
+
+    if args.update:
+        with open(args.budget, "w", encoding="utf-8") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+        print(f"\nbudgets written to {args.budget}")
+        return
+
+    if failures:
+        print("\nover budget:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Offline benchmark suite for the debug and history endpoints.
+
+Every scenario runs in a fresh worker process. The worker starts the fake
+LLM server (bench/fake_llm_server.py) and points the app at it. It then
+creates a throw-away test database and drives core.wsgi from a thread pool
+or core.asgi from asyncio tasks, in-process, with submissions from
+bench/corpus.py. The report shows requests/s, p50 / p95 / p99 latency and
+the worker's resident memory.
+
+Results are written as JSON to bench/results/. Pass --compare with an
+earlier file to flag throughput or p95 regressions; the exit status is 1
+when there are any.
+
+    python bench/suite.py --requests 400 --latency 0.05
+    python bench/suite.py --scenarios debug-wsgi,history-asgi --compare bench/results/<earlier>.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import submissions  # noqa: E402
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+# name -> (server interface, method, path)
+SCENARIOS = {
+    "debug-wsgi": ("wsgi", "POST", "/debug/"),
+    "debug-asgi": ("asgi", "POST", "/debug/"),
+    "debug-async-asgi": ("asgi", "POST", "/debug/async/"),
+    "history-wsgi": ("wsgi", "GET", "/api/history/"),
+    "history-asgi": ("asgi", "GET", "/api/history/"),
+}
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+# ================= FAKE LLM =================
+
+def start_fake_llm(args) -> tuple:
+    loop = asyncio.new_event_loop()
+    fake = FakeLLMServer(args.latency, args.tokens_per_second, error_rate=args.error_rate,
+                         error_status=args.error_status)
+    ready = threading.Event()
+    port = None
+
+    async def start():
+        nonlocal port
+        server = await asyncio.start_server(fake.handle, "127.0.0.1", 0, backlog=4096)
+        port = server.sockets[0].getsockname()[1]
+        ready.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start())
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return fake, port
+
+
+# ================= REQUEST DRIVERS =================
+
+def wsgi_request(application, method: str, path: str, body: bytes, headers: dict, client_ip: str) -> int:
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": client_ip,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(body)),
+        "HTTP_HOST": "localhost",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in headers.items():
+        environ["HTTP_" + name.upper().replace("-", "_")] = value
+
+    status = None
+
+    def start_response(status_line, response_headers, exc_info=None):
+        nonlocal status
+        status = int(status_line.split(" ", 1)[0])
+
+    response = application(environ, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, "close"):
+            response.close()
+    return status
+
+
+async def asgi_request(application, method: str, path: str, body: bytes, headers: dict, client_ip: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ] + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": (client_ip, 50000),
+        "server": ("localhost", 80),
+    }
+    sent = False
+    status = None
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            done.set()
+
+    await application(scope, receive, send)
+    return status
+
+
+def client_ip(index: int) -> str:
+    # One address per request, so the per-IP rate limit never applies.
+    return f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"
+
+
+# ================= WORKER =================
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def prepare_history(rows: int) -> dict:
+    # A user with `rows` saved submissions; returns the session cookie header.
+    from django.contrib.auth.models import User
+    from django.test import Client
+
+    from analyzer.models import CodeSubmission
+
+    user = User.objects.create_user("bench", password="bench-password")
+    items = submissions(rows, unique_fraction=0.5)
+    for item in items:
+        CodeSubmission(
+            user=user,
+            code=item["code"],
+            language="python",
+            error_message=item["error"],
+            ai_response={"result": "...", "error_type": "IndexError", "confidence": "high", "mode": item["mode"]},
+        ).save()
+
+    client = Client()
+    client.force_login(user)
+    return {"Cookie": f"sessionid={client.cookies['sessionid'].value}"}
+
+
+def run_scenario(name: str, args) -> dict:
+    interface, method, path = SCENARIOS[name]
+    fake, port = start_fake_llm(args)
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ["DJANGO_SETTINGS_MODULE"] = "core.settings"
+
+    import django
+
+    django.setup()
+
+    from django.db import connection
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    if path.startswith("/debug/"):
+        headers = {}
+        bodies = [
+            json.dumps({"code": item["code"], "error": item["error"], "mode": item["mode"]}).encode()
+            for item in submissions(args.requests, args.unique_fraction)
+        ]
+    else:
+        headers = prepare_history(args.history_rows)
+        bodies = [b""] * args.requests
+
+    if interface == "wsgi":
+        from core.wsgi import application
+
+        def one(index: int):
+            started = time.perf_counter()
+            status = wsgi_request(application, method, path, bodies[index], headers, client_ip(index))
+            return status, time.perf_counter() - started
+
+        def drive(count: int, offset: int = 0):
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                return list(executor.map(lambda index: one(offset + index), range(count)))
+    else:
+        from core.asgi import application
+
+        async def drive_async(count: int, offset: int):
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(index: int):
+                async with semaphore:
+                    started = time.perf_counter()
+                    status = await asgi_request(application, method, path, bodies[index], headers, client_ip(index))
+                    return status, time.perf_counter() - started
+
+            return await asyncio.gather(*(one(offset + index) for index in range(count)))
+
+        def drive(count: int, offset: int = 0):
+            return asyncio.run(drive_async(count, offset))
+
+    # Warm up imports, URL resolution and the connection pools. The warm-up
+    # requests reuse the first bodies, so they also seed the response cache.
+    drive(min(args.warmup, args.requests))
+    fake.requests = fake.errors = 0
+    rss_before = rss_mb()
+
+    started = time.perf_counter()
+    results = drive(args.requests)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        "interface": interface,
+        "method": method,
+        "path": path,
+        "requests": len(results),
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(results) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+        "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))] * 1000, 2),
+        "rss_mb": round(rss_before, 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "upstream_calls": fake.requests,
+        "upstream_errors": fake.errors,
+    }
+
+
+# ================= REPORT =================
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, previous: dict, threshold: float) -> list:
+    # Returns the regression messages.
+    regressions = []
+    print(f"\nvs {previous.get('commit') or 'previous'} ({previous.get('created')})")
+    print(f"{'':<18} {'req/s':>10} {'p95':>10}")
+
+    for name, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+
+        rps_change = result["requests_per_second"] / before["requests_per_second"] - 1
+        p95_change = result["p95_ms"] / before["p95_ms"] - 1
+        print(f"{name:<18} {rps_change:>+10.1%} {p95_change:>+10.1%}")
+
+        if rps_change < -threshold:
+            regressions.append(f"{name}: throughput {rps_change:+.1%}")
+        if p95_change > threshold:
+            regressions.append(f"{name}: p95 {p95_change:+.1%}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma-separated, from: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--unique-fraction", type=float, default=0.7,
+                        help="share of debug submissions not seen before (the rest hit the cache)")
+    parser.add_argument("--history-rows", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="fake LLM token rate (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of fake LLM calls that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--output", default=None, help="results file (default: bench/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": vars(args),
+        "scenarios": {},
+    }
+
+    print(f"{args.requests} requests per scenario, concurrency {args.concurrency}, "
+          f"fake LLM latency {args.latency}s\n")
+    print(f"{'':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'upstream':>9}  statuses")
+
+    spawn = multiprocessing.get_context("spawn")
+    for name in names:
+        # A fresh process per scenario keeps memory numbers and module state
+        # (caches, rate limiter, connection pools) independent.
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+            result = executor.submit(run_scenario, name, args).result()
+        report["scenarios"][name] = result
+        print(f"{name:<18} {result['requests_per_second']:>8.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['peak_rss_mb']:>8.1f} "
+              f"{result['upstream_calls']:>9}  {result['statuses']}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['commit'] or 'unknown'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        regressions = compare(report, previous, args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'analyzer.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -128,6 +130,251 @@ LOGOUT_REDIRECT_URL = '/login/'
 LOGIN_URL = '/login/'
 
 
+# Caches
+# The "shared" alias is backed by the database so every worker process sees
+# the same entries. Create its table once with `python manage.py createcachetable`.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'analyzer_cache',
+    },
+}
+
+
+# LLM response cache
+# BACKEND is "locmem" (per process, MAX_ENTRIES) or "django" (uses the cache
+# ALIAS; shared between processes unless that cache is itself per process).
+
+RESPONSE_CACHE = {
+    'BACKEND': 'locmem',
+    'MAX_ENTRIES': 1024,
+    'ALIAS': 'shared',
+    'TTL': 60 * 60,
+}
+
+
+# Request coalescing (analyzer/singleflight.py)
+# Identical requests that miss the cache at the same time share one LLM call.
+# With a shared RESPONSE_CACHE ("django"), PROCESS_LOCK extends this across
+# worker processes through a lock entry that expires after LOCK_SECONDS.
+
+SINGLEFLIGHT = {
+    'ENABLED': True,
+    'PROCESS_LOCK': True,
+    'LOCK_SECONDS': 120,
+    'POLL_INTERVAL': 0.1,
+}
+
+
+# Near-duplicate reuse (analyzer/similarity.py)
+# Answered submissions are fingerprinted (canonical AST + MinHash); a new one
+# with the same canonical form, error type and mode reuses the stored answer.
+# Hint requests also reuse near matches at NEAR_SIMILARITY or above.
+
+SIMILARITY = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 50_000,
+    'NEAR_SIMILARITY': 0.9,
+    'REFRESH_SECONDS': 5,
+}
+
+
+# Rate limiting
+# Sliding-window counters per client IP and per logged-in user.
+# BACKEND is "locmem" (per process), "database" (shared by all workers)
+# or "cache" (Django cache ALIAS; atomic on memcached/redis).
+
+RATE_LIMIT = {
+    'BACKEND': 'locmem',
+    'MAX_REQUESTS': 5,
+    'USER_MAX_REQUESTS': 5,
+    'WINDOW_SECONDS': 60,
+}
+
+
+# Request metrics (analyzer/metrics.py), served at /metrics/ in Prometheus
+# text format. TIMING_HEADER adds per-stage Server-Timing headers; set TOKEN
+# (or METRICS_TOKEN) to require "Authorization: Bearer <token>" on scrapes.
+
+METRICS = {
+    'ENABLED': True,
+    'TIMING_HEADER': True,
+    'TOKEN': os.getenv('METRICS_TOKEN'),
+}
+
+
+# Input screening (analyzer/screening.py)
+# Request body, code and error size caps, the line limit and the prompt-injection
+# rule files (one phrase per line) applied to both code and error. Long code
+# only reaches the model as an excerpt (see SLICING), so the caps are loose.
+
+SCREENING = {
+    'MAX_BODY_BYTES': 600_000,
+    'MAX_CODE_BYTES': 400_000,
+    'MAX_ERROR_BYTES': 20_000,
+    'MAX_LINES': 10_000,
+    'RULE_FILES': [BASE_DIR / 'analyzer' / 'rules' / 'injection.txt'],
+}
+
+
+# Resubmissions (analyzer/incremental.py)
+# A logged-in user's submission is diffed against their most similar answered
+# submission from the last WINDOW_SECONDS (among the LOOKBACK most recent,
+# sharing at least MIN_SIMILARITY of its lines). Applying the previous fix,
+# or an edit that leaves the same error on the same statement, reuses the
+# previous answer; otherwise the prompt gets the previous analysis and an
+# excerpt around the changed lines fitted to TOKEN_BUDGET.
+
+INCREMENTAL = {
+    'ENABLED': True,
+    'WINDOW_SECONDS': 30 * 60,
+    'LOOKBACK': 5,
+    'MIN_SIMILARITY': 0.6,
+    'TOKEN_BUDGET': 800,
+}
+
+
+# Prompt context (analyzer/slicing.py)
+# Code of MIN_LINES lines or more that does not fit TOKEN_BUDGET is sent as an
+# excerpt: the statements on the traceback's user frames plus the definitions
+# and imports they use, with the original line numbers and omitted lines
+# marked.
+
+SLICING = {
+    'ENABLED': True,
+    'MIN_LINES': 80,
+    'TOKEN_BUDGET': 2000,
+}
+
+
+# Background debug jobs (analyzer/jobs.py): {"async": true} on /debug/ queues
+# the request and answers 202 with a job id to poll at /debug/jobs/<id>/.
+# Jobs are run by `python manage.py run_debug_workers`; a job whose worker
+# dies is requeued once its LEASE_SECONDS run out, up to MAX_ATTEMPTS.
+# Webhook callbacks are only sent to hosts listed in CALLBACK_HOSTS.
+
+JOBS = {
+    'LEASE_SECONDS': 300,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 10,
+    'POLL_INTERVAL': 1.0,
+    'CALLBACK_HOSTS': [],
+    'CALLBACK_TIMEOUT': 10,
+    'CALLBACK_RETRIES': 3,
+}
+
+
+# Debug sessions (analyzer/sessions.py): "session": true on /debug/ keeps the
+# conversation so POST /debug/sessions/<id>/ can ask for the next hint or the
+# fix. At most MAX_SESSIONS are held in memory per process; rows expire
+# TTL_SECONDS after the last turn. Turns beyond TOKEN_BUDGET are summarized,
+# keeping the last KEEP_TURNS verbatim.
+
+SESSIONS = {
+    'ENABLED': True,
+    'MAX_SESSIONS': 1000,
+    'TTL_SECONDS': 60 * 60,
+    'MAX_TURNS': 20,
+    'TOKEN_BUDGET': 4000,
+    'KEEP_TURNS': 2,
+}
+
+
+# Batch debugging (/debug/batch/)
+
+BATCH_MAX_ITEMS = 500
+BATCH_MAX_CONCURRENCY = 8
+
+
+# History pages
+
+HISTORY_PAGE_SIZE = 20
+
+
+# Submission payload storage ("zlib", or "zstd" with the zstandard package)
+
+BLOB_COMPRESSION = 'zlib'
+
+
+# LLM backends, tried in order of their rolling latency / error-rate score.
+# Any OpenAI-compatible endpoint works; API_KEY_ENV names the environment
+# variable holding its key. bench/fake_llm_server.py is a local stand-in:
+#     {'NAME': 'local', 'MODEL': 'fake', 'BASE_URL': 'http://127.0.0.1:8001/v1'}
+
+LLM_BACKENDS = [
+    {
+        'NAME': 'openai',
+        'MODEL': os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
+        'BASE_URL': os.getenv('OPENAI_BASE_URL'),
+        'API_KEY_ENV': 'OPENAI_API_KEY',
+        'TIMEOUT': 60,
+        'MAX_RETRIES': 2,
+    },
+]
+
+# Hedging fires a second request to the next backend once a call has run
+# longer than the primary's HEDGE_QUANTILE latency (after HEDGE_MIN_SAMPLES
+# answers). A backend's circuit opens after BREAKER_FAILURES consecutive
+# failures and is retried after BREAKER_COOLDOWN seconds.
+
+LLM_ROUTER = {
+    'HEDGE_QUANTILE': 0.95,
+    'HEDGE_MIN_SAMPLES': 20,
+    'BACKOFF_BASE': 0.25,
+    'BACKOFF_MAX': 4,
+    'BREAKER_FAILURES': 5,
+    'BREAKER_COOLDOWN': 30,
+    'WINDOW': 100,
+}
+
+
+# Model tiers, cheapest first. Each tier uses the LLM_BACKENDS named in
+# BACKENDS (default: all of them) with its own MODEL. Costs are USD per
+# million tokens and only feed the /debug/stats/ numbers.
+
+LLM_TIERS = {
+    'fast': {
+        'MODEL': os.getenv('OPENAI_FAST_MODEL', 'gpt-4o-mini'),
+        'INPUT_COST': 0.15,
+        'OUTPUT_COST': 0.60,
+    },
+    'strong': {
+        'MODEL': os.getenv('OPENAI_STRONG_MODEL', 'gpt-4o'),
+        'INPUT_COST': 2.50,
+        'OUTPUT_COST': 10.00,
+    },
+}
+
+# Hint requests and snippets of at most FAST_MAX_LINES lines with a compile
+# error or one of FAST_ERROR_TYPES use the first tier; the rest use the last.
+# Low-confidence answers are retried once on the next tier.
+
+TIERING = {
+    'FAST_ERROR_TYPES': [
+        'IndexError', 'KeyError', 'TypeError', 'ValueError',
+        'NameError', 'AttributeError', 'ZeroDivisionError',
+    ],
+    'FAST_MAX_LINES': 60,
+    'ESCALATE_ON_LOW_CONFIDENCE': True,
+}
+
+
+# Sandboxed execution
+# When enabled, submissions without an error message are run in a pool of
+# long-lived, resource-limited worker processes to capture the real traceback.
+
+SANDBOX = {
+    'ENABLED': False,
+    'WORKERS': 2,
+    'CPU_SECONDS': 2,
+    'MEMORY_MB': 256,
+    'WALL_SECONDS': 5,
+    'OUTPUT_BYTES': 10000,
+}
 
 
 # Default primary key field type
@@ -1,36 +1,413 @@
+import argparse
+import glob
+import hashlib
+import json
 import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "core"))
 
-from analyzer.prompts import debug_code
-from analyzer.llm import call_llm
+from analyzer.error_utils import detect_python_error
+from analyzer.llm import MODEL, get_tiers, tier_model
+from analyzer.pipeline import (
+    build_response_data,
+    item_error,
+    prepare_item,
+    resolve_item,
+    resolve_many,
+    validate_code,
+)
+from analyzer.static_checks import analyze_code
 
 
-def main():
+def read_batch(path: str) -> list:
+    # Accepts a JSON list of {code, error, mode} objects or one object per line.
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def run_batch(path: str, concurrency: int, execute: bool) -> None:
+    items = read_batch(path)
+
+    rejected = {}
+    prepared = []
+    positions = []
+    for index, raw in enumerate(items):
+        rejection = validate_code(raw.get("code", ""), raw.get("error", ""))
+        if rejection:
+            rejected[index] = rejection[0]
+            continue
+        prepared.append(prepare_item(raw.get("code", ""), raw.get("error", ""), raw.get("mode", "full"), execute))
+        positions.append(index)
+
+    results = resolve_many(prepared, concurrency)
+
+    for index in range(len(items)):
+        if index in rejected:
+            print(json.dumps({"index": index, "error": rejected[index]}), flush=True)
+            continue
+
+        position, result, cache_hit, error = next(results)
+        if error is not None:
+            print(json.dumps({"index": positions[position], "error": item_error(error)}), flush=True)
+            continue
+
+        response_data = build_response_data(result, prepared[position], cache_hit)
+        print(json.dumps({"index": positions[position], **response_data}), flush=True)
+
+
+# Project scan: `python main.py src/ tests/*.py -` checks every Python file
+# locally (compile + static checks) in a process pool and only sends failing
+# files to the LLM, through a thread pool of --concurrency calls. Results are
+# printed as one JSON line per file as they finish, with a progress line on
+# stderr. Results are kept in an on-disk cache keyed by the file's content
+# (and found by path, size and mtime without reading the file), so a rerun
+# over an unchanged tree answers from the cache.
+
+SKIP_DIRS = {".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv", "env", "__pycache__", "node_modules",
+             "build", "dist", ".mypy_cache", ".pytest_cache", ".ruff_cache"}
+
+STDIN = "-"
+
+DEFAULT_CACHE = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "ai-code-debugger", "results.jsonl"
+)
+
+# Bumped when the cached record format or the checks change.
+CACHE_VERSION = 2
+
+
+def collect_files(targets: list) -> list:
+    # Files, directories (walked for *.py), globs and "-" for stdin, in the
+    # order given, without duplicates.
+    paths = []
+    for target in targets:
+        if target == STDIN:
+            paths.append(STDIN)
+        elif os.path.isdir(target):
+            for root, dirs, files in os.walk(target):
+                dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith("."))
+                paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".py"))
+        elif glob.has_magic(target):
+            for path in sorted(glob.glob(target, recursive=True)):
+                if os.path.isdir(path):
+                    paths.extend(collect_files([path]))
+                elif path.endswith(".py"):
+                    paths.append(path)
+        else:
+            paths.append(target)
+
+    seen = set()
+    unique = []
+    for path in paths:
+        key = path if path == STDIN else os.path.realpath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def digest_of(parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def settings_key(mode: str) -> str:
+    # Everything besides the code that a file's result depends on: the
+    # record format, the mode and the models of every tier.
+    return digest_of([str(CACHE_VERSION), mode, MODEL, *(tier_model(tier) for tier in sorted(get_tiers()))])
+
+
+def content_key(code: str, settings: str) -> str:
+    return digest_of([settings, code])
+
+
+class ResultCache:
+    # Append-only JSONL of {"key", "settings", "path", "size", "mtime_ns",
+    # "result"}; later lines win. Entries are found by path and stat first,
+    # then by content key. The path index only holds entries made with the
+    # current settings_key, since the file is not read to check the key.
+
+    def __init__(self, path: str = None, settings: str = ""):
+        self.path = path
+        self.settings = settings
+        self.by_key = {}
+        self.by_path = {}
+        self._file = None
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._index(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+
+    def _index(self, entry: dict) -> None:
+        self.by_key[entry["key"]] = entry["result"]
+        if entry.get("path") and entry.get("settings") == self.settings:
+            self.by_path[entry["path"]] = (entry["size"], entry["mtime_ns"], entry["key"])
+
+    def lookup_stat(self, path: str, stat):
+        cached = self.by_path.get(os.path.abspath(path))
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return self.by_key.get(cached[2])
+        return None
+
+    def lookup(self, key: str):
+        return self.by_key.get(key)
+
+    def store(self, key: str, result: dict, path: str = None, stat=None) -> None:
+        entry = {"key": key, "settings": self.settings, "result": result}
+        if path and stat is not None:
+            entry.update(path=os.path.abspath(path), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        self._index(entry)
+        if not self.path:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def check_file(job: tuple) -> dict:
+    # Runs in a worker process: reads the file and does the local checks.
+    # The code is only sent back when the file needs an answer.
+    path, code, settings = job
+    if code is None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                code = f.read()
+        except (OSError, UnicodeDecodeError) as exc:
+            return {"path": path, "status": "unreadable", "error": f"{type(exc).__name__}: {exc}"}
+
+    checked = {"path": path, "key": content_key(code, settings)}
+
+    rejection = validate_code(code)
+    if rejection:
+        return {**checked, "status": "rejected", "error": rejection[0]}
+
+    if detect_python_error(code):
+        return {**checked, "status": "failing", "code": code}
+    if any(finding.confidence == "high" for finding in analyze_code(code)):
+        return {**checked, "status": "flagged", "code": code}
+    return {**checked, "status": "ok"}
+
+
+class Progress:
+    # Counts per status, reported on stderr (a live line on a terminal).
+
+    def __init__(self, total: int, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.live = stream.isatty()
+        self.counts = {}
+        self.done = 0
+        self.started = time.perf_counter()
+        self._shown = 0.0
+
+    def add(self, status: str, cached: bool) -> None:
+        self.done += 1
+        self.counts[status] = self.counts.get(status, 0) + 1
+        if cached:
+            self.counts["cached"] = self.counts.get("cached", 0) + 1
+        now = time.perf_counter()
+        if self.live and (now - self._shown > 0.2 or self.done == self.total):
+            self._shown = now
+            self.stream.write(f"\r{self.line()}")
+            self.stream.flush()
+
+    def line(self) -> str:
+        counts = ", ".join(f"{count} {status}" for status, count in sorted(self.counts.items()))
+        return f"{self.done}/{self.total} files ({counts}) in {time.perf_counter() - self.started:.1f}s"
+
+    def finish(self) -> None:
+        self.stream.write(("\r" if self.live else "") + self.line() + "\n")
+        self.stream.flush()
+
+
+def run_scan(targets: list, mode: str, concurrency: int, workers: int, cache_path: str, out=sys.stdout) -> int:
+    # Returns the number of files with a problem (failing, flagged, rejected
+    # or unreadable).
+    paths = collect_files(targets)
+    settings = settings_key(mode)
+    cache = ResultCache(cache_path, settings)
+    progress = Progress(len(paths))
+    problems = 0
+
+    def emit(path: str, result: dict, cached: bool) -> None:
+        nonlocal problems
+        problems += result["status"] != "ok"
+        progress.add(result["status"], cached)
+        out.write(json.dumps({"path": path, **result, "from_cache": cached}) + "\n")
+        out.flush()
+
+    # CACHE (unchanged files are not even read)
+    jobs = []
+    stats = {}
+    for path in paths:
+        if path == STDIN:
+            jobs.append((path, sys.stdin.read(), settings))
+            continue
+        try:
+            stats[path] = os.stat(path)
+        except OSError as exc:
+            emit(path, {"status": "unreadable", "error": f"{type(exc).__name__}: {exc}"}, False)
+            continue
+        result = cache.lookup_stat(path, stats[path])
+        if result is not None:
+            emit(path, result, True)
+        else:
+            jobs.append((path, None, settings))
+
+    def finished(path: str, key: str, result: dict) -> None:
+        cache.store(key, result, path if path != STDIN else None, stats.get(path))
+        emit(path, result, False)
+
+    def answer(checked: dict) -> dict:
+        item = prepare_item(checked["code"], "", mode)
+        result, _ = resolve_item(item)
+        response_data = build_response_data(result, item, False)
+        return {"status": checked["status"], **response_data}
+
+    # LOCAL CHECKS (process pool) -> LLM (thread pool, failing files only)
+    checker = None
+    if workers > 1 and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        checker = ProcessPoolExecutor(max_workers=workers)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as llm_pool:
+        checked_files = checker.map(check_file, jobs, chunksize=16) if checker else map(check_file, jobs)
+        for checked in checked_files:
+            path = checked.pop("path")
+            key = checked.pop("key", None)
+            if checked["status"] not in ("failing", "flagged"):
+                if key:
+                    finished(path, key, checked)
+                else:
+                    emit(path, checked, False)
+                continue
+
+            result = cache.lookup(key)
+            if result is not None:
+                # Same content seen elsewhere (a copy, or a touched file).
+                cache.store(key, result, path if path != STDIN else None, stats.get(path))
+                emit(path, result, True)
+                continue
+            pending[llm_pool.submit(answer, checked)] = (path, key)
+
+            # Collect answers as they arrive rather than all at the end.
+            done, _ = wait(pending, timeout=0, return_when=FIRST_COMPLETED)
+            for future in done:
+                report(future, pending.pop(future), finished, emit)
+
+        if checker:
+            checker.shutdown()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                report(future, pending.pop(future), finished, emit)
+
+    cache.close()
+    progress.finish()
+    return problems
+
+
+def report(future, target: tuple, finished, emit) -> None:
+    path, key = target
+    try:
+        result = future.result()
+    except Exception as exc:
+        # Not cached, so a rerun tries again.
+        emit(path, {"status": "failed", "error": f"{type(exc).__name__}: {exc}"}, False)
+        return
+    finished(path, key, result)
+
+
+# Interactive mode reads the code until a line holding only this (or EOF),
+# so blank lines inside the code are kept.
+END_OF_CODE = "END"
+
+
+def run_interactive(execute: bool) -> None:
     print("=== AI Code Debugger (CLI) ===")
 
-    print("\nPaste your code (end with an empty line):")
+    print(f"\nPaste your code (end with a line containing only {END_OF_CODE}, or Ctrl-D):")
     lines = []
 
+    # Blank lines are part of the code; only the marker or EOF ends it.
     while True:
-        line = input()
-        if line.strip() == "":
+        try:
+            line = input()
+        except EOFError:
+            break
+        if line.strip() == END_OF_CODE:
             break
         lines.append(line)
 
     code = "\n".join(lines)
 
-    error = input("\nPaste the error message: ")
+    try:
+        error = input("\nPaste the error message: ")
+    except EOFError:
+        error = ""
 
-    prompt = debug_code(code, error)
-    response = call_llm(prompt)
+    rejection = validate_code(code, error)
+    if rejection:
+        print(f"\n{rejection[0]}")
+        return
+
+    item = prepare_item(code, error, "full", execute)
+    result, cache_hit = resolve_item(item)
 
     print("\n🔍 Debug Result:\n")
-    print(response)
+    print(build_response_data(result, item, cache_hit)["result"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Code Debugger (CLI)")
+    parser.add_argument("paths", nargs="*", metavar="PATH",
+                        help="Python files, directories, globs or - for stdin to check; "
+                             "prints one JSON result per file")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="JSON or JSONL file of {code, error, mode} items; prints one JSON result per line")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="maximum concurrent LLM calls in batch and scan mode")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes for the local checks in scan mode")
+    parser.add_argument("--mode", choices=["full", "hint"], default="full",
+                        help="answer mode in scan mode")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, metavar="FILE",
+                        help="scan result cache (JSONL)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="neither read nor write the scan result cache")
+    parser.add_argument("--execute", action="store_true",
+                        help="run snippets without an error message in the sandbox to capture the traceback")
+    args = parser.parse_args()
+
+    if args.paths:
+        problems = run_scan(args.paths, args.mode, args.concurrency, args.workers, None if args.no_cache else args.cache)
+        sys.exit(1 if problems else 0)
+    elif args.batch:
+        run_batch(args.batch, args.concurrency, args.execute)
+    else:
+        run_interactive(args.execute)
 
 
 if __name__ == "__main__":
     main()
-